@@ -0,0 +1,75 @@
+'''
+Throughput of text_processing.my_split() against the legacy regex cascade
+(benchmarks/legacy.py), checking that both split every question into the
+same clues.
+
+Usage, from the repository root:
+    python benchmarks/bench_split.py [path/to/tossups.json] [--limit N]
+Without a path, a synthetic set of quote-heavy questions is used.
+'''
+import os
+import sys
+import time
+import random
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'questions_to_cards'))
+from text_processing import my_split
+import legacy
+
+WORDS = ("the this these novel poem author title character war treaty painter ballet aria "
+         "Mr. Dr. St. vs. No. D.C. U.S. ... … (*) (+) [pron “ROH-ma”] (pron ay) '' 4'33'' "
+         "“Quoted. Text.” \"Dumb. Quote.\" “Nested “inner. part.” here.” “ ” . ? !").split(' ')
+
+
+def synthetic_questions(n, seed=0):
+    '''Random question-like texts that exercise every pre-processing step.'''
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(n):
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            words = rng.choices(WORDS, k=rng.randint(4, 30))
+            sentences.append(' '.join(words).capitalize() + rng.choice(['.', '?', '.”', '."']))
+        questions.append(' '.join(sentences))
+    return questions
+
+
+def time_split(split, questions):
+    '''Seconds taken to split every question.'''
+    start = time.perf_counter()
+    for question in questions:
+        split(question)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', nargs='?', help='tossups.json backup file')
+    parser.add_argument('--limit', type=int, default=None, help='most questions to use')
+    args = parser.parse_args()
+
+    if args.path is None:
+        questions = synthetic_questions(args.limit or 20000)
+    else:
+        questions = pd.read_json(args.path, lines=True).loc[:, 'question'].dropna().tolist()
+        questions = questions[:args.limit]
+    num_chars = sum(len(question) for question in questions)
+
+    mismatches = [question for question in questions if my_split(question) != legacy.my_split(question)]
+    print(f"{len(questions)} questions, {len(mismatches)} split differently")
+    for question in mismatches[:5]:
+        print(repr(question))
+
+    legacy_time = time_split(legacy.my_split, questions)
+    new_time = time_split(my_split, questions)
+    for name, seconds in (('legacy', legacy_time), ('my_split', new_time)):
+        print(f"{name:>10}: {seconds:.3f}s, {len(questions) / seconds:,.0f} questions/s, "
+              f"{num_chars / seconds / 1e6:.2f} MB/s")
+    print(f"speedup: {legacy_time / new_time:.2f}x")
+    return len(mismatches) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,68 @@
+'''
+Frozen copies of pipeline functions as they were before they were optimized,
+kept so benchmarks can time the current versions against them and check
+that they still give the same results. Don't import these anywhere else.
+'''
+import re
+
+DUMB_QUOTE_RE = re.compile('(?:“|\")([^\"”]+)(?:\"|”)')
+
+def my_split(qtext):
+    '''
+    Use a regex split questions at the clue (standalone sentence) level.
+
+    Inputs:
+        -qtext (str): The tossup or bonus part to be split up
+    Returns (lst): A list of the clue-sentences in the tossup or bonus part,
+    to be converted later into one card apiece 
+    '''
+    #PRE-PROCESSING 
+
+    qtext = re.sub(r'…', '...', qtext)
+
+    #replace dumb quotes with smart quotes
+    qtext = re.sub(DUMB_QUOTE_RE, r'“\1”', qtext)
+
+    #replace double apostrophes on one end of a quote with dumb quotes
+    #e.g. “The Windhover''
+    #but beware things like D'' layer or 4'33''
+    qtext = re.sub(r'\'\'', '”', qtext)
+
+    #prevent splitting on common titles
+    ABBREVS_RE = r'(“|\s)(Mr|Mrs|Ms|Mx|Messrs|Dr|Prof|Rev|Lt|Col|Gen|Gov|No|St|Ste|Mme|Mlle|v|vs|Blvd|Op|Mt|Ft)\.'
+    qtext = re.sub(ABBREVS_RE, r'\1\2_DOT_', qtext)
+
+    #fix order of period-close quote so other REs work better
+    WRONG_ENDQUOTE_RE = r'(?<=[a-z])\.“(?= [A-Z])'
+    qtext = re.sub(WRONG_ENDQUOTE_RE, '.”', qtext)
+
+    #prevent from splitting quotations
+    PERIOD_IN_SMART_QUOTES_RE = r'(?<=“)([^”]+)\.([^”]+)(?=”)'
+    #this operation only replaces one so you need to while loop it
+    while qtext != re.sub(PERIOD_IN_SMART_QUOTES_RE, r'\1_DOT_\2', qtext):
+        qtext = re.sub(PERIOD_IN_SMART_QUOTES_RE, r'\1_DOT_\2', qtext)
+        
+    #Should be obviated by replacement of dumb quotes
+    PERIOD_IN_DUMB_QUOTES_RE = r'(\"[^\.\"]+)\.( [^\.\"]+(\.|\?|\!|)\")'
+    qtext = re.sub(PERIOD_IN_DUMB_QUOTES_RE, r'\1_DOT_\2', qtext)
+
+    #remove pronunciation guides where possible
+    PRONUNC_GUIDE_RE = r'\s(\[“[^\[\]]+”\]|\(“[^\(\)]+”\)|\(pron[^\)]+\)|\[pron[^\]]+\])'
+    qtext = re.sub(PRONUNC_GUIDE_RE, '', qtext)
+
+    #remove power marks
+    POWER_MARK_RE = r'\((\*|\+){1,2}\)\s?'
+    qtext = re.sub(POWER_MARK_RE, '', qtext)
+
+    #TODO: improve documentation for this monster regex
+    #Default behavior: split at end-of-sentence periods that aren't within quotation marks
+    TEST_BEST_SPLIT_RE = re.compile(r'(?<=[^ A-Z]\.\s)' #prevent splitting on initials or ellipses
+                                    r'(?=[\s0-9A-Z“])|' #look ahead to see if next sentence
+                                    #starts with number, capital letter, or left quotation mark
+                                    r'(?<=(?:\?|\.|\!)(?:”|\")\s)(?=[^a-z])|' # "core"
+                                    r'(?<=[A-Z]{2}\. )|' #deal with sentences that end with
+                                    #an initialism like 'CO' or 'DRNA'
+                                    r'(?<=\.”|\.\")(?=[0-9A-Z])') #handle sentences with no space;
+                                    #e.g. 2023 ACF Regionals 'House of Usher' tossup
+
+    return re.split(TEST_BEST_SPLIT_RE, qtext)
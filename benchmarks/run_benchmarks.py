@@ -0,0 +1,233 @@
+'''
+Benchmark suite: time each stage of the QBReader backup pipeline on
+synthetic backups (see benchmarks/synthetic.py) of several sizes, record
+throughput and peak memory, and compare against a saved baseline.
+
+Stages, each run on the output of the one before, as in
+backup_to_cards.run():
+    reformat              split bonuses into parts
+    my_split              fix MongoDB columns, split questions into clues
+    cleanup               eliminate repeat clues, clean clues and answers
+    tagstring             normalize lengths, generate Anki tags
+    remove_redundancies   fuzzy redundant clue removal (no lemmatization)
+
+Each stage is timed once, then run again under tracemalloc for its peak
+memory (skip that with --no-memory). remove_redundancies takes hours at 1M
+questions; use --stages and --sizes to pick what to run.
+
+Usage, from the repository root:
+    python benchmarks/run_benchmarks.py                   # compare to baseline
+    python benchmarks/run_benchmarks.py --save-baseline   # record a baseline
+    python benchmarks/run_benchmarks.py --sizes 10000 --stages my_split cleanup
+'''
+import os
+import sys
+import io
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'questions_to_cards'))
+from synthetic import write_backup
+from backup_to_cards import (reformat, put_together, split_questions, normalize_length, tagstrings)
+from text_processing import cleanup
+from similarity import remove_redundancies
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+# a stage is reported as a regression when it's this much slower (or uses
+# this much more memory) than the baseline
+DEFAULT_TOLERANCE = 1.2
+
+
+def stage_reformat(data):
+    data['bonus_parts'] = reformat(data['bonuses'])
+    return len(data['bonuses']), len(data['bonus_parts'])
+
+
+def stage_my_split(data):
+    clues = put_together(data['tossups'], data['bonus_parts'])
+    data['clues'] = split_questions(clues)
+    return len(clues), len(data['clues'])
+
+
+def stage_cleanup(data):
+    clues = data['clues'].drop_duplicates('clue')
+    data['clean_clues'] = cleanup(clues, dedupe=False)
+    return len(data['clues']), len(data['clean_clues'])
+
+
+def stage_tagstring(data):
+    clues = data['clean_clues'].copy()
+    lengths = clues.loc[:,'clue'].str.len()
+    clues['len'] = normalize_length(lengths, lengths.mean(), lengths.std())
+    clues['tags'] = tagstrings(clues)
+    data['tagged_clues'] = clues
+    return len(clues), len(clues)
+
+
+def stage_remove_redundancies(data):
+    clues = remove_redundancies(data['tagged_clues'].copy(), lemmatize=False)
+    return len(data['tagged_clues']), len(clues)
+
+
+STAGES = {
+    'reformat': stage_reformat,
+    'my_split': stage_my_split,
+    'cleanup': stage_cleanup,
+    'tagstring': stage_tagstring,
+    'remove_redundancies': stage_remove_redundancies,
+}
+
+
+@contextlib.contextmanager
+def silenced():
+    '''Hide the pipeline's own printing and progress bars.'''
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def load_backup(num_questions, seed):
+    '''Generate a synthetic backup and read it the way intake() does.'''
+    with tempfile.TemporaryDirectory() as dirpath:
+        write_backup(dirpath, num_questions, seed)
+        tossups = pd.read_json(os.path.join(dirpath, 'tossups.json'), lines=True)
+        tossups.rename(columns={'question':'clue'}, inplace=True)
+        bonuses = pd.read_json(os.path.join(dirpath, 'bonuses.json'), lines=True)
+    return {'tossups': tossups, 'bonuses': bonuses}
+
+
+def run_stage(func, data, measure_memory):
+    '''
+    Time one stage, then (optionally) run it again from the same input to
+    find its peak memory. Returns (seconds, rows_in, rows_out, peak_bytes).
+    '''
+    inputs = dict(data)
+    with silenced():
+        start = time.perf_counter()
+        rows_in, rows_out = func(data)
+        seconds = time.perf_counter() - start
+
+    peak_bytes = None
+    if measure_memory:
+        # copy the inputs, since some stages modify them
+        rerun_data = {key: value.copy() for key, value in inputs.items()}
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        with silenced():
+            func(rerun_data)
+        peak_bytes = tracemalloc.get_traced_memory()[1] - start_bytes
+        tracemalloc.stop()
+    return seconds, rows_in, rows_out, peak_bytes
+
+
+def run_suite(sizes, stages, seed=0, measure_memory=True):
+    '''
+    Run the chosen stages at each size.
+
+    Returns (dict): results[str(size)][stage] = {'seconds', 'rows_in',
+    'rows_out', 'questions_per_second', 'rows_per_second', 'peak_bytes'}
+    '''
+    results = {}
+    for size in sizes:
+        print(f"Generating {size} synthetic questions...")
+        data = load_backup(size, seed)
+        results[str(size)] = {}
+        for name, func in STAGES.items():
+            if name not in stages:
+                # later stages need its output, so run it, untimed
+                with silenced():
+                    func(data)
+                continue
+            seconds, rows_in, rows_out, peak_bytes = run_stage(func, data, measure_memory)
+            results[str(size)][name] = {
+                'seconds': seconds,
+                'rows_in': rows_in,
+                'rows_out': rows_out,
+                'questions_per_second': size / seconds,
+                'rows_per_second': rows_in / seconds,
+                'peak_bytes': peak_bytes,
+            }
+            memory = f", peak {peak_bytes / 1024**2:8.1f} MB" if peak_bytes is not None else ""
+            print(f"{size:>9} {name:>20}: {seconds:9.3f}s, {rows_in / seconds:12,.0f} rows/s{memory}")
+            if stages[-1] == name:
+                break
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    '''
+    Print how each result compares to the baseline.
+    Returns (list of str): the stages that regressed, as "size stage metric"
+    '''
+    regressions = []
+    print(f"\nCompared to baseline from {baseline.get('created', 'unknown time')}:")
+    for size, stage_results in results.items():
+        for name, result in stage_results.items():
+            old = baseline.get('results', {}).get(size, {}).get(name)
+            if old is None:
+                print(f"{size:>9} {name:>20}: no baseline")
+                continue
+            time_ratio = result['seconds'] / old['seconds']
+            line = f"{size:>9} {name:>20}: time {time_ratio:5.2f}x"
+            if time_ratio > tolerance:
+                regressions.append(f"{size} {name} time")
+                line += " REGRESSION"
+            if result['peak_bytes'] is not None and old.get('peak_bytes'):
+                memory_ratio = result['peak_bytes'] / old['peak_bytes']
+                line += f", memory {memory_ratio:5.2f}x"
+                if memory_ratio > tolerance:
+                    regressions.append(f"{size} {name} memory")
+                    line += " REGRESSION"
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the backup pipeline")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='numbers of questions to benchmark with')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="don't measure peak memory")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline .json file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save the results as the new baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='slowdown (or memory growth) ratio that counts as a regression')
+    args = parser.parse_args()
+
+    stages = [name for name in STAGES if name in args.stages]
+    results = run_suite(args.sizes, stages, args.seed, measure_memory=not args.no_memory)
+
+    if args.save_baseline:
+        baseline = {'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'machine': platform.platform(),
+                    'python': platform.python_version(),
+                    'seed': args.seed,
+                    'results': results}
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return True
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to make one")
+        return True
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if len(regressions) > 0:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+    return len(regressions) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,186 @@
+'''
+Seeded generator of synthetic tossups and bonuses in QBReader backup format
+(the NDJSON of tossups.json and bonuses.json), for benchmarking the pipeline
+without the real backup.
+
+Questions are made of random words, but have the features the pipeline has
+to deal with: power marks, pronunciation guides, smart and dumb quotes,
+abbreviations, FTP phrases, HTML tags, answer lines with accept/reject
+clauses, MongoDB-style numbers, missing answers, clues repeated between
+questions and answers repeated with small variations.
+
+Usage, from the repository root:
+    python benchmarks/synthetic.py OUT_DIR NUM_QUESTIONS [--seed SEED]
+'''
+import os
+import json
+import random
+import argparse
+
+# share of questions that are tossups; the rest are bonuses
+TOSSUP_SHARE = 0.6
+BONUS_PARTS = 3
+
+CATEGORIES = {
+    'Science': ['Biology', 'Chemistry', 'Physics', 'Other Science'],
+    'Literature': ['American Literature', 'British Literature', 'European Literature'],
+    'History': ['American History', 'European History', 'World History'],
+    'Fine Arts': ['Visual Fine Arts', 'Auditory Fine Arts'],
+    'Religion': ['Religion'],
+    'Mythology': ['Mythology'],
+    'Philosophy': ['Philosophy'],
+    'Social Science': ['Social Science'],
+    'Geography': ['Geography'],
+    'Trash': ['Trash'],
+}
+SYLLABLES = ['ka', 'ro', 'mi', 'ten', 'sa', 'lu', 'dor', 'vi', 'an', 'bel', 'os', 'tri',
+             'gen', 'pa', 'ul', 'zen', 'mor', 'eth', 'qua', 'ris']
+FUNCTION_WORDS = ['the', 'of', 'this', 'a', 'in', 'that', 'his', 'its', 'with', 'for',
+                  'by', 'and', 'one', 'these', 'was', 'is', 'which']
+OPENERS = ['This', 'One', 'In one', 'A', 'During this', 'After', 'With', 'These']
+ABBREVIATIONS = ['Mr.', 'Dr.', 'St.', 'vs.', 'Mt.', 'No.', 'Gen.']
+GIVEAWAYS = ['For 10 points, name this', 'FTP, name this', 'For ten points, identify this',
+             'For 10 points, what', 'Name this']
+
+
+class SyntheticBackup:
+    '''
+    Generates QBReader-style tossup and bonus records from a seed: the same
+    seed always gives the same questions.
+    '''
+
+    def __init__(self, seed=0, vocabulary_size=3000):
+        self.rng = random.Random(seed)
+        self.words = [self._word() for _ in range(vocabulary_size)] + FUNCTION_WORDS * 40
+        self.answers = []
+        self.clues = []
+        self.num_tossups = 0
+        self.num_bonuses = 0
+
+    def _word(self, min_syllables=1, max_syllables=4):
+        return ''.join(self.rng.choices(SYLLABLES, k=self.rng.randint(min_syllables, max_syllables)))
+
+    def _name(self):
+        return ' '.join(self._word(2, 3).capitalize() for _ in range(self.rng.randint(1, 3)))
+
+    def sentence(self):
+        '''One clue sentence, with an occasional special feature.'''
+        rng = self.rng
+        words = rng.choices(self.words, k=rng.randint(8, 30))
+        words.insert(0, rng.choice(OPENERS))
+        feature = rng.random()
+        if feature < 0.08:
+            words.insert(rng.randint(1, len(words)), f"“{' '.join(rng.choices(self.words, k=3)).capitalize()}.”")
+        elif feature < 0.13:
+            words.insert(rng.randint(1, len(words)), f"\"{' '.join(rng.choices(self.words, k=4))}\"")
+        elif feature < 0.20:
+            words.insert(rng.randint(1, len(words)), rng.choice(ABBREVIATIONS) + ' ' + self._name())
+        elif feature < 0.26:
+            name = self._name()
+            guide = rng.choice([f'(“{name.upper()}”)', f'[“{name.lower()}”]', '(pron. ' + name + ')'])
+            words.insert(rng.randint(1, len(words)), name + ' ' + guide)
+        elif feature < 0.29:
+            words.insert(rng.randint(1, len(words)), '<i>' + self._name() + '</i>')
+        elif feature < 0.31:
+            words.append('…')
+        sentence = ' '.join(words) + rng.choice(['.', '.', '.', '?', '!'])
+        # some clues are used in more than one question
+        if rng.random() < 0.05 and len(self.clues) > 0:
+            return rng.choice(self.clues)
+        if len(self.clues) < 100000:
+            self.clues.append(sentence)
+        return sentence
+
+    def answer_line(self):
+        '''An answer line, usually for an answer seen before, with clauses.'''
+        rng = self.rng
+        if len(self.answers) == 0 or rng.random() < 0.3:
+            self.answers.append(self._name())
+        answer = rng.choice(self.answers)
+        line = rng.choice([answer, f'<b><u>{answer}</u></b>', answer.upper(), f'the {answer}'])
+        clause = rng.random()
+        if clause < 0.2:
+            line += f' [accept {rng.choice(self.answers)}; do not accept {rng.choice(self.answers)}]'
+        elif clause < 0.3:
+            line += f' (reject “{rng.choice(self.answers)}”)'
+        elif clause < 0.35:
+            line += f' [or {rng.choice(self.answers)}; prompt on {self._word()}, but do not otherwise reveal]'
+        elif clause < 0.37:
+            line += ' &lt;ed. note&gt;'
+        elif clause < 0.38:
+            line = rng.choice(['', '[MISSING]'])
+        return line
+
+    def _metadata(self, question_type):
+        rng = self.rng
+        category = rng.choice(list(CATEGORIES))
+        year = rng.randint(1998, 2023)
+        record = {
+            'category': category,
+            'subcategory': rng.choice(CATEGORIES[category]),
+            'type': question_type,
+            'difficulty': rng.choice([{'$numberInt': str(rng.randint(1, 10))}, rng.randint(1, 10)]),
+            'setName': f'{year} {rng.choice(["ACF", "NAQT", "PACE", "MOQBA"])} {rng.choice(["Fall", "Regionals", "Nationals"])}',
+            'setYear': rng.choice([{'$numberInt': str(year)}, year]),
+            'updatedAt': {'$date': f'2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00.000Z'},
+        }
+        return record
+
+    def tossup(self):
+        '''One tossup record.'''
+        rng = self.rng
+        sentences = [self.sentence() for _ in range(rng.randint(3, 7))]
+        power_at = rng.randint(1, len(sentences) - 1)
+        sentences[power_at] = sentences[power_at].replace(' ', ' (*) ', 1)
+        giveaway = f"{rng.choice(GIVEAWAYS)} {' '.join(rng.choices(self.words, k=rng.randint(2, 6)))}."
+        self.num_tossups += 1
+        return {'_id': {'$oid': f'{self.num_tossups:024x}'},
+                'question': ' '.join(sentences + [giveaway]),
+                'answer': self.answer_line(),
+                **self._metadata('tossup')}
+
+    def bonus(self):
+        '''One bonus record.'''
+        rng = self.rng
+        leadin = rng.choice([f'For 10 points each, answer the following about {self._word()}.',
+                             self.sentence() + ' For 10 points each:',
+                             f'Name these {self._word()}s, for 10 points each.'])
+        num_parts = BONUS_PARTS if rng.random() < 0.97 else rng.choice([2, 4])
+        parts = [' '.join(self.sentence() for _ in range(rng.randint(1, 3))) +
+                 rng.choice([' For 10 points, name this thing.', ' Name this.', ''])
+                 for _ in range(num_parts)]
+        self.num_bonuses += 1
+        return {'_id': {'$oid': f'{self.num_bonuses:024x}'},
+                'leadin': leadin,
+                'parts': parts,
+                'answers': [self.answer_line() for _ in range(num_parts)],
+                **self._metadata('bonus')}
+
+    def questions(self, num_questions):
+        '''Lists of tossup and bonus records making up num_questions in all.'''
+        num_tossups = int(num_questions * TOSSUP_SHARE)
+        tossups = [self.tossup() for _ in range(num_tossups)]
+        bonuses = [self.bonus() for _ in range(num_questions - num_tossups)]
+        return tossups, bonuses
+
+
+def write_backup(dirpath, num_questions, seed=0):
+    '''
+    Write a synthetic tossups.json and bonuses.json of num_questions questions
+    in all to dirpath, in the format of the QBReader backup.
+    '''
+    os.makedirs(dirpath, exist_ok=True)
+    tossups, bonuses = SyntheticBackup(seed).questions(num_questions)
+    for filename, records in (('tossups.json', tossups), ('bonuses.json', bonuses)):
+        with open(os.path.join(dirpath, filename), 'w') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic QBReader backup")
+    parser.add_argument('out_dir')
+    parser.add_argument('num_questions', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_backup(args.out_dir, args.num_questions, args.seed)
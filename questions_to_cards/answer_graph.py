@@ -0,0 +1,309 @@
+import os
+import glob
+import hashlib
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+import batch_jaro_winkler as bjw # by Dominik Bousquet, https://github.com/dbousque/batch_jaro_winkler
+
+# slack for comparing Jaro upper bounds with thresholds
+BOUND_TOLERANCE = 1e-6
+
+
+def build_answer_model(unique_strs, n_threads=1):
+    '''
+    Build a length-bucketed batch Jaro-Winkler index over a sorted array of
+    unique simple answers: one model per answer length, so queries can skip
+    whole lengths that can't reach the threshold (see jaro_upper_bound()).
+
+    Inputs:
+        - unique_strs (numpy array): sorted unique simple answers
+        - n_threads (int): number of threads each query is scored with
+    Returns (tuple): (dict of answer length -> runtime model over the answers
+    of that length, dict of answer -> its index in unique_strs)
+    '''
+    buckets = {}
+    for unique_str in unique_strs:
+        buckets.setdefault(len(unique_str), []).append(unique_str)
+    models = {length: bjw.build_runtime_model(bjw.build_exportable_model(
+                  bucket_strs, nb_runtime_threads=min(n_threads, len(bucket_strs))))
+              for length, bucket_strs in sorted(buckets.items())}
+    return models, {unique_str: idx for idx, unique_str in enumerate(unique_strs)}
+
+
+def jaro_upper_bound(query_len, candidate_len) -> float:
+    '''
+    Highest Jaro similarity two strings of these lengths can have: at most
+    min(query_len, candidate_len) characters can match, so the score is at
+    most (1 + 1 + shorter/longer) / 3. Strings with no characters score 0.
+    '''
+    shorter, longer = sorted((query_len, candidate_len))
+    if shorter == 0:
+        return 0.0
+    return (2 + shorter / longer) / 3
+
+
+def similar_answers(answer_model, simple_answer, ans_thresh, return_scores=False):
+    '''
+    Find the unique simple answers whose Jaro-Winkler score against
+    simple_answer is above ans_thresh. Only answers whose length allows a
+    score above ans_thresh are scored.
+
+    Inputs:
+        - answer_model (tuple): output of build_answer_model()
+        - simple_answer (str): answer to score against every unique answer
+        - ans_thresh (float): score an answer must exceed to count as similar
+        - return_scores (boolean): also return the similar answers' scores
+    Returns (numpy array): sorted indices into the model's unique answers
+    (and, if return_scores, a numpy array of their scores)
+    '''
+    neighbours, scores = bucket_matches(answer_model, simple_answer, lambda length: ans_thresh)
+    order = np.argsort(neighbours)
+    if return_scores:
+        return neighbours[order], scores[order]
+    return neighbours[order]
+
+
+def bucket_matches(answer_model, simple_answer, bucket_thresh):
+    '''
+    Score simple_answer against every answer length bucket whose Jaro upper
+    bound can exceed that bucket's threshold.
+
+    Inputs:
+        - answer_model (tuple): output of build_answer_model()
+        - simple_answer (str): answer to score
+        - bucket_thresh (function): answer length -> score an answer of that
+        length must exceed
+    Returns (tuple of numpy arrays): unsorted indices of the matching answers
+    and their scores
+    '''
+    models, answer_idxs = answer_model
+    neighbours, scores = [], []
+    for length, rt_model in models.items():
+        thresh = bucket_thresh(length)
+        # scores come back as float32, which can round slightly above the
+        # exact score, so leave some slack in both comparisons below
+        if jaro_upper_bound(len(simple_answer), length) < thresh - BOUND_TOLERANCE:
+            continue
+        min_score = min(max(thresh - BOUND_TOLERANCE, 0.0), 1.0)
+        for matched_str, score in bjw.jaro_distance(rt_model, simple_answer, min_score=min_score):
+            if score > thresh:
+                neighbours.append(answer_idxs[matched_str])
+                scores.append(score)
+    return np.array(neighbours, dtype=np.intp), np.array(scores)
+
+
+def answer_threshold(simple_answer, ans_thresh, all_ans_threshes=None) -> float:
+    '''
+    Jaro-Winkler threshold for one simple answer: the length-based dynamic
+    threshold if a table of them is given, otherwise the fixed ans_thresh.
+    '''
+    if all_ans_threshes is not None:
+        return all_ans_threshes[len(simple_answer)]
+    return ans_thresh
+
+
+def scored_answer_graph(
+        unique_strs,
+        query_mask=None,
+        ans_thresh=0.7,
+        all_ans_threshes=None,
+        n_threads=1) -> sparse.csr_matrix:
+    '''
+    Compute the thresholded answer-similarity graph: an edge from answer a to
+    answer b means b scores above a's Jaro-Winkler threshold against a, so
+    rows with answer b are compared against rows with answer a. The edge
+    holds that score.
+
+    Inputs:
+        - unique_strs (numpy array): sorted unique simple answers
+        - query_mask (numpy array of bools or None): which answers to find
+        neighbours for (e.g. to leave out answers below skip_thresh); all of
+        them if None
+        - ans_thresh (float): fixed threshold, if not using dynamic thresholds
+        - all_ans_threshes (dict or None): output of ans_thresh_hashtable()
+        - n_threads (int): number of threads to score answers with
+    Returns (scipy.sparse.csr_matrix): float32 matrix of shape
+    (len(unique_strs), len(unique_strs)), with sorted indices in each row
+    '''
+    if query_mask is None:
+        query_mask = np.full(len(unique_strs), True)
+    answer_model = build_answer_model(unique_strs, n_threads)
+    sources, targets, scores = [], [], []
+    for query_idx in np.flatnonzero(query_mask):
+        query_str = unique_strs[query_idx]
+        query_thresh = answer_threshold(query_str, ans_thresh, all_ans_threshes)
+        neighbours, neighbour_scores = bucket_matches(answer_model, query_str, lambda length: query_thresh)
+        sources.append(np.full(len(neighbours), query_idx))
+        targets.append(neighbours)
+        scores.append(neighbour_scores)
+    return _edge_matrix(sources, targets, scores, len(unique_strs))
+
+
+def update_answer_graph(
+        old_strs,
+        old_graph,
+        unique_strs,
+        ans_thresh=0.7,
+        all_ans_threshes=None,
+        n_threads=1) -> sparse.csr_matrix:
+    '''
+    Adapt a full scored_answer_graph() to a new answer vocabulary without
+    rescoring the answers both vocabularies share: edges between kept
+    answers are copied over, and only the new answers are scored. Jaro
+    similarity is symmetric, so scoring a new answer b also gives the edges
+    from every other answer a to b (b scores above a's threshold).
+
+    Inputs:
+        - old_strs (numpy array): sorted unique answers old_graph was built on
+        - old_graph (csr_matrix): scored_answer_graph() over all of old_strs
+        - unique_strs (numpy array): sorted unique answers of the new vocabulary
+        - ans_thresh, all_ans_threshes, n_threads: as in scored_answer_graph()
+    Returns (csr_matrix): the same graph scored_answer_graph() would build
+    over all of unique_strs
+    '''
+    # where each old answer is in the new vocabulary, if it still is
+    new_positions = np.searchsorted(unique_strs, old_strs)
+    in_range = new_positions < len(unique_strs)
+    kept = np.full(len(old_strs), False)
+    kept[in_range] = unique_strs[new_positions[in_range]] == old_strs[in_range]
+    is_new = np.full(len(unique_strs), True)
+    is_new[new_positions[kept]] = False
+
+    old_edges = old_graph.tocoo()
+    kept_edges = kept[old_edges.row] & kept[old_edges.col]
+    sources = [new_positions[old_edges.row[kept_edges]]]
+    targets = [new_positions[old_edges.col[kept_edges]]]
+    scores = [old_edges.data[kept_edges]]
+
+    threshes = np.array([answer_threshold(unique_str, ans_thresh, all_ans_threshes)
+                         for unique_str in unique_strs])
+    length_threshes = {len(unique_str): thresh for unique_str, thresh in zip(unique_strs, threshes)}
+    answer_model = build_answer_model(unique_strs, n_threads)
+    for query_idx in np.flatnonzero(is_new):
+        query_str = unique_strs[query_idx]
+        query_thresh = threshes[query_idx]
+        # score once, low enough for the edges in both directions
+        neighbours, neighbour_scores = bucket_matches(
+            answer_model, query_str, lambda length: min(query_thresh, length_threshes[length]))
+        outgoing = neighbour_scores > query_thresh
+        sources.append(np.full(outgoing.sum(), query_idx))
+        targets.append(neighbours[outgoing])
+        scores.append(neighbour_scores[outgoing])
+        # edges between two new answers come from scoring the other one
+        incoming = (neighbour_scores > threshes[neighbours]) & ~is_new[neighbours]
+        sources.append(neighbours[incoming])
+        targets.append(np.full(incoming.sum(), query_idx))
+        scores.append(neighbour_scores[incoming])
+    return _edge_matrix(sources, targets, scores, len(unique_strs))
+
+
+def _edge_matrix(sources, targets, scores, n_answers) -> sparse.csr_matrix:
+    if len(sources) == 0:
+        sources = targets = [np.empty(0, dtype=np.intp)]
+        scores = [np.empty(0)]
+    graph = sparse.csr_matrix((np.concatenate(scores).astype(np.float32),
+                               (np.concatenate(sources), np.concatenate(targets))),
+                              shape=(n_answers, n_answers))
+    graph.sort_indices()
+    return graph
+
+
+def answer_graph_filepath(cache_dir, unique_strs, ans_thresh=0.7, all_ans_threshes=None) -> str:
+    '''
+    Where a cached answer graph is kept: the file name holds a hash of the
+    threshold settings, then a hash of the answer vocabulary.
+    '''
+    settings = repr((ans_thresh, sorted(all_ans_threshes.items()) if all_ans_threshes is not None else None))
+    settings_hash = hashlib.sha1(settings.encode()).hexdigest()[:16]
+    vocabulary_hash = hashlib.sha1()
+    for unique_str in unique_strs:
+        vocabulary_hash.update(unique_str.encode() + b'\x00')
+    return os.path.join(cache_dir, f"answer_graph_{settings_hash}_{vocabulary_hash.hexdigest()[:16]}.npz")
+
+
+def save_answer_graph(filepath, unique_strs, graph):
+    '''Write an answer graph and the vocabulary it was built on to a compressed .npz file.'''
+    np.savez_compressed(filepath, vocabulary=np.array(unique_strs, dtype=str),
+                        data=graph.data, indices=graph.indices, indptr=graph.indptr,
+                        shape=np.array(graph.shape))
+
+
+def load_answer_graph(filepath):
+    '''Read a file written by save_answer_graph(). Returns (unique_strs, graph).'''
+    with np.load(filepath) as saved:
+        unique_strs = np.array(saved['vocabulary'].tolist(), dtype=object)
+        graph = sparse.csr_matrix((saved['data'], saved['indices'], saved['indptr']),
+                                  shape=tuple(saved['shape']))
+    return unique_strs, graph
+
+
+def cached_answer_graph(unique_strs, cache_dir, ans_thresh=0.7, all_ans_threshes=None, n_threads=1):
+    '''
+    Return the full scored_answer_graph() over unique_strs, from cache_dir if
+    it was computed before with the same vocabulary and thresholds. If not,
+    but a graph with the same thresholds and another vocabulary is cached,
+    the most recent one is updated with update_answer_graph(), so only new
+    answers get scored. The result is cached either way.
+    '''
+    filepath = answer_graph_filepath(cache_dir, unique_strs, ans_thresh, all_ans_threshes)
+    if os.path.exists(filepath):
+        print(f"Loading cached answer graph from {filepath}...")
+        return load_answer_graph(filepath)[1]
+
+    settings_prefix = filepath.rsplit('_', 1)[0]
+    previous = sorted(glob.glob(f"{settings_prefix}_*.npz"), key=os.path.getmtime)
+    if len(previous) > 0:
+        print(f"Updating cached answer graph {previous[-1]} with new answers...")
+        old_strs, old_graph = load_answer_graph(previous[-1])
+        graph = update_answer_graph(old_strs, old_graph, unique_strs, ans_thresh,
+                                    all_ans_threshes, n_threads)
+    else:
+        print("Scoring every pair of answers...")
+        graph = scored_answer_graph(unique_strs, None, ans_thresh, all_ans_threshes, n_threads)
+    os.makedirs(cache_dir, exist_ok=True)
+    save_answer_graph(filepath, unique_strs, graph)
+    return graph
+
+
+def answer_neighbour_graph(
+        unique_strs,
+        query_mask=None,
+        ans_thresh=0.7,
+        all_ans_threshes=None,
+        n_threads=1,
+        cache_dir=None) -> sparse.csr_matrix:
+    '''
+    scored_answer_graph(), computed only for the answers in query_mask, or,
+    if cache_dir is given, read from (or added to) the cache there with
+    cached_answer_graph(), which always covers every answer.
+
+    Inputs:
+        - unique_strs, query_mask, ans_thresh, all_ans_threshes, n_threads:
+        as in scored_answer_graph()
+        - cache_dir (str or None): directory of cached answer graphs
+    Returns (csr_matrix): edges from the answers in query_mask only
+    '''
+    if cache_dir is None:
+        return scored_answer_graph(unique_strs, query_mask, ans_thresh, all_ans_threshes, n_threads)
+
+    graph = cached_answer_graph(unique_strs, cache_dir, ans_thresh, all_ans_threshes, n_threads)
+    if query_mask is not None:
+        edges = graph.tocoo()
+        keep = query_mask[edges.row]
+        graph = _edge_matrix([edges.row[keep]], [edges.col[keep]], [edges.data[keep]], len(unique_strs))
+    return graph
+
+
+def answer_components(graph) -> np.ndarray:
+    '''
+    Label the connected components of an answer-similarity graph. Rows whose
+    answers are in different components never interact during redundancy
+    removal, so each component can be processed independently.
+
+    Inputs:
+        - graph (csr_matrix): output of answer_neighbour_graph()
+    Returns (numpy array): component label for each unique answer
+    '''
+    _, labels = connected_components(graph, directed=True, connection='weak')
+    return labels
@@ -0,0 +1,96 @@
+import pandas as pd
+
+AUDIT_COLUMNS = ['kept_row', 'deleted_row', 'kept_clue', 'deleted_clue',
+                 'answer_score', 'clue_overlap', 'ans_thresh', 'clue_thresh',
+                 'reason']
+
+# Parquet types of AUDIT_COLUMNS, for a log with no records
+AUDIT_TYPES = {'kept_row': 'int64', 'deleted_row': 'int64', 'kept_clue': 'string',
+               'deleted_clue': 'string', 'answer_score': 'float64', 'clue_overlap': 'float64',
+               'ans_thresh': 'float64', 'clue_thresh': 'float64', 'reason': 'string'}
+
+# reasons a row can be deleted
+SHORTER_MATCH = 'shorter_match'  # deleted row is a shorter match of the kept row
+LONGER_MATCH = 'longer_match'  # kept row is a longer match of the deleted row
+
+
+class AuditLog:
+    '''
+    Structured record of every deletion made by remove_redundancies(): which
+    row was kept, which was deleted, their answer similarity and clue overlap
+    scores, and the thresholds those scores were compared against.
+
+    Records are buffered in memory and written to a Parquet file in batches
+    of batch_size rows, so logging costs almost nothing per deletion. Without
+    a filepath, records are only kept in memory (see to_frame()).
+    '''
+
+    def __init__(self, filepath=None, batch_size=50000):
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self.num_records = 0
+        self._buffer = {column: [] for column in AUDIT_COLUMNS}
+        self._frames = []
+        self._writer = None
+
+    def record(self, kept_row, deleted_row, kept_clue, deleted_clue,
+               answer_score, clue_overlap, ans_thresh, clue_thresh, reason):
+        '''Add one deletion to the log.'''
+        for column, value in zip(AUDIT_COLUMNS, (kept_row, deleted_row, kept_clue, deleted_clue,
+                                                 answer_score, clue_overlap, ans_thresh,
+                                                 clue_thresh, reason)):
+            self._buffer[column].append(value)
+        self.num_records += 1
+        if len(self._buffer['kept_row']) >= self.batch_size:
+            self.flush()
+
+    def extend(self, records):
+        '''Add a DataFrame of deletions (e.g. from a worker process) to the log.'''
+        self.flush()
+        self.num_records += len(records)
+        self._write(records.loc[:, AUDIT_COLUMNS])
+
+    def flush(self):
+        '''Write out any buffered records.'''
+        if len(self._buffer['kept_row']) == 0:
+            return
+        batch = pd.DataFrame(self._buffer, columns=AUDIT_COLUMNS)
+        self._buffer = {column: [] for column in AUDIT_COLUMNS}
+        self._write(batch)
+
+    def _write(self, batch):
+        if len(batch) == 0:
+            return
+        if self.filepath is None:
+            self._frames.append(batch)
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(batch, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.filepath, table.schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def to_frame(self) -> pd.DataFrame:
+        '''Return every record kept in memory as a DataFrame.'''
+        self.flush()
+        if len(self._frames) == 0:
+            return pd.DataFrame(columns=AUDIT_COLUMNS)
+        return pd.concat(self._frames, ignore_index=True)
+
+    def close(self):
+        '''
+        Flush remaining records and close the Parquet file. A log with no
+        records is still written, as an empty file, so it can be read like
+        any other.
+        '''
+        self.flush()
+        if self._writer is None and self.filepath is not None:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([(column, pa.type_for_alias(AUDIT_TYPES[column])) for column in AUDIT_COLUMNS])
+            pq.write_table(schema.empty_table(), self.filepath)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
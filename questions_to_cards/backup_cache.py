@@ -0,0 +1,165 @@
+import os
+import json
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from tqdm import tqdm
+from clue_schema import mongo_fix_column, mongo_string_column
+
+# question metadata fields the pipeline uses (backup_to_cards.COLUMNS_TO_KEEP
+# other than clue and answer)
+QUESTION_METADATA = ['subcategory', 'category', 'type', 'difficulty', 'setName', 'setYear']
+# fields of each backup file kept in its cache: a question's text and
+# answer(s), its metadata, and its MongoDB id and last update time
+CACHE_COLUMNS = {'tossups.json': ['_id', 'updatedAt', 'question', 'answer'] + QUESTION_METADATA,
+                 'bonuses.json': ['_id', 'updatedAt', 'leadin', 'parts', 'answers'] + QUESTION_METADATA}
+LIST_COLUMNS = ['parts', 'answers']
+INT_COLUMNS = ['difficulty', 'setYear']
+MONGO_STRING_COLUMNS = ['_id', 'updatedAt']
+
+# Arrow schema metadata entry describing the source file a cache was made from
+CACHE_METADATA_KEY = b'backup_cache'
+# questions converted (and stored in one record batch) at a time
+CONVERT_CHUNK_SIZE = 50000
+
+
+def cache_filepath(filepath) -> str:
+    '''Where the columnar cache of a backup file is kept: next to it.'''
+    return filepath + '.arrow'
+
+
+def cache_schema(columns) -> pa.Schema:
+    '''Arrow types of the cached columns.'''
+    fields = []
+    for column in columns:
+        if column in LIST_COLUMNS:
+            fields.append(pa.field(column, pa.list_(pa.string())))
+        elif column in INT_COLUMNS:
+            fields.append(pa.field(column, pa.int64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+def _source_stats(filepath) -> dict:
+    stat = os.stat(filepath)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _cacheable(questions, columns) -> pa.RecordBatch:
+    '''
+    One chunk of a backup file as a record batch of the cached columns:
+    MongoDB integers, ids and dates are fixed, and missing fields are null.
+    '''
+    arrays = []
+    for field in cache_schema(columns):
+        if field.name not in questions.columns:
+            arrays.append(pa.nulls(len(questions), field.type))
+            continue
+        values = questions.loc[:,field.name]
+        if field.name in INT_COLUMNS:
+            values = mongo_fix_column(values)
+        elif field.name in MONGO_STRING_COLUMNS:
+            values = mongo_string_column(values)
+        arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.RecordBatch.from_arrays(arrays, schema=cache_schema(columns))
+
+
+def convert_backup_file(filepath, columns, chunksize=CONVERT_CHUNK_SIZE) -> str:
+    '''
+    Convert a QBReader backup file (NDJSON) into an Arrow IPC file of just
+    the given columns, which can be memory-mapped and read a column at a
+    time. The source file's size and modification time are kept in the
+    cache, so it can be told apart from a newer backup.
+
+    Inputs:
+        -filepath (str): e.g. 'tossups.json'
+        -columns (list of str): fields to keep, see CACHE_COLUMNS
+        -chunksize (int): questions to convert at a time
+    Returns (str): path of the cache
+    '''
+    cache_path = cache_filepath(filepath)
+    metadata = {CACHE_METADATA_KEY: json.dumps({'source': _source_stats(filepath), 'columns': columns})}
+    schema = cache_schema(columns).with_metadata(metadata)
+    temp_path = cache_path + '.tmp'
+    with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        with pd.read_json(filepath, lines=True, chunksize=chunksize) as reader:
+            for questions in tqdm(reader, desc=f"Converting {filepath}"):
+                writer.write_batch(_cacheable(questions, columns))
+    os.replace(temp_path, cache_path)
+    return cache_path
+
+
+def cache_is_current(filepath, columns) -> bool:
+    '''
+    Whether the cache of filepath was made from the file as it is now (same
+    size and modification time) and has all of columns.
+    '''
+    try:
+        with pa.memory_map(cache_filepath(filepath)) as source:
+            schema = pa.ipc.open_file(source).schema
+        metadata = json.loads(schema.metadata[CACHE_METADATA_KEY])
+    except (OSError, KeyError, TypeError, ValueError, pa.ArrowInvalid):
+        return False
+    return metadata['source'] == _source_stats(filepath) and set(columns) <= set(schema.names)
+
+
+def filter_table(table, filters) -> pa.Table:
+    '''
+    Keep only the rows of an Arrow table of questions that match every one
+    of filters (as made by backup_to_cards.question_filters()).
+    '''
+    mask = None
+    for column, values in filters.items():
+        if column not in table.column_names:
+            return table.slice(0, 0)
+        value_set = pa.array(values, type=table.schema.field(column).type)
+        matches = pc.is_in(table[column], value_set=value_set)
+        mask = matches if mask is None else pc.and_(mask, matches)
+    return table.filter(mask) if mask is not None else table
+
+
+def read_cache_table(filepath, columns=None, filters=None) -> pa.Table:
+    '''
+    Memory-map the cache of filepath as an Arrow table of only the given
+    columns (all by default) and the rows that match filters, so only the
+    columns and rows used are ever read from disk.
+    '''
+    with pa.memory_map(cache_filepath(filepath)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    if filters is not None:
+        table = filter_table(table, filters)
+    if columns is not None:
+        table = table.select([column for column in columns if column in table.column_names])
+    return table
+
+
+def cache_chunks(filepath, columns=None, filters=None, chunksize=CONVERT_CHUNK_SIZE):
+    '''
+    Yield the questions read by read_cache_table() as DataFrames of
+    chunksize rows or fewer.
+    '''
+    for batch in read_cache_table(filepath, columns, filters).to_batches(max_chunksize=chunksize):
+        yield batch.to_pandas()
+
+
+def read_cache(filepath, columns=None, filters=None) -> pd.DataFrame:
+    '''Read the questions read by read_cache_table() into one DataFrame.'''
+    return read_cache_table(filepath, columns, filters).to_pandas()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Convert the QBReader backup files in a directory into columnar caches "
+                    "that backup_to_cards.intake() reads instead.")
+    parser.add_argument('backup_dir', nargs='?', default='.',
+                        help="directory with tossups.json and bonuses.json")
+    args = parser.parse_args()
+
+    for filename, columns in CACHE_COLUMNS.items():
+        filepath = os.path.join(args.backup_dir, filename)
+        if cache_is_current(filepath, columns):
+            print(f"{cache_filepath(filepath)} is up to date")
+        else:
+            print(f"Wrote {convert_backup_file(filepath, columns)}")
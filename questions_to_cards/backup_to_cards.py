@@ -10,33 +10,149 @@ import pandas as pd
 import numpy as np
 import re
 import os
+import json
+import argparse
 from datetime import datetime
 from tqdm import tqdm
 from text_processing import tokenize_and_explode, cleanup, my_split, clean_clue_text, clean_answer_text
 from utility import write_out
+from clue_schema import compact_dtypes, mongo_fix, mongo_fix_column, mongo_string_column, SMALL_INT_COLUMNS
+from backup_cache import (CACHE_COLUMNS, cache_filepath, cache_is_current, convert_backup_file,
+                          cache_chunks, read_cache, read_cache_table)
+from checkpoints import (Stage, run_stages, source_key, save_checkpoint, load_checkpoint,
+                         DEFAULT_CHECKPOINT_DIR)
 from similarity import remove_redundancies
 
 tqdm.pandas()
 
-NUM_BONUS_PARTS = 3
+#bonuses have between 1 and this many parts, each with its own answer
+MAX_BONUS_PARTS = 6
 
 COLUMNS_TO_KEEP = ['clue', 'answer', 'subcategory', 'category', 'type', 
                    'difficulty', 'setName', 'setYear']
 
-def intake():
-    '''Read in tossups.json and bonuses.json'''
+#columns questions can be filtered on as they're read in, see question_filters()
+FILTER_COLUMNS = ['category', 'subcategory', 'difficulty', 'setYear', 'setName', 'type']
+#questions read at a time from a backup file when filtering it
+INTAKE_CHUNK_SIZE = 50000
+
+def intake(filters=None):
+    '''
+    Read in tossups.json and bonuses.json. With filters (see
+    question_filters()), the files are read a chunk at a time and only the
+    matching questions are kept, so the rest of the pipeline never sees the
+    others; a file whose question type is filtered out isn't read at all.
+    '''
 
     assert ('tossups.json' in os.listdir() and
             'bonuses.json' in os.listdir()), "You don't have the qbreader backup files in this directory!"
     
-    tossups = pd.read_json("tossups.json",lines=True)
+    tossups = read_backup_file("tossups.json", 'tossup', filters)
     tossups.rename(columns={'question':'clue'}, inplace=True)
 
-    bonuses = pd.read_json("bonuses.json",lines=True)
+    bonuses = read_backup_file("bonuses.json", 'bonus', filters)
 
     return tossups, bonuses
 
 
+def question_filters(categories=None, subcategories=None, difficulties=None, years=None,
+                     set_names=None, question_types=None):
+    '''
+    Make the filters that intake(), run() and run_streaming() take to only
+    use some of the questions in the backup. Leave an argument as None to not
+    filter on it.
+
+    Inputs:
+        -categories, subcategories, set_names (lists of str)
+        -difficulties (list of ints): 1 to 10, or 0 for questions without one
+        -years (list of ints)
+        -question_types (list of str): 'tossup' and/or 'bonus'
+    Returns (dict or None): column -> sorted list of values to keep, or None
+    if nothing is filtered
+    '''
+    values = {'category': categories, 'subcategory': subcategories, 'difficulty': difficulties,
+              'setYear': years, 'setName': set_names, 'type': question_types}
+    filters = {column: sorted(set(values[column])) for column in FILTER_COLUMNS
+               if values[column] is not None}
+    return filters if len(filters) > 0 else None
+
+
+def filter_questions(questions, filters):
+    '''
+    Keep only the rows of a table of tossups or bonuses that match every one
+    of filters (see question_filters()). Matches years and difficulties after
+    fixing them with mongo_fix_column(), and keeps the fixed columns.
+    '''
+    keep = np.ones(len(questions), dtype=bool)
+    for column, values in filters.items():
+        if column not in questions.columns:
+            keep[:] = False
+            break
+        if column in ('setYear', 'difficulty'):
+            questions[column] = mongo_fix_column(questions.loc[:,column])
+        keep &= questions.loc[:,column].isin(values).to_numpy()
+    return questions.loc[keep,:]
+
+
+def use_backup_cache(filepath) -> bool:
+    '''
+    Whether filepath has a columnar cache (see backup_cache.py) to read
+    instead. A cache made from an older version of the file is rebuilt.
+    '''
+    if not os.path.exists(cache_filepath(filepath)):
+        return False
+    columns = CACHE_COLUMNS[os.path.basename(filepath)]
+    if not cache_is_current(filepath, columns):
+        print(f"{filepath} has changed since it was cached. Converting it again...")
+        convert_backup_file(filepath, columns)
+    return True
+
+
+def backup_chunks(filepath, question_type, filters=None, chunksize=INTAKE_CHUNK_SIZE):
+    '''
+    Yield the questions in a backup file chunksize at a time, with only the
+    ones that match filters (see question_filters()) in each chunk, skipping
+    chunks with none. Yields nothing without reading the file if filters
+    rule out all questions of question_type. Reads just the fields the
+    pipeline uses from the file's columnar cache, if it has one.
+    '''
+    if filters is not None and question_type not in filters.get('type', [question_type]):
+        return
+    if use_backup_cache(filepath):
+        #filtered as it's read
+        yield from cache_chunks(filepath, backup_file_columns(filepath), filters, chunksize)
+        return
+    with pd.read_json(filepath, lines=True, chunksize=chunksize) as reader:
+        for questions in reader:
+            if filters is not None:
+                questions = filter_questions(questions, filters)
+            if len(questions) > 0:
+                yield questions
+
+
+def read_backup_file(filepath, question_type, filters=None):
+    '''
+    Read a backup file of questions of question_type ('tossup' or 'bonus'),
+    keeping only the ones that match filters (see question_filters()).
+    '''
+    if filters is None:
+        if use_backup_cache(filepath):
+            return read_cache(filepath, backup_file_columns(filepath))
+        return pd.read_json(filepath, lines=True)
+    chunks = list(backup_chunks(filepath, question_type, filters))
+    if len(chunks) == 0:
+        #none of this type wanted: just get the columns
+        if use_backup_cache(filepath):
+            return read_cache_table(filepath, backup_file_columns(filepath)).slice(0, 0).to_pandas()
+        return pd.read_json(filepath, lines=True, nrows=1).iloc[:0]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def backup_file_columns(filepath):
+    '''The fields of a backup file the pipeline uses, which are all cached.'''
+    return CACHE_COLUMNS[os.path.basename(filepath)]
+
+
 def max_tossup_length(tossups):
     '''Find the length of the longest tossup in the database. This is used to
     set pd.options.display.max_colwidth, which needs to be at least as wide
@@ -55,66 +171,69 @@ def max_tossup_length(tossups):
     return curr_max
   
 
-def reformat(bonuses):
+def reformat(bonuses, extra_columns=()):
     '''
     Changes the bonuses table to a format where each component of the bonus
-    (leadin, part 1, part 2, part 3) has its own row with a clue and its
-    corresponding answer.
-    #TODO: consider making more "panda-ic" with .stack()
+    (leadin, part 1, part 2, ...) has its own row with a clue and its
+    corresponding answer. The leadin is paired with the first part's answer.
+
+    Rows come out in the same order as before: every leadin, then every
+    first part, then every second part, and so on.
     Inputs:
         -bonuses (pandas DataFrame)
+        -extra_columns (list of str): columns to keep besides COLUMNS_TO_KEEP
     Returns (pandas DataFrame): transformed table
     '''
-    #Filter out bonuses with the wrong number of parts. 
-    #TODO: Generalize this to handle bonuses with a number of parts other than 3 (min is 0, max is 6)
-    #https://intellipaat.com/community/31700/pythonic-way-for-calculating-length-of-lists-in-pandas-dataframe-column
-    parts_clean_filter = bonuses.loc[:,'parts'].str.len() == NUM_BONUS_PARTS
-    answers_clean_filter = bonuses.loc[:,'answers'].str.len() == NUM_BONUS_PARTS
+    #Filter out bonuses whose parts and answers can't be paired up
+    num_parts = bonuses.loc[:,'parts'].str.len()
+    num_answers = bonuses.loc[:,'answers'].str.len()
+    clean_filter = (num_parts == num_answers) & num_parts.between(1, MAX_BONUS_PARTS)
 
     len_before = len(bonuses)
-    bonuses = bonuses.loc[parts_clean_filter & answers_clean_filter,:]
-    print(f"{len_before - len(bonuses)} rows eliminated for having non-standard number of parts or answers")
-
-    #make columns ['part1', 'answer1', 'part2', 'answer2', 'part3', 'answer3']
-    for num in range(NUM_BONUS_PARTS):
-        bonuses.loc[:,'part' + str(num+1)] = [i[num] for i in bonuses.loc[:,'parts']]
-        bonuses.loc[:,'answer' + str(num+1)] = [i[num] for i in bonuses.loc[:,'answers']]
-
-    #Get a dataframe whose columns are just "Clue" - "Answer", stacking parts atop
-    #each other like this for each bonus:
+    bonuses = bonuses.loc[clean_filter,:]
+    print(f"{len_before - len(bonuses)} rows eliminated for having unmatched or too many parts or answers")
+
+    #one entry per part, all bonuses' parts end to end
+    num_parts = num_parts.loc[clean_filter].to_numpy(dtype=np.int64)
+    part_clues = bonuses.loc[:,'parts'].explode().to_numpy()
+    part_answers = bonuses.loc[:,'answers'].explode().to_numpy()
+    part_bonus = np.repeat(np.arange(len(bonuses)), num_parts)
+    first_part = np.cumsum(num_parts) - num_parts
+    part_number = np.arange(len(part_bonus)) - first_part[part_bonus] + 1
+
+    #stack each bonus's leadin (as part 0) atop its parts, like this:
         #leadin : answer1
         #part1  : answer1
         #part2  : answer2
-        #part3  : answer3
-    #rename is needed for pd.concat to stack properly
-    clue_answer_pairs = pd.concat(
-        (bonuses.loc[:,['leadin','answer1']].copy().rename(columns={'leadin':'clue', 'answer1':'answer'}),
-        bonuses.loc[:,['part1','answer1']].copy().rename(columns={'part1':'clue', 'answer1':'answer'}),
-        bonuses.loc[:,['part2','answer2']].copy().rename(columns={'part2':'clue', 'answer2':'answer'}),
-        bonuses.loc[:,['part3','answer3']].copy().rename(columns={'part3':'clue', 'answer3':'answer'})),
-                                axis=0)
-
-    bonus_parts = pd.concat([bonuses.copy()] * 4, axis=0)
-
+        #...
+    #then sort stably by part number so all leadins come first
+    bonus_row = np.concatenate((np.arange(len(bonuses)), part_bonus))
+    part_number = np.concatenate((np.zeros(len(bonuses), dtype=np.int64), part_number))
+    clue = np.concatenate((bonuses.loc[:,'leadin'].to_numpy(dtype=object), part_clues))
+    answer = np.concatenate((part_answers[first_part], part_answers))
+    order = np.argsort(part_number, kind='stable')
+
+    #metadata is looked up by row position, once per output row
+    metadata = [column for column in COLUMNS_TO_KEEP if column not in ('clue', 'answer')] + list(extra_columns)
+    bonus_parts = bonuses.loc[:,metadata].take(bonus_row[order])
     bonus_parts.reset_index(inplace=True, drop=True)
-    clue_answer_pairs.reset_index(inplace=True, drop=True)
+    bonus_parts.insert(0, 'clue', clue[order])
+    bonus_parts.insert(1, 'answer', answer[order])
+    bonus_parts.loc[part_number[order] == 0, 'type'] = 'bonus_leadin'
 
-    bonus_parts = pd.concat((bonus_parts,clue_answer_pairs),axis=1).loc[:,COLUMNS_TO_KEEP]
-
-    #assign the first quarter of the rows a type of 'bonus_leadin' and it should work
-    bonus_parts.loc[0:len(bonus_parts) // 4 - 1, 'type'] = 'bonus_leadin'
-    
     return bonus_parts
 
 
-def put_together(tossups, bonus_parts):
+def put_together(tossups, bonus_parts, extra_columns=()):
     '''
-    Combines the tossup df and the bonuses df.
+    Combines the tossup df and the bonuses df, keeping the columns in
+    COLUMNS_TO_KEEP and any extra_columns.
     Don't call this until bonus parts are reformatted!
     '''
-    assert list(bonus_parts.columns) == COLUMNS_TO_KEEP, "Bonus parts are not properly processed yet!"
+    columns = COLUMNS_TO_KEEP + list(extra_columns)
+    assert list(bonus_parts.columns) == columns, "Bonus parts are not properly processed yet!"
 
-    tossups = tossups.rename(columns={'question':'clue'}).loc[:,COLUMNS_TO_KEEP]
+    tossups = tossups.rename(columns={'question':'clue'}).loc[:,columns]
 
     clues = pd.concat((tossups, bonus_parts), axis=0)
     clues.reset_index(drop=True, inplace=True)
@@ -122,23 +241,11 @@ def put_together(tossups, bonus_parts):
     return clues
 
 
-def mongo_fix(obj):
-    '''Turns a MongoDB representation of an integer from the QBReader database
-    into an integer. Uses 0 for missing values.
-    
-    Inputs:
-        -obj (dict): the {$...} JSON object
-    Returns (int): Integer representation'''
+#reduce redundant subcats like "Religion::Religion" to just cat
+REDUNDANT_SUBCAT_RE = re.compile(r"(Religion|Mythology|Philosophy|Social Science|Geography|Current Events|Trash)::\1")
 
-    if type(obj) == int:
-        return obj
-
-    strobj = str(obj)
-    try:
-        fixed_obj = int(re.search(r"[0-9]{1,4}", strobj).group(0))
-    except AttributeError:
-        fixed_obj = 0
-    return fixed_obj
+#columns that go into a clue's tags
+TAG_COLUMNS = ['category', 'subcategory', 'difficulty', 'setYear', 'type', 'len']
 
 
 def tagstring(row):
@@ -166,8 +273,7 @@ def tagstring(row):
 
     tag_str = f"cat::{cat}::{subcat} diff::{diff} yr::{yr} type::{type} length::{length}"
     #reduce redundant subcats like "Religion::Religion" to just cat
-    CAT_RE = re.compile(r"(Religion|Mythology|Philosophy|Social Science|Geography|Current Events|Trash)::\1")
-    tag_str = re.sub(CAT_RE, r"\1", tag_str)
+    tag_str = re.sub(REDUNDANT_SUBCAT_RE, r"\1", tag_str)
     return tag_str
 
     #TODO: a tag for if the clue has no pronoun, to flag as a possible non-clue
@@ -175,6 +281,52 @@ def tagstring(row):
     # re.IGNORECASE)
     
 
+def category_tag(cat, subcat):
+    '''
+    Creates the "cat::Science::Biology" part of a clue's tags, as tagstring()
+    does, with redundant subcats like "Religion::Religion" reduced to just cat.
+    Inputs:
+        -cat (str), subcat (str): category and subcategory (NaN if missing)
+    Returns (str): category tag
+    '''
+    #Anki tags cannot have spaces in their names
+    cat = cat.replace(' ', '') if isinstance(cat, str) else "NA"
+    subcat = subcat.replace(' ', '') if isinstance(subcat, str) else "NA"
+    return re.sub(REDUNDANT_SUBCAT_RE, r"\1", f"cat::{cat}::{subcat}")
+
+
+def tagstrings(clues):
+    '''
+    tagstring() for every row of the clues DataFrame at once. Rows are grouped
+    by their tag columns, so each distinct combination of category,
+    subcategory, difficulty, year, type and length gets its tag string built
+    once (with string operations over those few combinations), and the
+    category part once per category pair.
+    Input:
+        -clues (pandas DataFrame): with all the TAG_COLUMNS
+    Returns (pandas Series of str): tag strings, with the same index as clues
+    '''
+    groups = clues.groupby(TAG_COLUMNS, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    #one row per combination, in group number order
+    first_rows = np.unique(groups, return_index=True)[1]
+    combos = clues.iloc[first_rows].loc[:,TAG_COLUMNS].reset_index(drop=True)
+
+    pair_tags = {}
+    cat_tags = []
+    for pair in zip(combos['category'], combos['subcategory']):
+        if pair not in pair_tags:
+            pair_tags[pair] = category_tag(*pair)
+        cat_tags.append(pair_tags[pair])
+    cat_tags = pd.Series(cat_tags, dtype=object)
+
+    combo_tags = (cat_tags
+                  + " diff::" + combos['difficulty'].astype(str).astype(object)
+                  + " yr::" + combos['setYear'].astype(str).astype(object)
+                  + " type::" + combos['type'].astype(str).astype(object)
+                  + " length::" + combos['len'].astype(str).astype(object))
+    return pd.Series(combo_tags.to_numpy()[groups], index=clues.index)
+
+
 ###TESTS###  
 
 def single_question_test(qtext, atext=''):
@@ -229,7 +381,8 @@ def answer_lines_test(write_to_file=True):
         return tossups.loc[:,'answer']
 
 
-def intake_test(tokenized=True, add_len_col=True, drop_repeats=True, clean_up=True):
+def intake_test(tokenized=True, add_len_col=True, drop_repeats=True, clean_up=True,
+                arrow_strings=False, n_workers=None):
     '''
     Simplified version of run(). For use in testing environments such as iPython 
     '''
@@ -237,35 +390,78 @@ def intake_test(tokenized=True, add_len_col=True, drop_repeats=True, clean_up=Tr
     tossups, bonuses = intake(); 
     print("Putting tossups and bonuses in single sheet:")
     clues = put_together(tossups, reformat(bonuses))
+
+    clues['setYear'] = mongo_fix_column(clues.loc[:,'setYear'])
+    clues['difficulty'] = mongo_fix_column(clues.loc[:,'difficulty'])
+    clues = compact_dtypes(clues, arrow_strings=arrow_strings)
+
     if tokenized:
         print("Splitting questions into clues...")
-        clues = tokenize_and_explode(clues)
-    
-    clues.loc[:,'setYear'] = clues.loc[:,'setYear'].apply(lambda x: mongo_fix(x))
-    clues.loc[:,'difficulty'] = clues.loc[:,'difficulty'].apply(lambda x: mongo_fix(x))
+        clues = tokenize_and_explode(clues, n_workers=n_workers)
 
     if add_len_col:
         print("Adding a column for clue length...")
-        clues.loc[:,'len'] = clues.loc[:,'clue'].str.len()
+        clues['len'] = clues.loc[:,'clue'].str.len().astype(SMALL_INT_COLUMNS['len'])
 
     if drop_repeats:
         print("Eliminating repeat clues...") #removes about 103536 rows
         clues.drop_duplicates('clue', inplace=True)
 
     if clean_up:
-        clues = cleanup(clues)
+        clues = cleanup(clues, n_workers=n_workers, dedupe=not drop_repeats)
 
     print("Done")
     return clues
 
-def run(normalize_len=True, write_to_file=True):
+def split_questions(clues, arrow_strings=False, n_workers=None):
     '''
-    Runs the whole data transformation pipeline to turn QBReader database backups
-    into a file that is ready to import into Anki as flashcards.
-    #TODO: Add some parameters to restrict to subsets of the data
+    Fix the MongoDB columns, compact column types and split questions into
+    one row per clue, with a column for clue length: the steps of run()
+    between put_together() and eliminating repeat clues.
+    '''
+    #done before splitting, so there's one value per question to fix rather
+    #than one per clue
+    print("Fixing MongoDB junk in columns...")
+    clues['setYear'] = mongo_fix_column(clues.loc[:,'setYear'])
+    clues['difficulty'] = mongo_fix_column(clues.loc[:,'difficulty'])
+
+    #categoricals and small ints get repeated for every clue of a question by
+    #the split below, so they need to be compact beforehand
+    print("Compacting column types...")
+    clues = compact_dtypes(clues, arrow_strings=arrow_strings)
+
+    print("Splitting questions and parts into individual clues...")
+    clues = tokenize_and_explode(clues, n_workers=n_workers)
+
+    print("Adding a column for clue length...")
+    clues['len'] = clues.loc[:,'clue'].str.len().astype(SMALL_INT_COLUMNS['len'])
+    return clues
+
+
+def normalize_length(lengths, mean, std):
+    '''
+    Turn clue lengths into whole standard deviations from the mean length.
+
+    Inputs:
+        -lengths (Series of ints): clue lengths
+        -mean (float), std (float): mean and standard deviation of the
+        lengths of all clues
+    Returns (Series of int8s): normalized lengths
+    '''
+    normalized = np.floor((lengths - mean) / std)
+    #clues 7+ stdev above mean can be lumped together
+    return normalized.clip(upper=7).astype(np.int8)
+
+
+def read_clues(clues=None, arrow_strings=False, filters=None, n_workers=None):
+    '''
+    First stage of run(): read in the backup (only the questions that match
+    filters, if given), split bonuses into parts and questions into clues,
+    and eliminate repeat clues. clues is ignored; it's there so this can be a
+    checkpoints.Stage, which gets None here.
     '''
     print("Reading in tossups and bonuses from QBReader backup file...")
-    tossups, bonuses = intake()
+    tossups, bonuses = intake(filters)
     #pd.options.display.max_colwidth = max_tossup_length(tossups)
 
     print("Splitting bonuses into parts...")
@@ -273,23 +469,24 @@ def run(normalize_len=True, write_to_file=True):
 
     print("Putting tosusps and bonuses into single DataFrame...")
     clues = put_together(tossups, bonuses)
+    del tossups, bonuses
 
-    print("Splitting questions and parts into individual clues...")
-    clues = tokenize_and_explode(clues)
-
-    print("Fixing MongoDB junk in columns...")
-    clues.loc[:,'setYear'] = clues.loc[:,'setYear'].apply(lambda x: mongo_fix(x))
-    clues.loc[:,'difficulty'] = clues.loc[:,'difficulty'].apply(lambda x: mongo_fix(x))
-
-    print("Adding a column for clue length...")
-    clues.loc[:,'len'] = clues.loc[:,'clue'].str.len()
+    clues = split_questions(clues, arrow_strings=arrow_strings, n_workers=n_workers)
 
     print("Eliminating repeat clues...") #removes about 103536 rows
     clues.drop_duplicates('clue', inplace=True)
+    return clues
+
 
+def clean_clues(clues, n_workers=None):
+    '''Stage of run() that cleans up clues and answers.'''
     print("Cleaning up remaining clues...")
-    clues = cleanup(clues)
+    #repeat clues were just removed, so cleanup needn't look for them
+    return cleanup(clues, n_workers=n_workers, dedupe=False)
+
 
+def tag_clues(clues, normalize_len=True):
+    '''Stage of run() that (optionally) normalizes lengths and adds Anki tags.'''
     #clean length here
     if normalize_len:
         print("Normalizing length column...")
@@ -298,13 +495,48 @@ def run(normalize_len=True, write_to_file=True):
         print(f"Mean clue length: {LEN_MEAN}")
         LEN_STD = clues.loc[:,'len'].agg(np.std)
         print(f"Clue length standard deviation: {LEN_STD}")
-        clues.loc[:,'len'] = (clues.loc[:,'len'] - LEN_MEAN) / LEN_STD
-        clues.loc[:,'len'] = clues.loc[:,'len'].apply(np.floor).astype(int)
-        #clues 7+ stdev above mean can be lumped together
-        clues.loc[:,'len'] = clues.loc[:,'len'].apply(lambda x: min(7, x))
+        clues['len'] = normalize_length(clues.loc[:,'len'], LEN_MEAN, LEN_STD)
 
     print("Generating Anki tags...")
-    clues['tags'] = clues.progress_apply(lambda x: tagstring(x), axis=1)
+    #far fewer distinct tag strings than clues, so store each once
+    clues['tags'] = tagstrings(clues).astype('category')
+    return clues
+
+
+def remove_redundant_clues(clues, lemmatize=False):
+    '''Stage of run() that runs the redundant clue removal algorithm.'''
+    return remove_redundancies(clues, lemmatize=lemmatize)
+
+
+def run(normalize_len=True, write_to_file=True, arrow_strings=False, n_workers=None,
+        checkpoint_dir=None, filters=None):
+    '''
+    Runs the whole data transformation pipeline to turn QBReader database backups
+    into a file that is ready to import into Anki as flashcards.
+
+    Inputs:
+        -normalize_len (boolean): whether to turn the length column into
+        standard deviations from the mean clue length
+        -write_to_file (boolean): whether to write the cards out to a .csv
+        -arrow_strings (boolean): whether to store clue and answer text as
+        Arrow strings, which takes much less memory than Python strings
+        -n_workers (int or None): if greater than 1, split and clean clues
+        across this many worker processes
+        -checkpoint_dir (str or None): if given, save each stage's output
+        there and, on a rerun, resume after the last stage whose input, code
+        and options haven't changed (see checkpoints.run_stages())
+        -filters (dict or None): only make cards of the questions that match
+        these, as made by question_filters(); None for all questions
+    Returns (DataFrame): the finished clues
+    '''
+    input_key = None
+    if checkpoint_dir is not None:
+        input_key = source_key(["tossups.json", "bonuses.json"])
+    stages = [Stage('clues', read_clues, {'arrow_strings': arrow_strings, 'filters': filters},
+                    {'n_workers': n_workers}),
+              Stage('cleanup', clean_clues, settings={'n_workers': n_workers}),
+              Stage('tags', tag_clues, {'normalize_len': normalize_len})]
+    clues, key = run_stages(stages, input_key, checkpoint_dir)
 
     print("Run redundant clue removal algorithm? Type 'yes' to confirm.")
     rr_input = input("WARNING: This will take several hours.")
@@ -314,7 +546,10 @@ def run(normalize_len=True, write_to_file=True):
             print("Do you want to lemmatize words in clues? Type 'yes' to confirm.")
             lemma_input = input("WARNING: This will add as much as several hours to runtime.")
             lemma_choice = (lemma_input == 'yes')
-            clues = remove_redundancies(clues, lemmatize=lemma_choice)
+            #chained onto the tags stage's key, so a checkpoint is only used
+            #for the same clues
+            stage = Stage('redundancies', remove_redundant_clues, {'lemmatize': lemma_choice})
+            clues, key = run_stages([stage], key, checkpoint_dir, clues=clues)
 
     if write_to_file:
         now = datetime.now().strftime("%Y%-m%d-%H%M%S")
@@ -328,5 +563,380 @@ def run(normalize_len=True, write_to_file=True):
     
     return clues
 
+class SeenClues:
+    '''
+    The clues kept so far by run_streaming(), so repeat clues can be
+    eliminated across chunks. Only a 64-bit hash of each clue is kept, in a
+    sorted array: 8 bytes per clue rather than the whole text.
+    '''
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def first_occurrences(self, clue_texts):
+        '''
+        Find the clues seen neither in earlier chunks nor earlier in this
+        one, and remember them.
+
+        Inputs:
+            -clue_texts (Series of str): the clues of one chunk
+        Returns (numpy array of bools): True for each clue to keep
+        '''
+        hashes = pd.util.hash_pandas_object(clue_texts, index=False).to_numpy()
+        positions = np.searchsorted(self.hashes, hashes)
+        seen_before = self.hashes[np.minimum(positions, len(self.hashes) - 1)] == hashes \
+            if len(self.hashes) > 0 else np.full((len(hashes),), False)
+        keep = ~seen_before & ~pd.Series(hashes).duplicated().to_numpy()
+        self.hashes = np.union1d(self.hashes, hashes[keep])
+        return keep
+
+
+#questions read at a time from each backup file by run_streaming()
+STREAM_CHUNK_SIZE = 20000
+#column types of the spool file run_streaming() keeps cleaned clues in
+SPOOL_SCHEMA = {'clue': 'string', 'answer': 'string', 'subcategory': 'string',
+                'category': 'string', 'type': 'string', 'difficulty': 'int16',
+                'setName': 'string', 'setYear': 'int16', 'len': 'int32'}
+
+
+def with_columns(df, columns):
+    '''Add any of columns df lacks, as missing values.'''
+    for column in columns:
+        if column not in df.columns:
+            df[column] = np.nan
+    return df
+
+
+def intake_chunks(chunksize=STREAM_CHUNK_SIZE, filters=None):
+    '''
+    Streaming version of intake(), reformat() and put_together(): read
+    tossups.json and then bonuses.json chunksize questions at a time, and
+    yield each chunk as a DataFrame of clues with the columns in
+    COLUMNS_TO_KEEP, with bonuses split into parts. With filters (see
+    question_filters()), only the matching questions are kept.
+    '''
+    assert ('tossups.json' in os.listdir() and
+            'bonuses.json' in os.listdir()), "You don't have the qbreader backup files in this directory!"
+
+    for tossups in backup_chunks("tossups.json", 'tossup', filters, chunksize):
+        tossups = with_columns(tossups.rename(columns={'question':'clue'}), COLUMNS_TO_KEEP)
+        yield tossups.loc[:,COLUMNS_TO_KEEP].reset_index(drop=True)
+
+    for bonuses in backup_chunks("bonuses.json", 'bonus', filters, chunksize):
+        bonuses = with_columns(bonuses, [column for column in COLUMNS_TO_KEEP
+                                         if column not in ('clue', 'answer')] +
+                               ['leadin', 'parts', 'answers'])
+        yield reformat(bonuses)
+
+
+def run_streaming(normalize_len=True, filepath=None, chunksize=STREAM_CHUNK_SIZE,
+                  arrow_strings=False, n_workers=None, filters=None):
+    '''
+    Version of run() for backups too big to hold in memory. Questions are
+    read, split and cleaned chunksize at a time, and only the hashes of the
+    clues kept so far (for eliminating repeat clues) are kept between chunks,
+    so memory use doesn't grow with the size of the backup.
+
+    Cleaned clues are spooled to a Parquet file next to filepath, since
+    normalizing clue lengths needs the mean and standard deviation of all of
+    them; a second pass then normalizes lengths, generates tags and appends
+    the cards to filepath, a chunk at a time.
+
+    Gives the same cards as run() without redundant clue removal (which needs
+    every clue at once; run it on the output afterwards, see dedup_index.py),
+    except that bonus parts are ordered chunk by chunk, so when a clue is
+    repeated, a different copy of it (with different tags) may be the one
+    kept.
+
+    Inputs:
+        -normalize_len (boolean): as for run()
+        -filepath (str or None): .csv file to write cards to; by default
+        clues_<timestamp>.csv
+        -chunksize (int): questions to read from a backup file at a time
+        -arrow_strings (boolean), n_workers (int or None), filters (dict
+        or None): as for run()
+    Returns (str): filepath
+    '''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if filepath is None:
+        now = datetime.now().strftime("%Y%-m%d-%H%M%S")
+        filepath = f"clues_{now}.csv"
+    spool_path = filepath + ".spool.parquet"
+    schema = pa.schema([(column, pa.from_numpy_dtype(np.dtype(dtype)) if dtype != 'string' else pa.string())
+                        for column, dtype in SPOOL_SCHEMA.items()])
+
+    seen = SeenClues()
+    num_lens, len_sum, len_square_sum = 0, 0, 0
+    with pq.ParquetWriter(spool_path, schema) as writer:
+        for num, clues in enumerate(intake_chunks(chunksize, filters)):
+            print(f"Chunk {num + 1}: {len(clues)} questions and bonus parts")
+            clues = split_questions(clues, arrow_strings=arrow_strings, n_workers=n_workers)
+
+            print("Eliminating repeat clues...")
+            clues = clues.loc[seen.first_occurrences(clues.loc[:,'clue']), :]
+
+            print("Cleaning up remaining clues...")
+            clues = cleanup(clues, n_workers=n_workers, dedupe=False)
+
+            #lengths of cleaned clues, as integers so the sums are exact
+            lengths = clues.loc[:,'clue'].str.len().to_numpy(dtype=np.int64)
+            num_lens += len(lengths)
+            len_sum += int(lengths.sum())
+            len_square_sum += int((lengths ** 2).sum())
+
+            spool = clues.loc[:,list(SPOOL_SCHEMA)].astype(
+                {column: object if dtype == 'string' else dtype for column, dtype in SPOOL_SCHEMA.items()})
+            writer.write_table(pa.Table.from_pandas(spool, schema=schema, preserve_index=False))
+
+    #need two clues for a standard deviation
+    normalize_len = normalize_len and num_lens > 1
+    if normalize_len:
+        print("Normalizing length column...")
+        LEN_MEAN = len_sum / num_lens
+        print(f"Mean clue length: {LEN_MEAN}")
+        #sample standard deviation, as in run()
+        LEN_STD = np.sqrt((num_lens * len_square_sum - len_sum ** 2) / (num_lens * (num_lens - 1)))
+        print(f"Clue length standard deviation: {LEN_STD}")
+
+    print(f"Generating Anki tags and writing clue cards to {filepath}...")
+    spool_file = pq.ParquetFile(spool_path)
+    append = False
+    for batch in tqdm(spool_file.iter_batches(batch_size=chunksize * 4),
+                      total=-(-spool_file.metadata.num_rows // (chunksize * 4))):
+        #missing values as NaN rather than None, as in run(), for tagstrings()
+        clues = batch.to_pandas().fillna(np.nan)
+        if normalize_len:
+            clues['len'] = normalize_length(clues.loc[:,'clue'].str.len(), LEN_MEAN, LEN_STD)
+        clues['tags'] = tagstrings(clues)
+        write_out(clues, filepath, append=append)
+        append = True
+    if not append:
+        write_out(pd.DataFrame(columns=['clue', 'answer', 'tags']), filepath)
+    os.remove(spool_path)
+
+    print(f"Writeout complete! Now, open Anki and go to File->Import->{filepath}.")
+    return filepath
+
+
+DEFAULT_DECK_DIR = 'deck'
+
+
+def question_ids(questions, question_type):
+    '''
+    Identify each question across backups: its type and MongoDB id, e.g.
+    'tossup/64b1...', since a tossup and a bonus could share an id.
+    '''
+    assert '_id' in questions.columns, "The backup's questions have no _id field!"
+    return question_type + '/' + mongo_string_column(questions.loc[:,'_id'])
+
+
+def question_manifest(questions):
+    '''
+    The id and last update time of each question, for telling which
+    questions changed since the deck was last built. updatedAt is missing
+    (None) for questions, or backups, without one.
+    '''
+    if 'updatedAt' in questions.columns:
+        updated = mongo_string_column(questions.loc[:,'updatedAt'])
+    else:
+        updated = pd.Series(None, index=questions.index, dtype=object)
+    return pd.DataFrame({'question_id': questions.loc[:,'question_id'].to_numpy(),
+                         'updatedAt': updated.to_numpy()})
+
+
+def clue_hashes(clue_texts):
+    '''64-bit hashes of clues, as split from their questions (before cleanup).'''
+    return pd.util.hash_pandas_object(clue_texts, index=False).to_numpy()
+
+
+def save_deck(deck, deck_dir):
+    '''
+    Write a deck kept by run_incremental() to a directory: cards.parquet (the
+    cards, with the question each came from), manifest.parquet (the id and
+    update time of every question the deck was built from),
+    occurrences.parquet (the hash of every clue of those questions, repeat
+    clues included, with the question it's in) and deck.json (options, and
+    the clue length statistics lengths are normalized with).
+    '''
+    os.makedirs(deck_dir, exist_ok=True)
+    save_checkpoint(deck['cards'], os.path.join(deck_dir, 'cards.parquet'))
+    deck['manifest'].to_parquet(os.path.join(deck_dir, 'manifest.parquet'), index=False)
+    deck['occurrences'].to_parquet(os.path.join(deck_dir, 'occurrences.parquet'), index=False)
+    with open(os.path.join(deck_dir, 'deck.json'), 'w') as f:
+        json.dump(deck['options'], f)
+
+
+def load_deck(deck_dir):
+    '''Read a deck written by save_deck(), or None if there isn't one.'''
+    if not os.path.exists(os.path.join(deck_dir, 'deck.json')):
+        return None
+    with open(os.path.join(deck_dir, 'deck.json'), 'r') as f:
+        options = json.load(f)
+    cards = load_checkpoint(os.path.join(deck_dir, 'cards.parquet'))
+    assert cards is not None, f"Can't read the cards of the deck in {deck_dir}; build it again."
+    return {'options': options,
+            'manifest': pd.read_parquet(os.path.join(deck_dir, 'manifest.parquet')),
+            'occurrences': pd.read_parquet(os.path.join(deck_dir, 'occurrences.parquet')),
+            'cards': cards}
+
+
+def diff_manifests(old_manifest, new_manifest):
+    '''
+    Compare the questions a deck was built from to those in the backup now.
+
+    Returns (tuple of sets of str): ids of questions that are new, that
+    changed (a different updatedAt), and that were deleted
+    '''
+    merged = new_manifest.merge(old_manifest, on='question_id', how='outer',
+                                suffixes=('', '_old'), indicator=True)
+    in_both = (merged['_merge'] == 'both').to_numpy()
+    changed = in_both & (merged['updatedAt'].fillna('') != merged['updatedAt_old'].fillna('')).to_numpy()
+    return (set(merged.loc[(merged['_merge'] == 'left_only').to_numpy(), 'question_id']),
+            set(merged.loc[changed, 'question_id']),
+            set(merged.loc[(merged['_merge'] == 'right_only').to_numpy(), 'question_id']))
+
+
+def run_incremental(deck_dir=DEFAULT_DECK_DIR, normalize_len=True, arrow_strings=False,
+                    n_workers=None, filters=None):
+    '''
+    Version of run() that keeps the deck it makes in deck_dir, along with a
+    manifest of the questions (by id and update time) it was made from. Run
+    again on a newer backup, only questions that are new or have changed
+    since are read, split, cleaned and tagged; the cards of changed and
+    deleted questions are retracted, the new cards merged in, and the whole
+    deck written to deck_dir/deck.csv, with the cards added and retracted
+    in added_clues_<timestamp>.csv and retracted_clues_<timestamp>.csv
+    there, as dedup_index.py does.
+
+    A new card whose clue is already in the deck is dropped, as repeat clues
+    are by run(). When a retracted card's clue is also in a question that
+    hasn't changed, that question is put through again too, so the clue
+    stays in the deck. Lengths are normalized with the clue length mean and
+    standard deviation of the first build, so tags of existing cards stay
+    the same. Redundant clue removal isn't run; keep a dedup index of
+    deck.csv (see dedup_index.py) for that.
+
+    Inputs:
+        -deck_dir (str): directory the deck is read from and written to
+        -normalize_len (boolean), arrow_strings (boolean), n_workers (int or
+        None), filters (dict or None): as for run(); normalize_len and
+        filters must be the same as when the deck was first built
+    Returns (tuple of DataFrames): (the whole deck, cards added, cards
+    retracted)
+    '''
+    options = {'normalize_len': normalize_len, 'filters': filters}
+    deck = load_deck(deck_dir)
+    if deck is None:
+        print(f"No deck in {deck_dir} yet: building one from the whole backup...")
+        deck = {'options': options,
+                'manifest': pd.DataFrame({'question_id': pd.Series(dtype=object),
+                                          'updatedAt': pd.Series(dtype=object)}),
+                'occurrences': pd.DataFrame({'question_id': pd.Series(dtype=object),
+                                             'clue_hash': pd.Series(dtype=np.uint64)}),
+                'cards': None}
+    else:
+        saved = {option: deck['options'].get(option) for option in options}
+        #json turns tuples into lists
+        if saved != json.loads(json.dumps(options)):
+            raise ValueError(f"The deck in {deck_dir} was built with {saved}, not {options}; "
+                             "build a new deck in another directory instead.")
+
+    print("Reading in tossups and bonuses from QBReader backup file...")
+    tossups, bonuses = intake(filters)
+    tossups['question_id'] = question_ids(tossups, 'tossup')
+    bonuses['question_id'] = question_ids(bonuses, 'bonus')
+    manifest = pd.concat((question_manifest(tossups), question_manifest(bonuses)), ignore_index=True)
+
+    new_ids, changed_ids, deleted_ids = diff_manifests(deck['manifest'], manifest)
+    print(f"{len(new_ids)} new, {len(changed_ids)} changed and {len(deleted_ids)} deleted questions")
+
+    occurrences = deck['occurrences']
+    occurrences = occurrences.loc[~occurrences.loc[:,'question_id'].isin(changed_ids | deleted_ids).to_numpy(),:]
+    reclaim_ids = set()
+    if deck['cards'] is not None:
+        retract = deck['cards'].loc[:,'question_id'].isin(changed_ids | deleted_ids).to_numpy()
+        retracted = deck['cards'].loc[retract,:]
+        kept = deck['cards'].loc[~retract,:]
+        #repeat clues were only kept once, maybe from a question that's gone now
+        orphaned = occurrences.loc[:,'clue_hash'].isin(retracted.loc[:,'clue_hash']).to_numpy()
+        reclaim_ids = set(occurrences.loc[orphaned, 'question_id'])
+        if len(reclaim_ids) > 0:
+            print(f"{len(reclaim_ids)} unchanged questions have clues of retracted cards")
+    else:
+        retracted, kept = None, None
+
+    #only new and changed questions (and those reclaiming clues) go through the pipeline
+    process_ids = new_ids | changed_ids | reclaim_ids
+    occurrences = occurrences.loc[~occurrences.loc[:,'question_id'].isin(reclaim_ids).to_numpy(),:]
+    tossups = tossups.loc[tossups.loc[:,'question_id'].isin(process_ids).to_numpy(),:]
+    bonuses = bonuses.loc[bonuses.loc[:,'question_id'].isin(process_ids).to_numpy(),:]
+
+    print("Splitting bonuses into parts...")
+    bonuses = reformat(bonuses, extra_columns=['question_id'])
+    clues = put_together(tossups, bonuses, extra_columns=['question_id'])
+    del tossups, bonuses
+
+    if len(clues) > 0:
+        clues = split_questions(clues, arrow_strings=arrow_strings, n_workers=n_workers)
+        clues['clue_hash'] = clue_hashes(clues.loc[:,'clue'])
+        occurrences = pd.concat((occurrences, clues.loc[:,['question_id', 'clue_hash']].drop_duplicates()),
+                                ignore_index=True)
+        print("Eliminating repeat clues...")
+        clues.drop_duplicates('clue', inplace=True)
+        if kept is not None:
+            clues = clues.loc[~clues.loc[:,'clue_hash'].isin(kept.loc[:,'clue_hash']).to_numpy(),:]
+        clues = clean_clues(clues, n_workers=n_workers)
+
+    if normalize_len and len(clues) > 0:
+        print("Normalizing length column...")
+        lengths = clues.loc[:,'clue'].str.len()
+        if 'len_mean' not in deck['options']:
+            deck['options']['len_mean'] = float(lengths.agg(np.mean))
+            deck['options']['len_std'] = float(lengths.agg(np.std))
+        print(f"Mean clue length: {deck['options']['len_mean']}")
+        print(f"Clue length standard deviation: {deck['options']['len_std']}")
+        clues['len'] = normalize_length(lengths, deck['options']['len_mean'], deck['options']['len_std'])
+
+    print("Generating Anki tags...")
+    clues['tags'] = tagstrings(clues) if len(clues) > 0 else pd.Series(dtype=object)
+    added = clues
+    if kept is not None:
+        #an empty added has none of the columns made along the way
+        clues = pd.concat((kept, added) if len(added) > 0 else (kept,), ignore_index=True)
+        retracted = retracted.reset_index(drop=True)
+    else:
+        clues = added.reset_index(drop=True)
+        retracted = added.iloc[:0]
+    #the categories of kept and added cards differ, which concat() undoes
+    clues = compact_dtypes(clues, arrow_strings=arrow_strings)
+    clues['tags'] = clues.loc[:,'tags'].astype('category')
+    print(f"Added {len(added)} and retracted {len(retracted)} cards: {len(clues)} cards in all")
+
+    deck['cards'] = clues
+    deck['manifest'] = manifest
+    deck['occurrences'] = occurrences
+    save_deck(deck, deck_dir)
+
+    filepath = os.path.join(deck_dir, 'deck.csv')
+    print(f"Writing clue cards to {filepath}...")
+    write_out(clues, filepath)
+    now = datetime.now().strftime("%Y%-m%d-%H%M%S")
+    write_out(added, os.path.join(deck_dir, f"added_clues_{now}.csv"))
+    write_out(retracted, os.path.join(deck_dir, f"retracted_clues_{now}.csv"))
+    print(f"Writeout complete! Now, open Anki and go to File->Import->{filepath}.")
+    return clues, added, retracted
+
+
 if __name__ == "__main__":
-    run(write_to_file=True)
+    parser = argparse.ArgumentParser(description="Turn the QBReader backup in this directory into Anki cards.")
+    parser.add_argument('--incremental', metavar='DECK_DIR', nargs='?', const=DEFAULT_DECK_DIR, default=None,
+                        help="keep the deck in DECK_DIR and only process questions changed since it was "
+                             "last built (see run_incremental())")
+    args = parser.parse_args()
+
+    if args.incremental is not None:
+        run_incremental(args.incremental)
+    else:
+        run(write_to_file=True, checkpoint_dir=DEFAULT_CHECKPOINT_DIR)
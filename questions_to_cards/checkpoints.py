@@ -0,0 +1,286 @@
+import os
+import glob
+import json
+import time
+import hashlib
+import inspect
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_CHECKPOINT_DIR = 'checkpoints'
+# checkpoints of each stage kept by prune() unless told otherwise
+DEFAULT_KEEP = 1
+
+# Parquet metadata entry with the dtypes Parquet itself doesn't keep
+CHECKPOINT_DTYPES_KEY = b'checkpoint_dtypes'
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stage:
+    '''
+    One step of a checkpointed pipeline (see run_stages()). func is called as
+    func(clues, **options, **settings) and returns the new clues DataFrame.
+
+    options are part of the stage's checkpoint key, since they change its
+    output. settings don't (e.g. n_workers, which only changes how fast the
+    same output is made).
+    '''
+
+    def __init__(self, name, func, options=None, settings=None):
+        assert '_' not in name, "stage names can't contain '_', which separates them from keys"
+        self.name = name
+        self.func = func
+        self.options = options if options is not None else {}
+        self.settings = settings if settings is not None else {}
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+    def key(self, input_key) -> str:
+        '''Hash of the stage's input key, code and options.'''
+        option_str = repr(sorted(self.options.items()))
+        return hashlib.sha1(f"{self.name}\n{input_key}\n{code_fingerprint(self.func)}\n{option_str}"
+                            .encode()).hexdigest()[:16]
+
+
+def source_key(filepaths) -> str:
+    '''
+    Key for a pipeline's input files, from their paths, sizes and modification
+    times, so it changes whenever a new backup is downloaded.
+    '''
+    stats = []
+    for filepath in filepaths:
+        stat = os.stat(filepath)
+        stats.append((os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha1(repr(stats).encode()).hexdigest()[:16]
+
+
+def _is_local(obj) -> bool:
+    '''Whether obj was defined in a module of this package.'''
+    filepath = getattr(inspect.getmodule(obj), '__file__', None)
+    return filepath is not None and os.path.dirname(os.path.abspath(filepath)) == PACKAGE_DIR
+
+
+def _referenced_names(code) -> set:
+    '''Global names used by a code object, including in nested functions.'''
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _referenced_names(const)
+    return names
+
+
+def _value_source(value) -> str:
+    '''A repr of a module-level constant that's the same from run to run.'''
+    if isinstance(value, (set, frozenset)):
+        return repr(sorted(map(_value_source, value)))
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(map(_value_source, value)) + ']'
+    if isinstance(value, dict):
+        return '{' + ', '.join(f"{key!r}: {_value_source(item)}" for key, item in value.items()) + '}'
+    if hasattr(value, '__dict__') and not inspect.isclass(value):
+        return type(value).__name__ + _value_source(vars(value))
+    value_repr = repr(value)
+    # don't let memory addresses into the key
+    return type(value).__name__ if ' at 0x' in value_repr else value_repr
+
+
+def _collect_sources(obj, sources):
+    '''
+    Add the source of obj (a function or class of this package) to sources,
+    along with that of every function, class and UPPER_CASE constant of this
+    package it refers to, directly or through the functions it calls.
+    '''
+    name = f"{obj.__module__}.{obj.__qualname__}"
+    if name in sources:
+        return
+    sources[name] = inspect.getsource(obj)
+
+    if inspect.isclass(obj):
+        functions = [value for value in vars(obj).values() if inspect.isfunction(value)]
+    else:
+        functions = [obj]
+    for function in functions:
+        for global_name in _referenced_names(function.__code__):
+            if global_name not in function.__globals__:
+                continue
+            value = function.__globals__[global_name]
+            if inspect.isfunction(value) or inspect.isclass(value):
+                if _is_local(value):
+                    _collect_sources(value, sources)
+            elif global_name.isupper() and not inspect.ismodule(value):
+                sources[f"{function.__module__}.{global_name}"] = _value_source(value)
+
+
+def code_fingerprint(func) -> str:
+    '''
+    Identify the code a function runs: its source and that of everything in
+    this package it uses (see _collect_sources()). Unlike
+    memo_cache.function_fingerprint(), which hashes the function's whole
+    module, editing one stage's code here leaves other stages' checkpoints
+    valid, e.g. changing a cleanup rule doesn't redo the clue splitting.
+    '''
+    sources = {}
+    _collect_sources(func, sources)
+    fingerprint = hashlib.sha1()
+    for name, source in sorted(sources.items()):
+        fingerprint.update(f"{name}\n{source}\n".encode())
+    return fingerprint.hexdigest()
+
+
+def checkpoint_filepath(checkpoint_dir, stage_name, key) -> str:
+    '''Where the output of a stage run on a given input is kept.'''
+    return os.path.join(checkpoint_dir, f"{stage_name}_{key}.parquet")
+
+
+def _dtype_name(dtype):
+    '''Name of a dtype Parquet doesn't keep, that astype() understands.'''
+    if isinstance(dtype, pd.CategoricalDtype):
+        return 'category'
+    if isinstance(dtype, pd.StringDtype):
+        return f"string[{dtype.storage}]"
+    return None
+
+
+def save_checkpoint(clues, filepath):
+    '''
+    Write a stage's output to a Parquet file, keeping column dtypes
+    (categoricals, small ints, Arrow strings) and the index. The file only
+    appears once it's completely written, so an interrupted run never leaves
+    a truncated checkpoint behind.
+    '''
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    #Parquet only keeps string categoricals as such, and doesn't say whether
+    #strings were Arrow-backed, so note those dtypes for load_checkpoint()
+    dtypes = {column: _dtype_name(dtype) for column, dtype in clues.dtypes.items()
+              if _dtype_name(dtype) is not None}
+    table = pa.Table.from_pandas(clues, preserve_index=True)
+    table = table.replace_schema_metadata({**table.schema.metadata,
+                                           CHECKPOINT_DTYPES_KEY: json.dumps(dtypes)})
+    temp_path = filepath + '.tmp'
+    pq.write_table(table, temp_path)
+    os.replace(temp_path, filepath)
+
+
+def load_checkpoint(filepath):
+    '''Read a file written by save_checkpoint(), or None if it can't be read.'''
+    try:
+        table = pq.read_table(filepath)
+        dtypes = json.loads(table.schema.metadata[CHECKPOINT_DTYPES_KEY])
+    except Exception as error:
+        print(f"Ignoring unreadable checkpoint {filepath}: {error}")
+        return None
+    clues = table.to_pandas()
+    for column, dtype in dtypes.items():
+        if _dtype_name(clues[column].dtype) != dtype:
+            clues[column] = clues[column].astype(dtype)
+    return clues
+
+
+def run_stages(stages, input_key, checkpoint_dir=None, clues=None):
+    '''
+    Run a pipeline of Stages, each on the output of the one before. With a
+    checkpoint_dir, every stage's output is saved there under a key made from
+    its input's key and its own code and options, and the pipeline resumes
+    from the latest stage whose checkpoint is already there: only the stages
+    after it (whose code, options or input changed) are rerun.
+
+    Inputs:
+        -stages (list of Stage)
+        -input_key (str): identifies the first stage's input, e.g. the
+        source_key() of the backup files
+        -checkpoint_dir (str or None): where checkpoints are kept; None to
+        run every stage without checkpointing
+        -clues (DataFrame or None): the first stage's input, if it has one;
+        input_key must identify it
+    Returns (DataFrame, str): the last stage's output and its key, to chain
+    further stages onto (None without a checkpoint_dir)
+    '''
+    start = 0
+    keys = [None] * len(stages)
+    if checkpoint_dir is not None:
+        for i, stage in enumerate(stages):
+            input_key = stage.key(input_key)
+            keys[i] = input_key
+        for i in reversed(range(len(stages))):
+            filepath = checkpoint_filepath(checkpoint_dir, stages[i].name, keys[i])
+            if os.path.exists(filepath):
+                #an unreadable checkpoint mustn't replace the clues passed in
+                loaded = load_checkpoint(filepath)
+                if loaded is not None:
+                    print(f"Resuming from {stages[i].name} checkpoint {filepath}...")
+                    clues = loaded
+                    start = i + 1
+                    break
+
+    for stage, key in zip(stages[start:], keys[start:]):
+        clues = stage.func(clues, **stage.options, **stage.settings)
+        if checkpoint_dir is not None:
+            save_checkpoint(clues, checkpoint_filepath(checkpoint_dir, stage.name, key))
+    return clues, keys[-1] if len(keys) > 0 else input_key
+
+
+def list_checkpoints(checkpoint_dir=DEFAULT_CHECKPOINT_DIR) -> pd.DataFrame:
+    '''
+    Describe the checkpoints in checkpoint_dir, newest first: one row per
+    checkpoint with its stage, key, number of rows, size in bytes, last
+    modification time and file path.
+    '''
+    rows = []
+    for filepath in glob.glob(os.path.join(checkpoint_dir, '*_*.parquet')):
+        stage_name, key = os.path.basename(filepath)[:-len('.parquet')].split('_', 1)
+        try:
+            num_rows = pq.read_metadata(filepath).num_rows
+        except Exception:
+            num_rows = None
+        rows.append({'stage': stage_name, 'key': key, 'rows': num_rows,
+                     'bytes': os.path.getsize(filepath),
+                     'modified': pd.Timestamp(os.path.getmtime(filepath), unit='s'),
+                     'filepath': filepath})
+    checkpoints = pd.DataFrame(rows, columns=['stage', 'key', 'rows', 'bytes', 'modified', 'filepath'])
+    return checkpoints.sort_values('modified', ascending=False, ignore_index=True)
+
+
+def prune_checkpoints(checkpoint_dir=DEFAULT_CHECKPOINT_DIR, keep=DEFAULT_KEEP, older_than_days=None) -> list:
+    '''
+    Delete old checkpoints: all but the keep most recent ones of each stage
+    and, if older_than_days is given, any not modified in that many days.
+    Use keep=0 to delete every checkpoint.
+    Returns (list of str): the paths deleted
+    '''
+    checkpoints = list_checkpoints(checkpoint_dir)
+    prune = checkpoints.groupby('stage').cumcount() >= keep
+    if older_than_days is not None:
+        cutoff = pd.Timestamp(time.time() - older_than_days * 24 * 60 * 60, unit='s')
+        prune |= checkpoints['modified'] < cutoff
+    removed = checkpoints.loc[prune, 'filepath'].tolist()
+    for filepath in removed:
+        os.remove(filepath)
+    return removed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="List or prune backup_to_cards stage checkpoints.")
+    parser.add_argument('command', choices=['list', 'prune'])
+    parser.add_argument('--dir', default=DEFAULT_CHECKPOINT_DIR, help="checkpoint directory")
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP,
+                        help="prune: most recent checkpoints of each stage to keep")
+    parser.add_argument('--older-than', type=float, default=None, metavar='DAYS',
+                        help="prune: also delete checkpoints not modified in this many days")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        checkpoints = list_checkpoints(args.dir)
+        if len(checkpoints) == 0:
+            print(f"No checkpoints in {args.dir}")
+        else:
+            print(checkpoints.drop(columns='filepath').to_string(index=False))
+            print(f"{len(checkpoints)} checkpoints, {checkpoints['bytes'].sum() / 1024**2:.1f} MB in all")
+    else:
+        removed = prune_checkpoints(args.dir, args.keep, args.older_than)
+        for filepath in removed:
+            print(f"Removed {filepath}")
+        print(f"Removed {len(removed)} checkpoints")
@@ -0,0 +1,94 @@
+import numpy as np
+from scipy import sparse
+
+# number of clues per answer block whose overlap scores are computed in one
+# sparse product; bounds memory for answers with thousands of clues
+BLOCK_ROWS = 1024
+
+
+def build_vocabulary(clue_bags) -> dict:
+    '''
+    Assign every word that appears in any clue bag a token ID. IDs follow
+    alphabetical order of the words so the same bags always get the same IDs.
+
+    Inputs:
+        - clue_bags (iterable of sets): output of wordify() for each clue
+    Returns (dict): mapping of word (str) -> token ID (int)
+    '''
+    all_words = set()
+    for clue_bag in clue_bags:
+        all_words.update(clue_bag)
+    return {word: token_id for token_id, word in enumerate(sorted(all_words))}
+
+
+def encode_clue_bags(clue_bags, vocabulary) -> sparse.csr_matrix:
+    '''
+    Convert clue bags into a binary CSR sparse matrix with one row per clue
+    and one column per token ID. Takes a fraction of the memory of a dense
+    (clues x longest bag) table, since only the words actually present in
+    each clue are stored.
+
+    Inputs:
+        - clue_bags (sequence of sets): output of wordify() for each clue
+        - vocabulary (dict): output of build_vocabulary(); must contain every
+        word in clue_bags
+    Returns (scipy.sparse.csr_matrix): matrix of shape (len(clue_bags), len(vocabulary))
+    '''
+    bag_sizes = np.fromiter((len(clue_bag) for clue_bag in clue_bags),
+                            dtype=np.int64, count=len(clue_bags))
+    indptr = np.zeros(len(bag_sizes) + 1, dtype=np.int64)
+    np.cumsum(bag_sizes, out=indptr[1:])
+    indices = np.fromiter((vocabulary[word] for clue_bag in clue_bags for word in clue_bag),
+                          dtype=np.int32, count=indptr[-1])
+    data = np.ones(len(indices), dtype=np.int32)
+
+    clue_matrix = sparse.csr_matrix((data, indices, indptr),
+                                    shape=(len(bag_sizes), len(vocabulary)))
+    clue_matrix.sort_indices()
+    return clue_matrix
+
+
+def shared_word_counts(clue_matrix, query_rows, candidate_rows) -> sparse.csr_matrix:
+    '''
+    Count the words each query clue shares with each candidate clue, for a
+    whole answer block at once, with a single sparse matrix product.
+
+    Inputs:
+        - clue_matrix (csr_matrix): output of encode_clue_bags()
+        - query_rows (numpy array): row indices of the clues being compared
+        - candidate_rows (numpy array): row indices to compare them against
+    Returns (csr_matrix): shape (len(query_rows), len(candidate_rows)); entry
+    [i, j] is the size of the intersection of the two clue bags
+    '''
+    return (clue_matrix[query_rows] @ clue_matrix[candidate_rows].T).tocsr()
+
+
+def dense_row(matrix, row_idx) -> np.ndarray:
+    '''Return one row of a CSR matrix as a dense 1-D numpy array.'''
+    row = np.zeros(matrix.shape[1], dtype=matrix.dtype)
+    start, end = matrix.indptr[row_idx], matrix.indptr[row_idx + 1]
+    row[matrix.indices[start:end]] = matrix.data[start:end]
+    return row
+
+
+def overlap_coefficients(shared_words, bag_size, candidate_bag_sizes) -> np.ndarray:
+    '''
+    Turn shared word counts into overlap coefficients
+    (see https://en.wikipedia.org/wiki/Overlap_coefficient). A pair where
+    either clue bag is empty counts as total overlap.
+
+    Inputs:
+        - shared_words (numpy array): words shared with each candidate clue
+        - bag_size (int): number of words in this clue's bag
+        - candidate_bag_sizes (numpy array): number of words in each
+        candidate's bag
+    Returns (numpy array of floats): overlap coefficient for each candidate
+    '''
+    min_vals = np.minimum(bag_size, candidate_bag_sizes)
+
+    # work around numpy ZeroDivisionWarning:
+    # set the 0s to 1000 then set the clue overlap to 1 eventually
+    min_vals[min_vals < 1] = 1000
+    clue_overlap_vals = shared_words / min_vals
+    clue_overlap_vals[min_vals == 1000] = 1
+    return clue_overlap_vals
@@ -0,0 +1,110 @@
+import re
+import json
+import numpy as np
+import pandas as pd
+
+# low-cardinality columns, stored once per distinct value instead of once per
+# clue row
+CATEGORICAL_COLUMNS = ['category', 'subcategory', 'type', 'setName', 'difficulty']
+
+# numeric columns and the smallest integer type that holds every value:
+# years fit in an int16, and a clue is never anywhere near 2**31 characters
+SMALL_INT_COLUMNS = {'setYear': np.int16,
+                     'len': np.int32}
+
+# text columns that can be stored as Arrow strings (one contiguous buffer
+# per column) instead of one Python object per row
+STRING_COLUMNS = ['clue', 'answer']
+ARROW_STRING_DTYPE = 'string[pyarrow]'
+
+
+def compact_dtypes(clues, arrow_strings=False) -> pd.DataFrame:
+    '''
+    Shrink the clues DataFrame by giving each column the most compact dtype
+    that holds its values: categoricals for low-cardinality columns, small
+    integers for numeric ones, and optionally Arrow-backed strings for clue
+    and answer text. Columns that aren't in the DataFrame are skipped, so
+    this can be called at any point in the pipeline.
+
+    Do the mongo_fix() of setYear and difficulty first, since the raw
+    columns hold MongoDB objects rather than numbers.
+
+    Inputs:
+        -clues (pandas DataFrame)
+        -arrow_strings (boolean): whether to store clue and answer as
+        Arrow strings (needs pyarrow)
+    Returns (pandas DataFrame): the same data with compact dtypes
+    '''
+    dtypes = {}
+    for column in CATEGORICAL_COLUMNS:
+        if column in clues.columns:
+            dtypes[column] = 'category'
+    for column, dtype in SMALL_INT_COLUMNS.items():
+        if column in clues.columns:
+            dtypes[column] = dtype
+    if arrow_strings:
+        for column in STRING_COLUMNS:
+            if column in clues.columns:
+                dtypes[column] = ARROW_STRING_DTYPE
+
+    return clues.astype(dtypes)
+
+
+def mongo_fix(obj):
+    '''Turns a MongoDB representation of an integer from the QBReader database
+    into an integer. Uses 0 for missing values.
+    
+    Inputs:
+        -obj (dict): the {$...} JSON object
+    Returns (int): Integer representation'''
+
+    if type(obj) == int:
+        return obj
+
+    strobj = str(obj)
+    try:
+        fixed_obj = int(re.search(r"[0-9]{1,4}", strobj).group(0))
+    except AttributeError:
+        fixed_obj = 0
+    return fixed_obj
+
+
+def mongo_fix_column(column):
+    '''
+    mongo_fix() for a whole column at once: pulls the integer out of every
+    {$...} JSON object with a vectorized regex pass over the column's
+    distinct values, and keeps values that are already integers as they
+    are. Uses 0 for missing values.
+
+    Inputs:
+        -column (pandas Series): e.g. the 'setYear' column of the backup
+    Returns (pandas Series of ints): Integer representations
+    '''
+    if pd.api.types.is_integer_dtype(column):
+        return column
+
+    #there are only a few dozen distinct years and difficulties, so only
+    #run the regex once for each
+    codes, distinct = pd.factorize(column.astype(str))
+    distinct = pd.Series(distinct).str.extract(r"([0-9]{1,4})", expand=False)
+    fixed = distinct.fillna(0).to_numpy(dtype=np.int64)[codes]
+    is_int = (column.map(type) == int).to_numpy()
+    fixed[is_int] = column.to_numpy()[is_int].astype(np.int64)
+    return pd.Series(fixed, index=column.index, name=column.name)
+
+
+def mongo_string(obj):
+    '''
+    Turns a MongoDB object like {"$oid": "..."} or {"$date": "..."} from the
+    QBReader database into its value, as a string. None for missing values.
+    '''
+    while isinstance(obj, dict) and len(obj) == 1 and next(iter(obj)).startswith('$'):
+        obj = next(iter(obj.values()))
+    if obj is None or (isinstance(obj, float) and np.isnan(obj)):
+        return None
+    return obj if isinstance(obj, str) else json.dumps(obj, sort_keys=True)
+
+
+def mongo_string_column(column):
+    '''mongo_string() for a whole column, e.g. the '_id' column of the backup.'''
+    return column.map(mongo_string).astype(object)
@@ -0,0 +1,195 @@
+import os
+import json
+import argparse
+from datetime import datetime
+import pandas as pd
+from scipy import sparse
+from clue_bags import build_vocabulary, encode_clue_bags
+from similarity import prepare_clue_df, mark_redundant_rows, mark_redundant_rows_parallel
+from utility import write_out
+
+# options that must stay the same between building an index and updating it
+DEFAULT_INDEX_OPTIONS = {
+    'max_ans_len': 50,
+    'simplify_answers': True,
+    'lemmatize': False,
+    'asc': True,
+    'skip_thresh': None,
+    'ans_thresh': 0.7,
+    'clue_thresh': 0.6,
+    'dynamic_threshes': True,
+    'match_method': 'exact',
+    'num_perm': 64,
+    'lsh_bands': 32,
+}
+PREPARE_OPTIONS = ['max_ans_len', 'simplify_answers', 'lemmatize', 'asc']
+MATCH_OPTIONS = ['skip_thresh', 'ans_thresh', 'clue_thresh', 'dynamic_threshes',
+                 'max_ans_len', 'match_method', 'num_perm', 'lsh_bands']
+
+CARD_COLUMNS = ['clue', 'answer', 'tags']
+SURVIVOR_COLUMNS = CARD_COLUMNS + ['simple_answer', 'bag_size']
+
+
+def build_dedup_index(clue_df, n_workers=None, **options):
+    '''
+    Run redundancy removal over a whole deck and keep everything needed to
+    deduplicate later releases against it without redoing this work: the
+    token vocabulary, and the surviving clues sorted by simple answer with
+    their sparse clue bags (so each answer's clue sketches are consecutive
+    rows).
+
+    Inputs:
+        - clue_df (DataFrame): clues with 'clue', 'answer' and 'tags' columns
+        - n_workers (int or None): worker processes, as in remove_redundancies()
+        - **options: any of DEFAULT_INDEX_OPTIONS, as in remove_redundancies()
+    Returns (dict): the dedup index
+    '''
+    options = {**DEFAULT_INDEX_OPTIONS, **options}
+    df = prepare_clue_df(clue_df, **{key: options[key] for key in PREPARE_OPTIONS})
+
+    print("Encoding clue bags as a sparse matrix...")
+    vocabulary = build_vocabulary(df["clue_bag"])
+    clue_matrix = encode_clue_bags(df["clue_bag"].to_numpy(), vocabulary)
+
+    match_options = {key: options[key] for key in MATCH_OPTIONS}
+    if n_workers is not None and n_workers > 1:
+        deleted_rows = mark_redundant_rows_parallel(df, clue_matrix, n_workers, **match_options)
+    else:
+        deleted_rows = mark_redundant_rows(df, clue_matrix, **match_options)
+    print(f"{deleted_rows.sum()} total rows marked for deletion")
+
+    survivors = df.loc[~deleted_rows, SURVIVOR_COLUMNS].reset_index(drop=True)
+    return {
+        'options': options,
+        'vocabulary': vocabulary,
+        'survivors': survivors,
+        'clue_matrix': clue_matrix[~deleted_rows],
+    }
+
+
+def extend_vocabulary(vocabulary, clue_bags) -> dict:
+    '''
+    Give every word in clue_bags that isn't in vocabulary yet a new token ID,
+    after all existing IDs so clue bags already encoded stay valid.
+
+    Inputs:
+        - vocabulary (dict): existing word -> token ID mapping
+        - clue_bags (iterable of sets): output of wordify() for new clues
+    Returns (dict): the extended vocabulary (a new dict)
+    '''
+    vocabulary = dict(vocabulary)
+    new_words = set()
+    for clue_bag in clue_bags:
+        new_words.update(word for word in clue_bag if word not in vocabulary)
+    for word in sorted(new_words):
+        vocabulary[word] = len(vocabulary)
+    return vocabulary
+
+
+def update_dedup_index(index, new_clue_df):
+    '''
+    Deduplicate newly ingested clues against a dedup index. Each new clue is
+    compared with the indexed survivors that have a similar answer, and with
+    the other new clues, but indexed survivors are never compared with each
+    other again, so the cost of an update scales with the size of the new
+    release rather than with the whole deck. A new clue can also replace an
+    indexed survivor, if it's a longer version of the same clue.
+
+    Inputs:
+        - index (dict): output of build_dedup_index() or load_dedup_index()
+        - new_clue_df (DataFrame): new clues with 'clue', 'answer' and 'tags'
+    Returns (tuple): (updated index, DataFrame of new cards to add,
+    DataFrame of previously kept cards that should now be removed)
+    '''
+    options = index['options']
+    survivors = index['survivors']
+
+    print("Dropping new clues that are already in the index...")
+    new_clue_df = new_clue_df.drop_duplicates('clue')
+    new_clue_df = new_clue_df.loc[~new_clue_df['clue'].isin(survivors['clue']), :]
+    new_df = prepare_clue_df(new_clue_df, **{key: options[key] for key in PREPARE_OPTIONS})
+
+    print("Encoding new clue bags...")
+    vocabulary = extend_vocabulary(index['vocabulary'], new_df['clue_bag'])
+    old_matrix = index['clue_matrix'].copy()
+    old_matrix.resize((old_matrix.shape[0], len(vocabulary)))
+    new_matrix = encode_clue_bags(new_df['clue_bag'].to_numpy(), vocabulary)
+
+    print("Merging new clues into the index...")
+    combined = pd.concat((survivors.assign(is_new=False),
+                          new_df.loc[:, SURVIVOR_COLUMNS].assign(is_new=True)),
+                         ignore_index=True)
+    combined_matrix = sparse.vstack((old_matrix, new_matrix), format='csr')
+    order = combined.sort_values(by=['simple_answer', 'clue'], ascending=options['asc']).index.to_numpy()
+    combined = combined.loc[order, :].reset_index(drop=True)
+    combined_matrix = combined_matrix[order]
+    is_new = combined['is_new'].to_numpy()
+
+    deleted_rows = mark_redundant_rows(combined, combined_matrix, is_new=is_new,
+                                       **{key: options[key] for key in MATCH_OPTIONS})
+
+    added = combined.loc[is_new & ~deleted_rows, CARD_COLUMNS]
+    retracted = combined.loc[~is_new & deleted_rows, CARD_COLUMNS]
+    print(f"{len(added)} new cards kept; {len(retracted)} indexed cards replaced")
+
+    new_survivors = combined.loc[~deleted_rows, SURVIVOR_COLUMNS].reset_index(drop=True)
+    updated_index = {
+        'options': options,
+        'vocabulary': vocabulary,
+        'survivors': new_survivors,
+        'clue_matrix': combined_matrix[~deleted_rows],
+    }
+    return updated_index, added, retracted
+
+
+def save_dedup_index(index, dirpath):
+    '''
+    Write a dedup index to a directory: survivors.tsv (surviving clues),
+    clue_bags.npz (their sparse clue bags) and index.json (options and
+    vocabulary).
+    '''
+    os.makedirs(dirpath, exist_ok=True)
+    index['survivors'].to_csv(os.path.join(dirpath, 'survivors.tsv'), sep='\t',
+                              escapechar='\\', index=False)
+    sparse.save_npz(os.path.join(dirpath, 'clue_bags.npz'), index['clue_matrix'])
+    vocabulary = index['vocabulary']
+    with open(os.path.join(dirpath, 'index.json'), 'w') as f:
+        json.dump({'options': index['options'],
+                   'vocabulary': sorted(vocabulary, key=vocabulary.get)}, f)
+
+
+def load_dedup_index(dirpath):
+    '''Read a dedup index written by save_dedup_index().'''
+    with open(os.path.join(dirpath, 'index.json'), 'r') as f:
+        meta = json.load(f)
+    # keep_default_na=False: "nan" and "NA" are legitimate simple answers
+    survivors = pd.read_csv(os.path.join(dirpath, 'survivors.tsv'), sep='\t',
+                            escapechar='\\', keep_default_na=False,
+                            dtype={'clue': str, 'answer': str, 'tags': str,
+                                   'simple_answer': str, 'bag_size': int})
+    return {
+        'options': meta['options'],
+        'vocabulary': {word: token_id for token_id, word in enumerate(meta['vocabulary'])},
+        'survivors': survivors,
+        'clue_matrix': sparse.load_npz(os.path.join(dirpath, 'clue_bags.npz')).tocsr(),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or update a persisted dedup index.")
+    parser.add_argument('command', choices=['build', 'update'])
+    parser.add_argument('clues_filepath', help="tab-separated clue file, as written by write_out()")
+    parser.add_argument('index_dir', help="directory the index is read from / written to")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    clues = pd.read_csv(args.clues_filepath, sep='\t', escapechar='\\')
+    if args.command == 'build':
+        index = build_dedup_index(clues, n_workers=args.workers)
+    else:
+        index, added, retracted = update_dedup_index(load_dedup_index(args.index_dir), clues)
+        now = datetime.now().strftime("%Y%-m%d-%H%M%S")
+        write_out(added, f"added_clues_{now}.csv")
+        write_out(retracted, f"retracted_clues_{now}.csv")
+    save_dedup_index(index, args.index_dir)
+    write_out(index['survivors'], os.path.join(args.index_dir, 'deck.csv'))
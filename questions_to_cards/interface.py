@@ -1,6 +1,6 @@
 import pandas as pd
 from qbreader import query
-from backup_to_cards import intake
+from backup_to_cards import intake, question_filters
 import re
 
 ALL_CATEGORIES = {
@@ -51,6 +51,7 @@ def user_interface():
                       f"Type integers from 1 to 10 separated by commas, or a range between two numbers (inclusive)\n" +
                       f"with a hyphen between them. Or press Enter to skip/include all: ")
         VALID_DIFF_RE = r'(([1-9]|10)(\s|,|-))+'
+        selected_difficulties = None #None for all, including questions without one
         if diffs_raw == '':
             difficulties = list(range(1,11))
             print("Ignoring difficulty selection. All difficulties will be included")
@@ -73,6 +74,7 @@ def user_interface():
                 elif int(item) >= 1 and int(item) <= 10:
                     difficulties.add(int(item))
             difficulties = sorted(list(difficulties))
+            selected_difficulties = difficulties
             print(f"You selected difficulties: {difficulties}")
         else:
             print("That's not a valid difficulty string")   
@@ -83,7 +85,8 @@ def user_interface():
         cats_raw = re.split(',', cats_raw)
         cats_raw = list({i.strip().lower().capitalize() for i in cats_raw if i != ''})
         categories = set()
-        if ("all" in cats_raw or len(cats_raw) == 0):
+        all_categories = ("All" in cats_raw or len(cats_raw) == 0)
+        if all_categories:
             print("Getting all categories")
             categories = categories.union({key for key in ALL_CATEGORIES.keys()}) 
         else:
@@ -137,8 +140,11 @@ def user_interface():
             bonuses = pd.json_normalize(api_call['bonuses']['questionArray'])
 
         if source == 'backup':
-            #TODO: filter down backup using user input
-            tossups, bonuses = intake()
+            #filter while reading, so unwanted questions are never processed
+            filters = question_filters(categories=None if all_categories else categories,
+                                       difficulties=selected_difficulties,
+                                       question_types=None if qtype == 'all' else [qtype])
+            tossups, bonuses = intake(filters)
 
         #Feed result of this function into rest of pipeline from backup_to_cards()
         return tossups, bonuses
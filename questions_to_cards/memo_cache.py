@@ -0,0 +1,194 @@
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+import inspect
+from collections import OrderedDict
+import pandas as pd
+from tqdm import tqdm
+
+# most results kept in the in-process tier
+DEFAULT_MEMORY_ITEMS = 500000
+# most bytes of pickled results kept in the on-disk tier
+DEFAULT_DISK_BYTES = 2 * 1024**3
+# sqlite limits how many parameters one query can take
+SQLITE_BATCH = 900
+
+
+class MemoCache:
+    '''
+    Two-tier cache for the results of pure text functions such as
+    similarity.distill() and similarity.wordify(), keyed by the input text
+    and a fingerprint of the function's source code and keyword arguments.
+
+    The first tier is an in-process LRU dictionary. The second, optional,
+    tier is a sqlite database on disk that persists between runs; once it
+    holds more than max_disk_bytes of results, the least recently used ones
+    are evicted.
+    '''
+
+    def __init__(self, cache_dir=None, max_memory_items=DEFAULT_MEMORY_ITEMS,
+                 max_disk_bytes=DEFAULT_DISK_BYTES):
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._db = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(cache_dir, 'memo.sqlite'))
+            self._db.execute('CREATE TABLE IF NOT EXISTS memo '
+                             '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_used REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS memo_last_used ON memo (last_used)')
+            self._db.commit()
+
+    def get_many(self, fingerprint, texts) -> dict:
+        '''
+        Look up the results of the function identified by fingerprint (see
+        function_fingerprint()) for texts, in both tiers. Returns a dict
+        text -> result of the texts found.
+        '''
+        found = {}
+        disk_texts = []
+        for text in texts:
+            key = (fingerprint, text)
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[text] = self._memory[key]
+            else:
+                disk_texts.append(text)
+
+        if self._db is not None and len(disk_texts) > 0:
+            now = time.time()
+            disk_keys = {disk_key(fingerprint, text): text for text in disk_texts}
+            key_list = list(disk_keys)
+            for start in range(0, len(key_list), SQLITE_BATCH):
+                batch = key_list[start:start + SQLITE_BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, value FROM memo WHERE key IN ({','.join('?' * len(batch))})",
+                    batch).fetchall()
+                for key, value in rows:
+                    text = disk_keys[key]
+                    found[text] = pickle.loads(value)
+                    self._memory[(fingerprint, text)] = found[text]
+                self._db.executemany('UPDATE memo SET last_used = ? WHERE key = ?',
+                                     [(now, key) for key, _ in rows])
+            self._db.commit()
+            self._trim()
+        return found
+
+    def put_many(self, fingerprint, results):
+        '''Store (text, result) pairs in both tiers.'''
+        results = list(results)
+        self._memory.update(((fingerprint, text), result) for text, result in results)
+        self._trim()
+        if self._db is not None and len(results) > 0:
+            now = time.time()
+            rows = []
+            for text, result in results:
+                blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+                rows.append((disk_key(fingerprint, text), blob, len(blob), now))
+            self._db.executemany('INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?)', rows)
+            self._db.commit()
+            self._evict()
+
+    def _trim(self):
+        '''Drop least recently used in-process entries past max_memory_items.'''
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        '''Drop least recently used disk entries until under max_disk_bytes.'''
+        total_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM memo').fetchone()[0]
+        if total_bytes <= self.max_disk_bytes:
+            return
+        # evict down to 90% so we don't evict again on the very next write
+        excess = total_bytes - int(self.max_disk_bytes * 0.9)
+        freed = 0
+        victims = []
+        for key, size in self._db.execute('SELECT key, size FROM memo ORDER BY last_used'):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany('DELETE FROM memo WHERE key = ?', victims)
+        self._db.commit()
+
+    def clear(self):
+        '''Empty both tiers.'''
+        self._memory.clear()
+        if self._db is not None:
+            self._db.execute('DELETE FROM memo')
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+# one shared cache per cache directory (None: in-process tier only), so the
+# in-process tier survives between calls
+_caches = {}
+
+
+def get_memo_cache(cache_dir=None) -> MemoCache:
+    '''Return the shared MemoCache for cache_dir, creating it if needed.'''
+    if cache_dir not in _caches:
+        _caches[cache_dir] = MemoCache(cache_dir)
+    return _caches[cache_dir]
+
+
+def disk_key(fingerprint, text) -> str:
+    '''Key of one result in the on-disk tier: a hash of the function and text.'''
+    return hashlib.sha1(f"{fingerprint}\n{text!r}".encode()).hexdigest()
+
+
+def function_fingerprint(func, salt='', **options) -> str:
+    '''
+    Identify a function and its keyword arguments, so cached results are
+    invalidated whenever the function's code or its options change. The
+    source of the function's whole module is used, since it may call other
+    functions defined there. salt is for anything else the results depend
+    on (e.g. the spaCy model version).
+    '''
+    source = inspect.getsource(inspect.getmodule(func))
+    option_str = repr(sorted(options.items()))
+    return hashlib.sha1(f"{func.__name__}\n{source}\n{option_str}\n{salt}".encode()).hexdigest()
+
+
+def memoized_apply(series, func, cache=None, salt='', batch_func=None, **options) -> pd.Series:
+    '''
+    Equivalent to series.apply(lambda x: func(x, **options)), but computes
+    each distinct value only once, and only if it isn't cached already.
+
+    Inputs:
+        - series (pandas Series): the texts to process
+        - func (function): pure function of one text plus keyword arguments
+        - cache (MemoCache or None): cache to use; the shared in-process
+        cache if None
+        - salt (str): anything else func's results depend on
+        - batch_func (function or None): if given, used instead of func to
+        compute every uncached value at once: takes a list of texts plus
+        **options and returns a list of the results func would give
+        - **options: keyword arguments passed through to func
+    Returns (pandas Series): func's result for each row, with series's index
+    '''
+    if cache is None:
+        cache = get_memo_cache()
+    fingerprint = function_fingerprint(func, salt, **options)
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    found = cache.get_many(fingerprint, uniques)
+
+    misses = [text for text in uniques if text not in found]
+    if len(misses) > 0:
+        if batch_func is not None:
+            computed = list(zip(misses, batch_func(misses, **options)))
+        else:
+            computed = [(text, func(text, **options)) for text in tqdm(misses)]
+        cache.put_many(fingerprint, computed)
+        found.update(computed)
+
+    results = pd.Series([found[text] for text in uniques], dtype=object).to_numpy()
+    return pd.Series(results[codes], index=series.index, dtype=object)
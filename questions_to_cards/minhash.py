@@ -0,0 +1,104 @@
+import numpy as np
+
+# hash values are computed modulo this Mersenne prime, which keeps every
+# intermediate product (a * token_id + b) inside a uint64
+MINHASH_PRIME = np.uint64((1 << 31) - 1)
+# signature value for an empty clue bag
+EMPTY_HASH = MINHASH_PRIME
+# number of clues whose signatures are computed at once; bounds memory
+SIGNATURE_CHUNK_ROWS = 50000
+
+
+def minhash_signatures(clue_matrix, num_perm=64, seed=0) -> np.ndarray:
+    '''
+    Compute a MinHash signature for every clue bag. The fraction of
+    positions at which two signatures agree estimates the Jaccard similarity
+    of the two clue bags.
+
+    Inputs:
+        - clue_matrix (csr_matrix): binary clue-bag matrix from
+        clue_bags.encode_clue_bags()
+        - num_perm (int): number of hash functions (signature length)
+        - seed (int): seed for drawing the hash functions, so signatures are
+        reproducible across runs
+    Returns (numpy array): uint64 array of shape (number of clues, num_perm).
+    Empty clue bags get EMPTY_HASH in every position.
+    '''
+    rng = np.random.default_rng(seed)
+    mult = rng.integers(1, MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+    incr = rng.integers(0, MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+
+    n_rows = clue_matrix.shape[0]
+    signatures = np.full((n_rows, num_perm), EMPTY_HASH, dtype=np.uint64)
+    for chunk_start in range(0, n_rows, SIGNATURE_CHUNK_ROWS):
+        chunk = clue_matrix[chunk_start:chunk_start + SIGNATURE_CHUNK_ROWS]
+        bag_sizes = np.diff(chunk.indptr)
+        nonempty = np.flatnonzero(bag_sizes > 0)
+        if len(nonempty) == 0:
+            continue
+        token_ids = chunk.indices.astype(np.uint64)
+        hashed = (token_ids[:, None] * mult + incr) % MINHASH_PRIME
+        signatures[chunk_start + nonempty] = np.minimum.reduceat(hashed, chunk.indptr[nonempty], axis=0)
+    return signatures
+
+
+def lsh_band_keys(signatures, bands=32) -> np.ndarray:
+    '''
+    Hash each band (run of consecutive signature positions) of each
+    signature down to a single key. Two clues whose keys match in any band
+    are proposed as a candidate pair.
+
+    Inputs:
+        - signatures (numpy array): output of minhash_signatures()
+        - bands (int): number of bands; must divide the signature length.
+        More bands propose more pairs (higher recall, less pruning).
+    Returns (numpy array): uint64 array of shape (number of clues, bands)
+    '''
+    num_perm = signatures.shape[1]
+    assert num_perm % bands == 0, "Number of bands must divide signature length"
+    rows_per_band = num_perm // bands
+
+    # arbitrary odd multipliers for combining a band into one key;
+    # uint64 arithmetic wraps around, which is fine for hashing
+    band_mult = np.random.default_rng(num_perm).integers(1, 1 << 62, size=rows_per_band,
+                                                         dtype=np.uint64) | np.uint64(1)
+    banded = signatures.reshape(len(signatures), bands, rows_per_band)
+    return (banded * band_mult).sum(axis=2, dtype=np.uint64)
+
+
+def lsh_index(block_keys):
+    '''
+    Sort the band keys of an answer block so candidates for any clue can be
+    found by binary search.
+
+    Inputs:
+        - block_keys (numpy array): lsh_band_keys() rows for the clues in
+        the block
+    Returns (tuple of numpy arrays): for each band, (sort order, sorted keys)
+    '''
+    index = []
+    for band in range(block_keys.shape[1]):
+        order = np.argsort(block_keys[:, band], kind='stable')
+        index.append((order, block_keys[order, band]))
+    return index
+
+
+def lsh_candidates(index, query_keys) -> np.ndarray:
+    '''
+    Find every clue in an indexed answer block that shares at least one band
+    key with the query clue.
+
+    Inputs:
+        - index (list of tuples): output of lsh_index()
+        - query_keys (numpy array): lsh_band_keys() row of the query clue
+    Returns (numpy array): sorted positions within the block
+    '''
+    matches = []
+    for band, (order, sorted_keys) in enumerate(index):
+        lo = np.searchsorted(sorted_keys, query_keys[band], side='left')
+        hi = np.searchsorted(sorted_keys, query_keys[band], side='right')
+        if hi > lo:
+            matches.append(order[lo:hi])
+    if len(matches) == 0:
+        return np.empty(0, dtype=np.intp)
+    return np.unique(np.concatenate(matches))
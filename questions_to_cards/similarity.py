@@ -2,13 +2,22 @@ import pandas as pd
 import numpy as np
 import string
 import re
+import time
 from unidecode import unidecode
 from tqdm import tqdm
 tqdm.pandas()
 from collections import Counter
+from functools import partial, lru_cache
 import spacy
-import batch_jaro_winkler as bjw # by Dominik Bousquet, https://github.com/dbousque/batch_jaro_winkler
+from concurrent.futures import ProcessPoolExecutor
 from dynamic_threshes import ans_thresh_hashtable, dynamic_clue_thresh
+from clue_bags import (BLOCK_ROWS, build_vocabulary, encode_clue_bags,
+                       shared_word_counts, dense_row, overlap_coefficients)
+from minhash import minhash_signatures, lsh_band_keys, lsh_index, lsh_candidates
+from audit_log import AuditLog, SHORTER_MATCH, LONGER_MATCH
+from memo_cache import get_memo_cache, memoized_apply
+from subset_index import subset_index
+from answer_graph import answer_threshold, answer_neighbour_graph, answer_components
 
 spacy.require_cpu()
 
@@ -31,24 +40,45 @@ ans_stopwords = {'accept', 'prompt', 'reject', 'directed', 'antiprompt',
 all_stopwords = qb_stopwords | more_stopwords | indicator_stopwords
 qb_punctuation = string.punctuation + '“”'
 
+REJECT_PATTERN = re.compile(r'(?:do not|don’t)\s(?:accept|prompt|take)\s|reject\s')
+BRACKETS_PATTERN = re.compile(r'\[[^\[]+\]|\([^\(]+\)|{[^\{]+}')
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s\d]')
+
+# normalize_texts() joins texts with this separator; the JOINED_ patterns are
+# the ones above, changed so they never match across or remove a separator
+TEXT_SEP = '\x00'
+NORMALIZE_CHUNK_SIZE = 100000
+JOINED_REJECT_PATTERN = re.compile(r'(?:(?:do not|don’t)\s(?:accept|prompt|take)\s|reject\s)[^\x00]*')
+JOINED_BRACKETS_PATTERN = re.compile(r'\[[^\[\x00]+\]|\([^\(\x00]+\)|{[^\{\x00]+}')
+JOINED_PUNCTUATION_PATTERN = re.compile(r'[^\w\s\d\x00]')
+NON_ASCII_PATTERN = re.compile(r'[^\x00-\x7f]+')
+# the ASCII characters PUNCTUATION_PATTERN removes, except the separator
+ASCII_PUNCTUATION = bytes(char for char in range(1, 128) if PUNCTUATION_PATTERN.match(chr(char)))
+
 pd.set_option('display.max_colwidth', 400)
 
 
-def subset(clues, ans_term=None, clue_term=None, write_out=False):
+def subset(clues, ans_term=None, clue_term=None, write_out=False, how='and', rebuild=False):
     '''
     Generate subsets of a DataFrame for quicker similarity comparison.
 
     Inputs:
         - clues (string or DataFrame): can take a filepath string to import
         from filepath; otherwise, take an existing DataFrame of clues
-        - ans_term (string or None): term that must be in answer line upon
-        filtering.
-        - clue_term (string or None): term that must be in clue upon
-        filtering. As of now, ans_term filter is applied FIRST, and having
-        a non-null value for both ans_term and clue_term produces the strict
-        INTERSECTION in which both are present.
-        #TODO: Consider altering behavior to allow for UNION/OR.
+        - ans_term (string, list of strings or None): term(s) that must be in
+        answer line upon filtering, ignoring case.
+        - clue_term (string, list of strings or None): term(s) that must be in
+        clue upon filtering, ignoring case.
         - write_out (boolean): whether to write to file or not.
+        - how (string): 'and' keeps rows matching every term (the strict
+        INTERSECTION), 'or' keeps rows matching any of them (the UNION).
+        - rebuild (boolean): whether to rebuild the DataFrame's index first;
+        needed after its answer or clue values are changed in place.
+
+    Literal terms are looked up in an inverted index of the DataFrame's
+    answer and clue tokens, built the first time the DataFrame is subsetted
+    (see subset_index.py), so later lookups take milliseconds. Terms with
+    regex special characters are matched with a regex scan instead.
 
     Returns (pandas DataFrame): the subset you want.
     '''
@@ -60,19 +90,13 @@ def subset(clues, ans_term=None, clue_term=None, write_out=False):
     if ans_term is None and clue_term is None:
         return clues
 
-    subset = clues
+    ans_terms = [ans_term] if isinstance(ans_term, str) else list(ans_term or [])
+    clue_terms = [clue_term] if isinstance(clue_term, str) else list(clue_term or [])
+    for term in ans_terms + clue_terms:
+        print(term.lower())
 
-    if ans_term is not None:
-        ans_term = ans_term.lower()
-        print(ans_term)
-        subset = subset.loc[(subset.loc[:, 'answer'].str.contains(ans_term, flags=re.IGNORECASE)) &
-                            (~subset.loc[:, 'answer'].isna()), :]  # some answers are 'nan'
-        subset.reset_index(drop=True, inplace=True)
-    if clue_term is not None:
-        print(clue_term)
-        clue_term = clue_term.lower()
-        subset = subset.loc[(subset.loc[:, 'clue'].str.contains(clue_term, flags=re.IGNORECASE)), :]
-        subset.reset_index(drop=True, inplace=True)
+    mask = subset_index(clues, rebuild=rebuild).subset_mask(ans_terms, clue_terms, how)
+    subset = clues.loc[mask, :].reset_index(drop=True)
 
     if write_out:
         write_filepath = f'subset_{ans_term}_{clue_term}.csv'
@@ -92,31 +116,39 @@ def distill(
     If it's an answer line, removes acceptable/promptable answers to expand
     range of matching.
     '''
+    phrase = distill_words(phrase, answerline, remove_brackets)
+
+    #Source: https://www.machinelearningplus.com/nlp/lemmatization-examples-python/
+    if lemmatize:
+        doc = nlp(' '.join(phrase))
+        phrase = [token.lemma_ for token in doc]
+
+    return join_distilled(phrase, max_length)
+
+
+def distill_words(phrase: str, answerline=False, remove_brackets=True) -> list:
+    '''
+    First stage of distill(): everything up to lemmatization. Returns the
+    list of remaining words.
+    '''
     if type(phrase) != str:
         phrase = str(phrase)
 
-    if answerline:
-        REJECT_RE = r'(?:do not|don’t)\s(?:accept|prompt|take)\s|reject\s'
-        # get rid of everything after reject/do not accept
-        phrase = re.split(REJECT_RE, phrase)[0]
+    phrase = normalize_text(phrase, answerline, remove_brackets)
+    return filter_distilled(phrase.split(), answerline)
 
-    if remove_brackets:
-        phrase = re.sub(r'\[[^\[]+\]|\([^\(]+\)|{[^\{]+}', '', phrase)
 
-    try:
-        phrase = re.sub(r'[^\w\s\d]', '', unidecode(phrase.lower()))
-    except AttributeError:  # it gets 'nan' sometimes which messes it up
-        phrase = re.sub(r'[^\w\s\d]', '', unidecode(phrase.lower()))
-    phrase = [word for word in phrase.split() if word not in qb_stopwords]
+def filter_distilled(words, answerline=False) -> list:
+    '''Drop the words distill() treats as stopwords.'''
+    phrase = [word for word in words if word not in qb_stopwords]
     if answerline:
         phrase = [word for word in phrase if word not in ans_stopwords]
+    return phrase
 
-    #Source: https://www.machinelearningplus.com/nlp/lemmatization-examples-python/
-    if lemmatize:
-        doc = nlp(' '.join(phrase))
-        distilled_phrase = ''.join([token.lemma_ for token in doc])
-    else:
-        distilled_phrase = ''.join(phrase)
+
+def join_distilled(words, max_length=50) -> str:
+    '''Last stage of distill(): join (lemmatized) words and truncate.'''
+    distilled_phrase = ''.join(words)
 
     if len(distilled_phrase) > max_length:
         distilled_phrase = distilled_phrase[:max_length + 1]
@@ -129,24 +161,566 @@ def wordify(clue: str, answerline=False, lemmatize=False):
     Convert a sentence/clue/answer into a set of unique non-stopword words.
     This prepares the input for Jaccard or overlap similarity comparisons.
     '''
-    if answerline:
-        REJECT_RE = r'(?:do not|don’t)\s(?:accept|prompt|take)\s|reject\s'
-        # get rid of everything after reject/do not accept
-        clue = re.split(REJECT_RE, clue)[0]
-
-    clue = re.sub(r'[^\w\s\d]', '', unidecode(clue.lower()))
+    clue = wordify_text(clue, answerline)
 
     if lemmatize:
         doc = nlp(clue)
-        word_set = {token.lemma_ for token in doc}
-        word_set = {wd for wd in word_set if wd not in all_stopwords}
+        words = [token.lemma_ for token in doc]
     else:
-        word_set = {wd for wd in clue.split() if wd not in all_stopwords}
+        words = clue.split()
+
+    return word_set(words, answerline)
+
 
+def wordify_text(clue: str, answerline=False) -> str:
+    '''
+    First stage of wordify(): lowercase, transliterate and strip punctuation.
+    Returns the text that gets split (or lemmatized) into words.
+    '''
+    return normalize_text(clue, answerline, remove_brackets=False)
+
+
+def normalize_text(text: str, answerline=False, remove_brackets=False) -> str:
+    '''
+    Text cleaning shared by distill() and wordify(): cut off anything after
+    reject/do not accept (if an answer line), remove bracketed text (if
+    remove_brackets), then lowercase, transliterate to ASCII and strip
+    punctuation.
+    '''
     if answerline:
-        return {wd for wd in word_set if wd not in ans_stopwords}
+        # get rid of everything after reject/do not accept
+        text = REJECT_PATTERN.split(text)[0]
+
+    if remove_brackets:
+        text = BRACKETS_PATTERN.sub('', text)
+
+    return PUNCTUATION_PATTERN.sub('', unidecode(text.lower()))
+
+
+def normalize_texts(texts, answerline=False, remove_brackets=False) -> list:
+    '''
+    normalize_text() for many texts at once. The texts are joined into one
+    string, separated by TEXT_SEP, so each pattern runs once over the whole
+    chunk instead of once per text, and unidecode() only runs on the
+    non-ASCII parts.
+
+    Inputs:
+        - texts (iterable of str): texts to normalize
+        - answerline (boolean), remove_brackets (boolean): as in
+        normalize_text()
+    Returns (list of str): the same results normalize_text() gives
+    '''
+    texts = list(texts)
+    normalized = []
+    for start in range(0, len(texts), NORMALIZE_CHUNK_SIZE):
+        chunk = texts[start:start + NORMALIZE_CHUNK_SIZE]
+        # a text TEXT_SEP can't safely separate (or a non-string, which
+        # should raise the same error it would in normalize_text())
+        if not all(type(text) == str and TEXT_SEP not in text for text in chunk):
+            normalized.extend(normalize_text(text, answerline, remove_brackets) for text in chunk)
+            continue
+
+        joined = TEXT_SEP.join(chunk)
+        if answerline:
+            joined = JOINED_REJECT_PATTERN.sub('', joined)
+        if remove_brackets:
+            joined = JOINED_BRACKETS_PATTERN.sub('', joined)
+        joined = joined.lower()
+        if not joined.isascii():
+            joined = NON_ASCII_PATTERN.sub(lambda match: transliterate(match.group()), joined)
+        if joined.isascii():
+            # deleting bytes is much faster than a regex substitution
+            joined = joined.encode('ascii').translate(None, ASCII_PUNCTUATION).decode('ascii')
+        else:
+            joined = JOINED_PUNCTUATION_PATTERN.sub('', joined)
+
+        chunk_normalized = joined.split(TEXT_SEP)
+        if len(chunk_normalized) != len(chunk):  # unidecode() produced a TEXT_SEP
+            chunk_normalized = [normalize_text(text, answerline, remove_brackets) for text in chunk]
+        normalized.extend(chunk_normalized)
+    return normalized
+
+
+@lru_cache(maxsize=100000)
+def transliterate(text: str) -> str:
+    '''unidecode(), cached: the same accented words come up again and again.'''
+    return unidecode(text)
+
+
+def word_set(words, answerline=False) -> set:
+    '''Last stage of wordify(): unique words, without stopwords.'''
+    unique_words = set(words) - all_stopwords
+
+    if answerline:
+        return unique_words - ans_stopwords
     else:
-        return word_set
+        return unique_words
+
+
+def lemma_table(texts, batch_size=1000, n_process=1) -> dict:
+    '''
+    Lemmatize many texts at once. Each distinct text is run through spaCy
+    only once, and texts are streamed through nlp.pipe() in batches (and,
+    if n_process > 1, in several processes), which is much faster than
+    calling nlp() on each one.
+
+    Inputs:
+        - texts (iterable of str): texts to lemmatize
+        - batch_size (int): number of texts spaCy processes at a time
+        - n_process (int): number of spaCy worker processes
+    Returns (dict): text -> list of its tokens' lemmas
+    '''
+    unique_texts = list(dict.fromkeys(texts))
+    docs = nlp.pipe(unique_texts, batch_size=batch_size, n_process=n_process)
+    return {text: [token.lemma_ for token in doc]
+            for text, doc in zip(unique_texts, tqdm(docs, total=len(unique_texts)))}
+
+
+def distill_many(phrases, answerline=False, remove_brackets=True, lemmatize=False,
+                 max_length=50, batch_size=1000, n_process=1) -> list:
+    '''
+    distill() for a list of phrases, lemmatizing them in batches with
+    lemma_table(). Returns a list of the same results distill() gives.
+    '''
+    phrases = [phrase if type(phrase) == str else str(phrase) for phrase in phrases]
+    phrases = normalize_texts(phrases, answerline, remove_brackets)
+    if not lemmatize:
+        # filter the words of every phrase in one flat list; the separators
+        # survive as words of their own, so the phrases can be split apart again
+        stopwords = qb_stopwords | ans_stopwords if answerline else qb_stopwords
+        words = f' {TEXT_SEP} '.join(phrases).split()
+        phrases = ''.join([word for word in words if word not in stopwords]).split(TEXT_SEP)
+        # same truncation as join_distilled()
+        return [phrase[:max_length + 1] for phrase in phrases]
+
+    phrases = [filter_distilled(phrase.split(), answerline) for phrase in phrases]
+    lemmas = lemma_table((' '.join(phrase) for phrase in phrases), batch_size, n_process)
+    phrases = [lemmas[' '.join(phrase)] for phrase in phrases]
+    return [join_distilled(phrase, max_length) for phrase in phrases]
+
+
+def wordify_many(clues, answerline=False, lemmatize=False, batch_size=1000, n_process=1) -> list:
+    '''
+    wordify() for a list of clues, lemmatizing them in batches with
+    lemma_table(). Returns a list of the same results wordify() gives.
+    '''
+    clues = normalize_texts(clues, answerline)
+    if lemmatize:
+        lemmas = lemma_table(clues, batch_size, n_process)
+        return [word_set(lemmas[clue], answerline) for clue in clues]
+    stopwords = all_stopwords | ans_stopwords if answerline else all_stopwords
+    return [set(clue.split()) - stopwords for clue in clues]
+
+
+def answer_blocks(unique_idxs):
+    '''
+    Group the row indices of a sorted clue DataFrame by simple answer.
+
+    Inputs:
+        - unique_idxs (numpy array): for each row, the index of its simple
+        answer in the sorted array of unique simple answers (i.e. the inverse
+        output of np.unique).
+    Returns (list of numpy arrays): for each unique simple answer, the sorted
+    row indices whose simple answer it is.
+    '''
+    row_order = np.argsort(unique_idxs, kind='stable')
+    block_ends = np.cumsum(np.bincount(unique_idxs))[:-1]
+    return np.split(row_order, block_ends)
+
+
+def answer_neighbourhood(answer_graph, answer_idx, rows_by_answer):
+    '''
+    Find every row whose simple answer is similar enough to a unique simple
+    answer to be compared against it. Computed once per unique simple
+    answer, so the work done for each row afterward scales with the size of
+    its answer block rather than with the size of the whole DataFrame.
+
+    Inputs:
+        - answer_graph (csr_matrix): answer_graph.answer_neighbour_graph()
+        output for all unique simple answers
+        - answer_idx (int): index of the simple answer to find neighbours for
+        - rows_by_answer (list of numpy arrays): output of answer_blocks()
+    Returns (tuple of numpy arrays): sorted row indices of the candidate rows,
+    and the Jaro-Winkler score of each candidate row's answer
+    '''
+    row_slice = slice(answer_graph.indptr[answer_idx], answer_graph.indptr[answer_idx + 1])
+    neighbours = answer_graph.indices[row_slice]
+    scores = answer_graph.data[row_slice].astype(np.float64)
+    if len(neighbours) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0)
+    rows = np.concatenate([rows_by_answer[i] for i in neighbours])
+    row_scores = np.repeat(scores, [len(rows_by_answer[i]) for i in neighbours])
+    row_order = np.argsort(rows)
+    return rows[row_order], row_scores[row_order]
+
+
+def mark_redundant_rows(
+        df,
+        clue_matrix,
+        skip_thresh=None,
+        ans_thresh=0.7,
+        clue_thresh=0.6,
+        dynamic_threshes=True,
+        max_ans_len=50,
+        match_method='exact',
+        num_perm=64,
+        lsh_bands=32,
+        is_new=None,
+        verbose=1,
+        audit_log=None,
+        answer_graph=None,
+        answer_graph_dir=None,
+        n_threads=1):
+    '''
+    Decide which rows of a prepared clue DataFrame are redundant. This is the
+    row-by-row deletion logic of remove_redundancies(), which describes the
+    algorithm and the keyword arguments.
+
+    Inputs:
+        - df (DataFrame): clues sorted by simple answer, with a RangeIndex and
+        'clue', 'simple_answer' and 'bag_size' columns
+        - clue_matrix (csr_matrix): clue bags of df's rows, in the same order,
+        from clue_bags.encode_clue_bags()
+        - is_new (numpy array of bools or None): if given, only rows marked
+        True are considered, each against every row marked False and every
+        LATER row marked True. Rows marked False are never compared with each
+        other. Used to deduplicate newly ingested clues against an existing
+        deck (see dedup_index.py).
+        - verbose (int): 0 prints nothing, 1 prints stage messages and a
+        progress bar, 2 also prints every decision for every row (slow).
+        - audit_log (AuditLog or None): if given, every deletion is recorded
+        in it (see audit_log.py).
+        - answer_graph (csr_matrix or None): answer_graph.answer_neighbour_graph()
+        output for df's unique simple answers, if already computed
+        - answer_graph_dir (str or None): directory of cached answer graphs
+        (see answer_graph.cached_answer_graph())
+        - n_threads (int): number of threads to score answers with
+    Returns (numpy array of bools): True for each row marked for deletion
+    '''
+    all_ans_threshes = ans_thresh_hashtable(max_ans_len+1) if dynamic_threshes else None
+
+    if verbose >= 1:
+        print("Counting frequency of each simplified answer...")
+    simple_ans_freqs = Counter(df.loc[:, 'simple_answer'])
+    bag_size_numpy = df["bag_size"].to_numpy()
+    clue_numpy = df["clue"].to_numpy()
+
+    if match_method == 'minhash':
+        if verbose >= 1:
+            print("Computing MinHash signatures and LSH band keys...")
+        band_keys = lsh_band_keys(minhash_signatures(clue_matrix, num_perm), lsh_bands)
+
+    # this line breaks if I don't dropna (if "nan" is an answer). TODO: fix
+    unique_strs, unique_idxs = np.unique(df[["simple_answer"]].to_numpy().flatten(), return_inverse=True)
+    rows_by_answer = answer_blocks(unique_idxs)
+    if answer_graph is None:
+        if verbose >= 1:
+            print("Calculating batch Jaro-Winkler similarity scores between answers...")
+        # only answers some row will actually look for neighbours of
+        query_mask = np.full(len(unique_strs), True)
+        if skip_thresh is not None:
+            query_mask &= np.bincount(unique_idxs) >= skip_thresh
+        if is_new is not None:
+            query_mask &= np.bincount(unique_idxs, weights=is_new, minlength=len(unique_strs)) > 0
+        answer_graph = answer_neighbour_graph(unique_strs,
+                                              query_mask=query_mask,
+                                              ans_thresh=ans_thresh,
+                                              all_ans_threshes=all_ans_threshes,
+                                              n_threads=n_threads,
+                                              cache_dir=answer_graph_dir)
+
+    # initialize variables
+    prev_answer = None
+    rows_marked_del = 0
+    neighbourhood = np.empty(0, dtype=np.intp)
+    neighbourhood_scores = np.empty(0)
+    answer_rows = np.empty(0, dtype=np.intp)
+    shared_block = None
+    shared_block_start = 0
+    deleted_rows = np.full((len(df),), False)
+
+    rows_to_consider = df if is_new is None else df.loc[is_new]
+    for row_tuple in tqdm(rows_to_consider.itertuples(), total=len(rows_to_consider),
+                          disable=(verbose != 1)):
+        if verbose >= 2:
+            print(f"\nNOW CONSIDERING ROW {row_tuple.Index}.")
+        if deleted_rows[row_tuple.Index]:
+            if verbose >= 2:
+                print(f"Row {row_tuple.Index} has been marked for deletion. Continuing")
+            continue
+        elif verbose >= 2:
+            print(f"answer: {row_tuple.simple_answer}")
+
+        this_ans_freq = simple_ans_freqs[row_tuple.simple_answer]
+        if skip_thresh is not None and this_ans_freq < skip_thresh:
+            if verbose >= 2:
+                print(f"This answer occurs only {this_ans_freq} times. Not often enough to calculate scores")
+                print("Skipping")
+            continue
+
+        if row_tuple.simple_answer != prev_answer:
+            # Recalculate similarity scores
+            ans_thresh = answer_threshold(row_tuple.simple_answer, ans_thresh, all_ans_threshes)
+            if dynamic_threshes and verbose >= 2:
+                print(f"New similarity threshold for {row_tuple.simple_answer} = {ans_thresh}")
+            # Find which rows have answer with a high enough similarity score
+            neighbourhood, neighbourhood_scores = answer_neighbourhood(answer_graph,
+                                                                       unique_idxs[row_tuple.Index],
+                                                                       rows_by_answer)
+            answer_rows = rows_by_answer[unique_idxs[row_tuple.Index]]
+            if is_new is not None:
+                answer_rows = answer_rows[is_new[answer_rows]]
+                indexed_in_neighbourhood = ~is_new[neighbourhood]
+            shared_block = None
+            if match_method == 'minhash':
+                block_lsh_index = lsh_index(band_keys[neighbourhood])
+                # MinHash can't say anything about empty clue bags, which
+                # count as total overlap with everything; always check them
+                empty_positions = np.flatnonzero(bag_size_numpy[neighbourhood] == 0)
+            prev_answer = row_tuple.simple_answer
+
+        # keep only LATER rows with a similar answer (neighbourhood is sorted)
+        first_later = np.searchsorted(neighbourhood, row_tuple.Index, side='right')
+        if is_new is None:
+            eligible_positions = np.arange(first_later, len(neighbourhood))
+        else:
+            # ...plus every already-indexed row, at any position
+            eligible_positions = np.flatnonzero(indexed_in_neighbourhood |
+                                                (np.arange(len(neighbourhood)) >= first_later))
+
+        # Within the answer block, find matching clues by calculating overlap
+        # coefficients between this row's clue and each other clue.
+        # See https://en.wikipedia.org/wiki/Overlap_coefficient
+        if match_method == 'minhash':
+            # only check pairs proposed by the LSH index
+            if row_tuple.bag_size == 0:
+                candidate_positions = eligible_positions
+            else:
+                candidate_positions = np.union1d(lsh_candidates(block_lsh_index,
+                                                                band_keys[row_tuple.Index]),
+                                                 empty_positions)
+                candidate_positions = np.intersect1d(candidate_positions, eligible_positions)
+            candidate_rows = neighbourhood[candidate_positions]
+            shared_words = shared_word_counts(clue_matrix, [row_tuple.Index], candidate_rows).toarray().ravel()
+        else:
+            # Shared word counts for up to BLOCK_ROWS clues of this answer
+            # come from a single sparse matrix product.
+            answer_pos = np.searchsorted(answer_rows, row_tuple.Index)
+            if shared_block is None or answer_pos >= shared_block_start + shared_block.shape[0]:
+                shared_block_start = answer_pos
+                shared_block = shared_word_counts(clue_matrix,
+                                                  answer_rows[answer_pos:answer_pos + BLOCK_ROWS],
+                                                  neighbourhood)
+            candidate_positions = eligible_positions
+            candidate_rows = neighbourhood[candidate_positions]
+            shared_words = dense_row(shared_block, answer_pos - shared_block_start)[candidate_positions]
+        candidate_bag_sizes = bag_size_numpy[candidate_rows]
+        clue_overlap_vals = overlap_coefficients(shared_words, row_tuple.bag_size, candidate_bag_sizes)
+        if dynamic_threshes:
+            clue_thresh = dynamic_clue_thresh(row_tuple.bag_size)
+            if verbose >= 2:
+                print(f"Similarity threshold for this clue: {clue_thresh}")
+        CLUE_MATCH_MASK = clue_overlap_vals > clue_thresh
+
+        if CLUE_MATCH_MASK.any():
+            # within those, get strictly shorter clues
+            if verbose >= 2:
+                print(f"This clue: {row_tuple.clue}")
+            SMALLER_MASK = candidate_bag_sizes < row_tuple.bag_size
+            DEL_MASK = ~deleted_rows[candidate_rows]
+            SMALLER_SUBSET_MASK = CLUE_MATCH_MASK & SMALLER_MASK & DEL_MASK
+            if (num_subset_del := SMALLER_SUBSET_MASK.sum()) > 0:
+                # mark all such rows for deletion
+                if verbose >= 2:
+                    print(f"{num_subset_del} rows ready to be marked for deletion")
+                    print(df.loc[candidate_rows[SMALLER_SUBSET_MASK], :])
+                deleted_rows[candidate_rows[SMALLER_SUBSET_MASK]] = True
+                rows_marked_del += num_subset_del
+                if audit_log is not None:
+                    for match in np.flatnonzero(SMALLER_SUBSET_MASK):
+                        audit_log.record(row_tuple.Index, candidate_rows[match],
+                                         row_tuple.clue, clue_numpy[candidate_rows[match]],
+                                         neighbourhood_scores[candidate_positions[match]],
+                                         clue_overlap_vals[match], ans_thresh, clue_thresh,
+                                         SHORTER_MATCH)
+            elif verbose >= 2:
+                print("NO MATCHING CLUES OF SMALLER LENGTH FOUND")
+
+            # within those, check for ANY strictly longer clue
+            BIGGER_MASK = candidate_bag_sizes > row_tuple.bag_size
+            BIGGER_SUBSET_MASK = CLUE_MATCH_MASK & BIGGER_MASK
+            if BIGGER_SUBSET_MASK.any():
+                if verbose >= 2:
+                    print("THIS ROW IS SHORTER THAN A MATCHING CLUE. MARKING IT FOR DELETION...")
+                    print("(For reference, here is a LONGER row we are KEEPING:)")
+                    print(df.loc[candidate_rows[BIGGER_SUBSET_MASK], :].sample(1))
+                deleted_rows[row_tuple.Index] = True
+                rows_marked_del += 1
+                if audit_log is not None:
+                    match = np.flatnonzero(BIGGER_SUBSET_MASK)[0]
+                    audit_log.record(candidate_rows[match], row_tuple.Index,
+                                     clue_numpy[candidate_rows[match]], row_tuple.clue,
+                                     neighbourhood_scores[candidate_positions[match]],
+                                     clue_overlap_vals[match], ans_thresh, clue_thresh,
+                                     LONGER_MATCH)
+
+        if verbose >= 2:
+            print(f"Rows marked for deletion so far: {rows_marked_del}")
+
+    assert rows_marked_del == deleted_rows.sum()
+    return deleted_rows
+
+
+def _mark_component_rows(task):
+    '''
+    Run mark_redundant_rows() on one batch of components in a worker. Audit
+    records are kept in memory and sent back to be written by the parent.
+    '''
+    component_df, component_matrix, component_graph, match_options, audit = task
+    audit_log = AuditLog() if audit else None
+    deleted_rows = mark_redundant_rows(component_df, component_matrix, audit_log=audit_log,
+                                       answer_graph=component_graph, **match_options)
+    return deleted_rows, (audit_log.to_frame() if audit else None)
+
+
+def mark_redundant_rows_parallel(df, clue_matrix, n_workers, audit_log=None, **match_options):
+    '''
+    Parallel version of mark_redundant_rows(). Rows only interact with rows
+    whose answers are similar, so the DataFrame splits into independent
+    connected components of the answer-similarity graph. Components are
+    packed into batches of consecutive rows, and each batch is run through
+    mark_redundant_rows() in a worker process, with its part of the graph.
+    Because each batch keeps the global row order and answer frequencies,
+    the result is identical to a single-process run, whatever order the
+    workers finish in.
+
+    Inputs:
+        - df (DataFrame): as for mark_redundant_rows()
+        - clue_matrix (csr_matrix): as for mark_redundant_rows()
+        - n_workers (int): number of worker processes
+        - audit_log (AuditLog or None): as for mark_redundant_rows()
+        - **match_options: keyword arguments of mark_redundant_rows()
+    Returns (numpy array of bools): True for each row marked for deletion
+    '''
+    skip_thresh = match_options.get('skip_thresh')
+    dynamic_threshes = match_options.get('dynamic_threshes', True)
+    max_ans_len = match_options.get('max_ans_len', 50)
+    verbose = match_options.get('verbose', 1)
+
+    if verbose >= 1:
+        print("Finding connected components of the answer-similarity graph...")
+    unique_strs, unique_idxs = np.unique(df[["simple_answer"]].to_numpy().flatten(), return_inverse=True)
+    query_mask = None
+    if skip_thresh is not None:
+        # skipped answers never look for neighbours of their own
+        query_mask = np.bincount(unique_idxs) >= skip_thresh
+    graph = answer_neighbour_graph(
+        unique_strs,
+        query_mask=query_mask,
+        ans_thresh=match_options.get('ans_thresh', 0.7),
+        all_ans_threshes=ans_thresh_hashtable(max_ans_len+1) if dynamic_threshes else None,
+        n_threads=n_workers,
+        cache_dir=match_options.get('answer_graph_dir'))
+    components = answer_components(graph)
+    rows_by_component = answer_blocks(components[unique_idxs])
+    if verbose >= 1:
+        print(f"{len(rows_by_component)} answer components found")
+
+    # pack components into batches of roughly equal size, several per worker
+    target_rows = max(1, len(df) // (n_workers * 4))
+    batches, current_batch, current_size = [], [], 0
+    for component_rows in rows_by_component:
+        current_batch.append(component_rows)
+        current_size += len(component_rows)
+        if current_size >= target_rows:
+            batches.append(np.sort(np.concatenate(current_batch)))
+            current_batch, current_size = [], 0
+    if len(current_batch) > 0:
+        batches.append(np.sort(np.concatenate(current_batch)))
+
+    # workers only print per-row detail; one progress bar per worker is noise
+    worker_options = {**match_options, 'verbose': 0 if verbose < 2 else verbose}
+    def batch_graph(batch_rows):
+        # answers are sorted, so the batch's own unique answers keep this order
+        batch_answers = np.unique(unique_idxs[batch_rows])
+        return graph[batch_answers][:, batch_answers]
+
+    tasks = ((df.iloc[batch_rows].reset_index(drop=True), clue_matrix[batch_rows],
+              batch_graph(batch_rows), worker_options, audit_log is not None)
+             for batch_rows in batches)
+    deleted_rows = np.full((len(df),), False)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = executor.map(_mark_component_rows, tasks)
+        for batch_rows, (batch_deleted, batch_audit) in tqdm(zip(batches, results), total=len(batches),
+                                                             disable=(verbose != 1)):
+            deleted_rows[batch_rows] = batch_deleted
+            if batch_audit is not None:
+                # translate batch-local row numbers back to df's
+                batch_audit['kept_row'] = batch_rows[batch_audit['kept_row'].to_numpy(dtype=np.intp)]
+                batch_audit['deleted_row'] = batch_rows[batch_audit['deleted_row'].to_numpy(dtype=np.intp)]
+                audit_log.extend(batch_audit)
+    return deleted_rows
+
+
+def prepare_clue_df(
+        clue_df,
+        max_ans_len=50,
+        ans_term=None,
+        clue_term=None,
+        simplify_answers=True,
+        lemmatize=False,
+        asc=True,
+        memo_cache_dir=None,
+        lemma_batch_size=1000,
+        lemma_processes=1):
+    '''
+    Add the columns redundancy removal works from ('simple_answer',
+    'clue_bag', 'bag_size') and sort by simplified answer, so that all rows
+    with the same simple answer are consecutive. See remove_redundancies()
+    for the keyword arguments.
+
+    Returns (DataFrame): the prepared, sorted DataFrame with a RangeIndex
+    '''
+    if ans_term is not None or clue_term is not None:
+        print("Subsetting dataframe...")
+    df = subset(clue_df, ans_term, clue_term)
+
+    # distill() and wordify() results are memoized, so repeated answer lines
+    # and clues already seen on earlier runs aren't processed again
+    memo_cache = get_memo_cache(memo_cache_dir)
+    nlp_version = f"{nlp.meta['name']}-{nlp.meta['version']}" if lemmatize else ''
+    lemma_options = {'batch_size': lemma_batch_size, 'n_process': lemma_processes}
+
+    if "simple_answer" not in df.columns:
+        print("Generating simplified answer lines for every row...")
+        if simplify_answers:
+            df.loc[:,'simple_answer'] = memoized_apply(df.loc[:,'answer'].map(str), distill,
+                                                       cache=memo_cache,
+                                                       salt=nlp_version,
+                                                       batch_func=partial(distill_many, **lemma_options),
+                                                       answerline=True,
+                                                       max_length=max_ans_len,
+                                                       lemmatize=lemmatize)
+        else:
+            df.loc[:,'simple_answer'] = df.loc[:,'answer']
+
+    print("generating clue bag...")
+    df.loc[:, 'clue_bag'] = memoized_apply(df.loc[:, 'clue'], wordify,
+                                           cache=memo_cache,
+                                           salt=nlp_version,
+                                           batch_func=partial(wordify_many, **lemma_options),
+                                           lemmatize=lemmatize)
+
+    # this needs to be recalculated every time even if csv has it as a column
+    print("Calculating number of unique words in each clue...")
+    df.loc[:,'bag_size'] = df.loc[:,'clue_bag'].progress_apply(len)
+
+    # greatly reduce runtime, by allowing us to calculate all matches for each
+    # simple answerline only once.
+    print("Sorting database...")
+    df = df.sort_values(by=['simple_answer', 'clue'], ascending=asc)
+    df = df.dropna(how="any", subset=["answer", "simple_answer"]).reset_index(drop=True)
+    return df
 
 
 def remove_redundancies(
@@ -160,7 +734,17 @@ def remove_redundancies(
         dynamic_threshes=True,
         simplify_answers=True,
         lemmatize=False,
-        asc=True
+        asc=True,
+        match_method='exact',
+        num_perm=64,
+        lsh_bands=32,
+        n_workers=None,
+        verbose=1,
+        audit_log_path=None,
+        memo_cache_dir=None,
+        lemma_batch_size=1000,
+        lemma_processes=1,
+        answer_graph_dir=None
 ):
     '''
     Most up-to-date function for finding repetitious clues and deleting them
@@ -202,158 +786,138 @@ def remove_redundancies(
         prior to comparison. Should be set to True.
         - asc (boolean): Determines whether simplified answer lines are sorted
         alphabetically (0-Z, True) or in reverse alphabetical order (Z-0, False).
+        - match_method (str): 'exact' compares every clue against every later
+        clue in its answer block. 'minhash' uses a MinHash + LSH banding index
+        to propose likely high-overlap pairs and checks only those exactly,
+        which is much faster for common answers but can miss some matches
+        (see minhash_recall_report()).
+        - num_perm (int): MinHash signature length ('minhash' only).
+        - lsh_bands (int): number of LSH bands; must divide num_perm. More
+        bands mean higher recall but less pruning ('minhash' only).
+        - n_workers (int or None): if greater than 1, split the DataFrame into
+        connected components of the answer-similarity graph and process them
+        in parallel with this many worker processes. Gives the same result
+        as the single-process run. Answer similarity scores are then also
+        calculated with this many threads.
+        - verbose (int): 0 prints nothing while marking rows, 1 prints stage
+        messages and a progress bar, 2 also prints every decision for every
+        row. Level 2 is very slow on large DataFrames.
+        - audit_log_path (str or None): if given, write a Parquet file with one
+        record per deletion: kept row, deleted row, answer score, clue overlap
+        score and the thresholds used (see audit_log.py).
+        - memo_cache_dir (str or None): directory for the persistent cache of
+        distill() and wordify() results (see memo_cache.py), so answer lines
+        and clues seen on earlier runs aren't processed again. If None, they
+        are only cached for the lifetime of the process.
+        - lemma_batch_size (int): number of texts spaCy lemmatizes at a time,
+        if lemmatize is True.
+        - lemma_processes (int): number of spaCy worker processes to
+        lemmatize with, if lemmatize is True.
+        - answer_graph_dir (str or None): if given, the Jaro-Winkler scores
+        between all unique simple answers are cached in this directory, and
+        reused on later runs with the same answers and thresholds. When new
+        answers appear, only their scores are calculated (see answer_graph.py).
 
     Returns (df): the dataframe with repetitious rows deleted.
     '''
+    assert match_method in ('exact', 'minhash'), f"Unknown match_method {match_method}"
     if dynamic_threshes:
         print("DYNAMIC THRESHOLD-SETTING IS ON")
-        ALL_ANS_THRESHES = ans_thresh_hashtable(max_ans_len+1)
-
-    if ans_term is not None or clue_term is not None:
-        print("Subsetting dataframe...")
-    df = subset(clue_df, ans_term, clue_term)
-
-    if "simple_answer" not in df.columns:
-        print("Generating simplified answer lines for every row...")
-        if simplify_answers:
-            df.loc[:,'simple_answer'] = df.loc[:,'answer'].progress_apply(
-                lambda x:distill(str(x), 
-                                 answerline=True,
-                                 max_length = max_ans_len,
-                                 lemmatize=lemmatize)
-                )
-        else:
-            df.loc[:,'simple_answer'] = df.loc[:,'answer']
 
-    print("Counting frequency of each simplified answer...")
-    simple_ans_freqs = Counter(df.loc[:, 'simple_answer'])
-    #TODO: You probably want to create an ans_len column here instead of calculating
-    # each time you have a new similarity threshold.
-
-    print("generating clue bag...")
-    df.loc[:, 'clue_bag'] = df.loc[:, 'clue'].progress_apply(
-        lambda x: wordify(x, lemmatize=lemmatize)
-        )
-
-    # this needs to be recalculated every time even if csv has it as a column
-    print("Calculating number of unique words in each clue...")
-    df.loc[:,'bag_size'] = df.loc[:,'clue_bag'].progress_apply(len)
-
-    # greatly reduce runtime, by allowing us to calculate all matches for each
-    # simple answerline only once.
-    print("Sorting database...")
-    df = df.sort_values(by=['simple_answer', 'clue'], ascending=asc)
-    df = df.dropna(how="any", subset=["answer", "simple_answer"]).reset_index(drop=True)
-
-    print("Generating numeric_clue_bag table...")
-    bag_size_numpy = df["bag_size"].to_numpy()
-    word_counter = Counter()
-    for clue_bag in df["clue_bag"]:
-        word_counter.update(clue_bag)
-    all_word_arr = np.sort(np.array([word for word in word_counter.keys()]))
-    numeric_clue_bag = np.zeros((len(df), np.amax(bag_size_numpy)), dtype=int)-1
-    for clue_i, clue_bag in enumerate(tqdm(df["clue_bag"])):
-        word_to_idx = np.searchsorted(all_word_arr, np.array(list(clue_bag)))
-        numeric_clue_bag[clue_i, :len(word_to_idx)] = word_to_idx
+    df = prepare_clue_df(clue_df,
+                         max_ans_len=max_ans_len,
+                         ans_term=ans_term,
+                         clue_term=clue_term,
+                         simplify_answers=simplify_answers,
+                         lemmatize=lemmatize,
+                         asc=asc,
+                         memo_cache_dir=memo_cache_dir,
+                         lemma_batch_size=lemma_batch_size,
+                         lemma_processes=lemma_processes)
+
+    print("Encoding clue bags as a sparse matrix...")
+    vocabulary = build_vocabulary(df["clue_bag"])
+    clue_matrix = encode_clue_bags(df["clue_bag"].to_numpy(), vocabulary)
 
     df.loc[:, 'ans_similarity'] = -1.0
     df.loc[:, 'clue_similarity'] = -1.0
 
-    print("Preparing for batch Jaro-Winkler similarity score calculation...")
-    # this line breaks if I don't dropna (if "nan" is an answer). TODO: fix
-    unique_strs, unique_idxs = np.unique(df[["simple_answer"]].to_numpy().flatten(), return_inverse=True)
-    exp_model = bjw.build_exportable_model(unique_strs.flatten())
-    rt_model = bjw.build_runtime_model(exp_model)
-
-    # re-order Jaro-Winkler results from original sort order (based on length)
-    init_bjw_result = bjw.jaro_distance(rt_model, "_")
-    bjw_order_strs = np.array([result_tuple[0] for result_tuple in init_bjw_result])
-    bjw_order_to_alphabetical_idxs = np.argsort(bjw_order_strs)
-
-    # initialize variables
-    prev_answer = None
-    rows_marked_del = 0
-    ans_similarity_bin = np.full((len(df),), False)
-    deleted_rows = set()
-
-    for row_tuple in df.itertuples():
-        print(f"\nNOW CONSIDERING ROW {row_tuple.Index}.")
-        if row_tuple.Index in deleted_rows:
-            print(f"Row {row_tuple.Index} has been marked for deletion. Continuing")
-            continue
-        else:
-            print(f"answer: {row_tuple.simple_answer}")
-
-        this_ans_freq = simple_ans_freqs[row_tuple.simple_answer]
-        if skip_thresh is not None and this_ans_freq < skip_thresh:
-            print(f"This answer occurs only {this_ans_freq} times. Not often enough to calculate scores")
-            print("Skipping")
-            continue
-
-        if row_tuple.simple_answer != prev_answer:
-            # Recalculate similarity scores
-            bjw_result = bjw.jaro_distance(rt_model, row_tuple.simple_answer)
-            unique_res_vals = np.array([result_tuple[1] for result_tuple in bjw_result])[bjw_order_to_alphabetical_idxs]
-            if dynamic_threshes:
-                ans_thresh = ALL_ANS_THRESHES[len(row_tuple.simple_answer)]
-                print(f"New similarity threshold for {row_tuple.simple_answer} = {ans_thresh}")
-            # Find which rows have answer with a high enough similarity score
-            ans_similarity_bin = (unique_res_vals > ans_thresh)[unique_idxs]
-            prev_answer = row_tuple.simple_answer
-
-        # make ans_similarity_bin (ans_similarity > ans_thresh) & (index > row_idx)
-        ans_similarity_bin[:row_tuple.Index+1] = False
-
-        df_subset = df.loc[ans_similarity_bin, :]
-        # Within that, find matching clues by calculating overlap coefficients
-        # between this row's clue and each other clue (speedily, using numpy)
-        # See https://en.wikipedia.org/wiki/Overlap_coefficient
-        shared_words = np.sum(np.isin(numeric_clue_bag[ans_similarity_bin, :], numeric_clue_bag[row_tuple.Index, :row_tuple.bag_size]), axis=1)
-        min_vals = np.minimum(row_tuple.bag_size, bag_size_numpy[ans_similarity_bin])
-
-        # work around numpy ZeroDivisionWarning:
-        # set the 0s to 1000 then set the clue overlap to 1 eventually
-        min_vals[min_vals<1] = 1000
-        clue_overlap_vals = shared_words/min_vals
-        clue_overlap_vals[min_vals==1000] = 1
-        if dynamic_threshes:
-            clue_thresh = dynamic_clue_thresh(row_tuple.bag_size)
-            print(f"Similarity threshold for this clue: {clue_thresh}")
-        CLUE_MATCH_MASK = clue_overlap_vals > clue_thresh
+    match_options = {'skip_thresh': skip_thresh,
+                     'ans_thresh': ans_thresh,
+                     'clue_thresh': clue_thresh,
+                     'dynamic_threshes': dynamic_threshes,
+                     'max_ans_len': max_ans_len,
+                     'match_method': match_method,
+                     'num_perm': num_perm,
+                     'lsh_bands': lsh_bands,
+                     'verbose': verbose,
+                     'answer_graph_dir': answer_graph_dir}
+    audit_log = AuditLog(audit_log_path) if audit_log_path is not None else None
+    if n_workers is not None and n_workers > 1:
+        deleted_rows = mark_redundant_rows_parallel(df, clue_matrix, n_workers,
+                                                    audit_log=audit_log, **match_options)
+    else:
+        deleted_rows = mark_redundant_rows(df, clue_matrix, audit_log=audit_log, **match_options)
+    if audit_log is not None:
+        audit_log.close()
+        print(f"{audit_log.num_records} deletions written to {audit_log_path}")
 
-        if CLUE_MATCH_MASK.sum() > 0:
-            # within those, get strictly shorter clues
-            print(f"This clue: {row_tuple.clue_bag}")
-            SMALLER_MASK = (df_subset.loc[:, 'bag_size'] < row_tuple.bag_size)
-            DEL_MASK = ~df_subset.index.isin(deleted_rows)
-            SMALLER_SUBSET_MASK = CLUE_MATCH_MASK & SMALLER_MASK & DEL_MASK
-            if (num_subset_del := SMALLER_SUBSET_MASK.sum()) > 0:
-                # mark all such rows for deletion
-                print(f"{num_subset_del} rows ready to be marked for deletion")
-                print(df_subset.loc[SMALLER_SUBSET_MASK, :])
-                deleted_rows.update(df_subset.index[SMALLER_SUBSET_MASK])
-                rows_marked_del += num_subset_del
-            else:
-                print("NO MATCHING CLUES OF SMALLER LENGTH FOUND")
+    print(f"{deleted_rows.sum()} total rows marked for deletion")
+    df = df.loc[~deleted_rows, ["clue", "answer", "tags"]]
+    print("Redundant row deletion complete")
+    return df
 
-            # within those, check for ANY strictly longer clue
-            BIGGER_MASK = (df_subset.loc[:, 'bag_size'] > row_tuple.bag_size)
-            BIGGER_SUBSET_MASK = CLUE_MATCH_MASK & BIGGER_MASK
-            if BIGGER_SUBSET_MASK.sum() > 0:
-                print("THIS ROW IS SHORTER THAN A MATCHING CLUE. MARKING IT FOR DELETION...")
-                print("(For reference, here is a LONGER row we are KEEPING:)")
-                print(df_subset.loc[BIGGER_SUBSET_MASK, :].sample(1))
-                deleted_rows.update([row_tuple.Index])
-                rows_marked_del += 1
 
-        print(f"Rows marked for deletion so far: {rows_marked_del}")
+def minhash_recall_report(clue_df, **kwargs):
+    '''
+    Run remove_redundancies() once with the exact matching path and once
+    with the MinHash + LSH path, and report how many of the exact path's
+    deletions the MinHash path also makes.
 
-    assert rows_marked_del == len(deleted_rows)
-    print(f"{rows_marked_del} total rows marked for deletion")
-    deleted_rows_mask = df.index.isin(deleted_rows)
-    df = df.loc[~deleted_rows_mask, ["clue", "answer", "tags"]]
-    print("Redundant row deletion complete")
-    return df
+    Inputs:
+        - clue_df (DataFrame or str): passed to remove_redundancies()
+        - **kwargs: any other remove_redundancies() keyword arguments, used
+        for both runs (except match_method)
+    Returns (dict): row counts, recall, precision and runtime of each path
+    '''
+    kwargs.pop('match_method', None)
+    if type(clue_df) == str:
+        clue_df = pd.read_csv(clue_df, sep='\t')
+
+    start = time.perf_counter()
+    exact_df = remove_redundancies(clue_df.copy(), match_method='exact', **kwargs)
+    exact_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    minhash_df = remove_redundancies(clue_df.copy(), match_method='minhash', **kwargs)
+    minhash_secs = time.perf_counter() - start
+
+    # both runs sort and reindex the DataFrame identically
+    num_rows = len(subset(clue_df, kwargs.get('ans_term'), kwargs.get('clue_term')).dropna(subset=['answer']))
+    exact_kept = set(exact_df.index)
+    minhash_kept = set(minhash_df.index)
+    exact_deleted = num_rows - len(exact_kept)
+    minhash_deleted = num_rows - len(minhash_kept)
+    missed = len(minhash_kept - exact_kept)
+    extra = len(exact_kept - minhash_kept)
+    both_deleted = exact_deleted - missed
+
+    report = {
+        'rows': num_rows,
+        'exact_deleted': exact_deleted,
+        'minhash_deleted': minhash_deleted,
+        'both_deleted': both_deleted,
+        'missed_by_minhash': missed,
+        'extra_in_minhash': extra,
+        'recall': both_deleted / exact_deleted if exact_deleted else 1.0,
+        'precision': both_deleted / minhash_deleted if minhash_deleted else 1.0,
+        'exact_seconds': exact_secs,
+        'minhash_seconds': minhash_secs,
+    }
+    print("\nMINHASH RECALL REPORT")
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    return report
 
 
 if __name__ == '__main__':
@@ -0,0 +1,159 @@
+import re
+import weakref
+from bisect import bisect_right
+import numpy as np
+import pandas as pd
+
+# characters that make a search term a regular expression rather than a
+# literal substring
+REGEX_METACHARACTERS = set('.^$*+?{}[]\\|()')
+# non-ASCII characters that re.IGNORECASE matches with an ASCII letter, but
+# that str.lower() doesn't turn into one
+ASCII_CASE_FOLDS = str.maketrans({'ı': 'i', 'ſ': 's'})
+# rows tokenized at a time while building an index; bounds memory
+INDEX_CHUNK_ROWS = 100000
+# separates tokens in the joined token vocabulary
+TOKEN_SEP = '\n'
+
+# one index per DataFrame, dropped when the DataFrame is garbage collected
+_subset_indexes = {}
+
+
+def fold_case(text: str) -> str:
+    '''Lowercase text the way tokens are stored in a SubsetIndex.'''
+    return text.lower().translate(ASCII_CASE_FOLDS)
+
+
+class TokenPostings:
+    '''
+    Inverted index over the whitespace-separated, case-folded tokens of one
+    text column: for every distinct token, the sorted positions of the rows
+    that contain it.
+    '''
+
+    def __init__(self, column):
+        token_ids = {}
+        row_chunks, token_chunks = [], []
+        values = column.to_numpy()
+        for start in range(0, len(values), INDEX_CHUNK_ROWS):
+            chunk = pd.Series(values[start:start + INDEX_CHUNK_ROWS])
+            chunk = chunk[chunk.map(type) == str]
+            tokens = chunk.map(fold_case).str.split().explode().dropna()
+            codes, uniques = pd.factorize(tokens.to_numpy())
+            chunk_ids = np.array([token_ids.setdefault(token, len(token_ids)) for token in uniques],
+                                 dtype=np.int64)
+            row_chunks.append(tokens.index.to_numpy(dtype=np.int64) + start)
+            token_chunks.append(chunk_ids[codes])
+
+        rows = np.concatenate(row_chunks) if row_chunks else np.empty(0, dtype=np.int64)
+        tokens = np.concatenate(token_chunks) if token_chunks else np.empty(0, dtype=np.int64)
+        order = np.lexsort((rows, tokens))
+        self.rows = rows[order]
+        self.token_starts = np.searchsorted(tokens[order], np.arange(len(token_ids) + 1))
+
+        # all tokens joined into one string, so finding every token that
+        # contains a substring is a single str.find() scan
+        vocabulary = list(token_ids)
+        self.vocabulary = TOKEN_SEP.join(vocabulary)
+        self.vocabulary_offsets = np.cumsum([0] + [len(token) + 1 for token in vocabulary]).tolist()
+
+    def tokens_containing(self, piece: str) -> np.ndarray:
+        '''IDs of every token that contains piece.'''
+        token_ids = []
+        position = self.vocabulary.find(piece)
+        while position != -1:
+            token_id = bisect_right(self.vocabulary_offsets, position) - 1
+            token_ids.append(token_id)
+            # continue from the start of the next token
+            position = self.vocabulary.find(piece, self.vocabulary_offsets[token_id + 1])
+        return np.array(token_ids, dtype=np.int64)
+
+    def rows_containing(self, piece: str) -> np.ndarray:
+        '''Sorted positions of the rows with a token that contains piece.'''
+        token_ids = self.tokens_containing(piece)
+        if len(token_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.rows[self.token_starts[token_id]:self.token_starts[token_id + 1]]
+                                         for token_id in token_ids]))
+
+
+class SubsetIndex:
+    '''
+    Inverted indexes over the 'answer' and 'clue' columns of a clue
+    DataFrame, for fast similarity.subset() queries. Each column is indexed
+    the first time it's queried, so a DataFrame with only one of them can
+    be subsetted on that one.
+
+    A literal search term can only occur in a row if each of its
+    whitespace-separated pieces occurs inside one of the row's tokens, so
+    the index narrows the DataFrame down to those candidate rows, and the
+    exact case-insensitive match is then checked on the candidates only.
+    Terms that are true regular expressions (or have non-ASCII characters,
+    whose case-insensitive matching is more involved) are matched with a
+    regex scan of the whole column, as before.
+
+    The index reflects the DataFrame when it was built; build a new one if
+    its 'answer' or 'clue' values change.
+    '''
+
+    def __init__(self, clues):
+        self.num_rows = len(clues)
+        self.columns = {column: clues[column] for column in ('answer', 'clue') if column in clues.columns}
+        self.postings = {}
+
+    def term_mask(self, column, term) -> np.ndarray:
+        '''
+        Rows of column that contain term, ignoring case: the same rows as
+        column.str.contains(term, flags=re.IGNORECASE), except that missing
+        values never match.
+        '''
+        values = self.columns[column]
+        pieces = term.split()
+        if (any(char in REGEX_METACHARACTERS for char in term) or not term.isascii()
+                or len(pieces) == 0):
+            return values.str.contains(term, flags=re.IGNORECASE, na=False).to_numpy(dtype=bool)
+
+        if column not in self.postings:
+            self.postings[column] = TokenPostings(values)
+        postings = self.postings[column]
+        candidates = postings.rows_containing(fold_case(pieces[0]))
+        for piece in pieces[1:]:
+            candidates = np.intersect1d(candidates, postings.rows_containing(fold_case(piece)),
+                                        assume_unique=True)
+        mask = np.full(self.num_rows, False)
+        mask[candidates] = values.iloc[candidates].str.contains(term, flags=re.IGNORECASE).to_numpy(dtype=bool)
+        return mask
+
+    def subset_mask(self, ans_terms=(), clue_terms=(), how='and') -> np.ndarray:
+        '''
+        Combine the term masks of several answer and clue terms.
+
+        Inputs:
+            - ans_terms (list of str): terms to look for in the answer column
+            - clue_terms (list of str): terms to look for in the clue column
+            - how (str): 'and' for rows matching every term, 'or' for rows
+            matching any of them
+        Returns (numpy array of bools): which rows to keep
+        '''
+        assert how in ('and', 'or'), f"Unknown combination {how}"
+        masks = ([self.term_mask('answer', term) for term in ans_terms] +
+                 [self.term_mask('clue', term) for term in clue_terms])
+        if how == 'and':
+            return np.logical_and.reduce(masks, initial=True)
+        return np.logical_or.reduce(masks, initial=False)
+
+
+def subset_index(clues, rebuild=False) -> SubsetIndex:
+    '''
+    Return the SubsetIndex of a DataFrame, building it the first time it's
+    asked for (or if rebuild is True). Only the number of rows is checked
+    against the DataFrame, so pass rebuild=True after changing its 'answer'
+    or 'clue' values in place.
+    '''
+    key = id(clues)
+    if rebuild or key not in _subset_indexes or _subset_indexes[key].num_rows != len(clues):
+        if key not in _subset_indexes:
+            weakref.finalize(clues, _subset_indexes.pop, key, None)
+        print("Building subset index...")
+        _subset_indexes[key] = SubsetIndex(clues)
+    return _subset_indexes[key]
@@ -1,17 +1,78 @@
 import pandas as pd
 import numpy as np
 import re
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
+from text_rules import TextRule, apply_rules, apply_rules_to_text, print_rule_timings
+from utility import PeakMemory, format_bytes
 
 tqdm.pandas()
 
 BRACKET_RE = r'<[^>]+>'
 DUMB_QUOTE_RE = re.compile('(?:“|\")([^\"”]+)(?:\"|”)')
 
+#my_split() patterns, compiled once rather than on every call
+#prevent splitting on common titles
+ABBREVS_RE = re.compile(r'(“|\s)(Mr|Mrs|Ms|Mx|Messrs|Dr|Prof|Rev|Lt|Col|Gen|Gov|No|St|Ste|Mme|Mlle|v|vs|Blvd|Op|Mt|Ft)\.')
+#fix order of period-close quote so other REs work better
+WRONG_ENDQUOTE_RE = re.compile(r'(?<=[a-z])\.“(?= [A-Z])')
+#Should be obviated by replacement of dumb quotes
+PERIOD_IN_DUMB_QUOTES_RE = re.compile(r'(\"[^\.\"]+)\.( [^\.\"]+(\.|\?|\!|)\")')
+#remove pronunciation guides where possible
+PRONUNC_GUIDE_RE = re.compile(r'\s(\[“[^\[\]]+”\]|\(“[^\(\)]+”\)|\(pron[^\)]+\)|\[pron[^\]]+\])')
+#remove power marks
+POWER_MARK_RE = re.compile(r'\((\*|\+){1,2}\)\s?')
+
+#TODO: improve documentation for this monster regex
+#Default behavior: split at end-of-sentence periods that aren't within quotation marks
+TEST_BEST_SPLIT_RE = re.compile(r'(?<=[^ A-Z]\.\s)' #prevent splitting on initials or ellipses
+                                r'(?=[\s0-9A-Z“])|' #look ahead to see if next sentence
+                                #starts with number, capital letter, or left quotation mark
+                                r'(?<=(?:\?|\.|\!)(?:”|\")\s)(?=[^a-z])|' # "core"
+                                r'(?<=[A-Z]{2}\. )|' #deal with sentences that end with
+                                #an initialism like 'CO' or 'DRNA'
+                                r'(?<=\.”|\.\")(?=[0-9A-Z])') #handle sentences with no space;
+                                #e.g. 2023 ACF Regionals 'House of Usher' tossup
+
+
+def protect_quoted_periods(qtext):
+    '''
+    Replace periods inside smart quotes with _DOT_ so the splitter doesn't
+    split quotations, in a single pass.
+
+    This gives the same result as repeatedly applying
+        re.sub(r'(?<=“)([^”]+)\\.([^”]+)(?=”)', r'\\1_DOT_\\2', qtext)
+    until nothing changes, which is quadratic for quote-heavy questions. That
+    pattern replaces a period when, between the previous ” and the period,
+    there's a “ followed by at least one other character, and the next ” is
+    at least one character after the period. So within each stretch of text
+    ending in a ”, the periods from two characters past its first “ up to
+    (not including) its last character are the ones replaced.
+
+    Inputs:
+        -qtext (str): question text, after dumb quotes are made smart
+    Returns (str): the text with quoted periods protected
+    '''
+    if '“' not in qtext or '”' not in qtext:
+        return qtext
+    stretches = qtext.split('”')
+    #the text after the last ” isn't followed by a closing quote
+    for i, stretch in enumerate(stretches[:-1]):
+        start = stretch.find('“') + 2
+        if start > 1 and '.' in stretch[start:-1]:
+            stretches[i] = stretch[:start] + stretch[start:-1].replace('.', '_DOT_') + stretch[-1]
+    return '”'.join(stretches)
+
+
 def my_split(qtext):
     '''
     Use a regex split questions at the clue (standalone sentence) level.
 
+    Each pre-processing step is skipped when the text can't contain what it
+    looks for, and periods in quotations are protected in one pass (see
+    protect_quoted_periods()), so this takes time linear in the length of
+    the question.
+
     Inputs:
         -qtext (str): The tossup or bonus part to be split up
     Returns (lst): A list of the clue-sentences in the tossup or bonus part,
@@ -19,253 +80,357 @@ def my_split(qtext):
     '''
     #PRE-PROCESSING 
 
-    qtext = re.sub(r'…', '...', qtext)
+    if '…' in qtext:
+        qtext = qtext.replace('…', '...')
 
     #replace dumb quotes with smart quotes
-    qtext = re.sub(DUMB_QUOTE_RE, r'“\1”', qtext)
+    if '"' in qtext:
+        qtext = DUMB_QUOTE_RE.sub(r'“\1”', qtext)
 
     #replace double apostrophes on one end of a quote with dumb quotes
     #e.g. “The Windhover''
     #but beware things like D'' layer or 4'33''
-    qtext = re.sub(r'\'\'', '”', qtext)
+    if "''" in qtext:
+        qtext = qtext.replace("''", '”')
 
-    #prevent splitting on common titles
-    ABBREVS_RE = r'(“|\s)(Mr|Mrs|Ms|Mx|Messrs|Dr|Prof|Rev|Lt|Col|Gen|Gov|No|St|Ste|Mme|Mlle|v|vs|Blvd|Op|Mt|Ft)\.'
-    qtext = re.sub(ABBREVS_RE, r'\1\2_DOT_', qtext)
+    if '.' in qtext:
+        qtext = ABBREVS_RE.sub(r'\1\2_DOT_', qtext)
 
-    #fix order of period-close quote so other REs work better
-    WRONG_ENDQUOTE_RE = r'(?<=[a-z])\.“(?= [A-Z])'
-    qtext = re.sub(WRONG_ENDQUOTE_RE, '.”', qtext)
+    if '.“' in qtext:
+        qtext = WRONG_ENDQUOTE_RE.sub('.”', qtext)
 
     #prevent from splitting quotations
-    PERIOD_IN_SMART_QUOTES_RE = r'(?<=“)([^”]+)\.([^”]+)(?=”)'
-    #this operation only replaces one so you need to while loop it
-    while qtext != re.sub(PERIOD_IN_SMART_QUOTES_RE, r'\1_DOT_\2', qtext):
-        qtext = re.sub(PERIOD_IN_SMART_QUOTES_RE, r'\1_DOT_\2', qtext)
-        
-    #Should be obviated by replacement of dumb quotes
-    PERIOD_IN_DUMB_QUOTES_RE = r'(\"[^\.\"]+)\.( [^\.\"]+(\.|\?|\!|)\")'
-    qtext = re.sub(PERIOD_IN_DUMB_QUOTES_RE, r'\1_DOT_\2', qtext)
-
-    #remove pronunciation guides where possible
-    PRONUNC_GUIDE_RE = r'\s(\[“[^\[\]]+”\]|\(“[^\(\)]+”\)|\(pron[^\)]+\)|\[pron[^\]]+\])'
-    qtext = re.sub(PRONUNC_GUIDE_RE, '', qtext)
-
-    #remove power marks
-    POWER_MARK_RE = r'\((\*|\+){1,2}\)\s?'
-    qtext = re.sub(POWER_MARK_RE, '', qtext)
-
-    #TODO: improve documentation for this monster regex
-    #Default behavior: split at end-of-sentence periods that aren't within quotation marks
-    TEST_BEST_SPLIT_RE = re.compile(r'(?<=[^ A-Z]\.\s)' #prevent splitting on initials or ellipses
-                                    r'(?=[\s0-9A-Z“])|' #look ahead to see if next sentence
-                                    #starts with number, capital letter, or left quotation mark
-                                    r'(?<=(?:\?|\.|\!)(?:”|\")\s)(?=[^a-z])|' # "core"
-                                    r'(?<=[A-Z]{2}\. )|' #deal with sentences that end with
-                                    #an initialism like 'CO' or 'DRNA'
-                                    r'(?<=\.”|\.\")(?=[0-9A-Z])') #handle sentences with no space;
-                                    #e.g. 2023 ACF Regionals 'House of Usher' tossup
-
-    return re.split(TEST_BEST_SPLIT_RE, qtext)
-
-
-def tokenize_and_explode(clues):
+    qtext = protect_quoted_periods(qtext)
+
+    if qtext.count('"') > 1:
+        qtext = PERIOD_IN_DUMB_QUOTES_RE.sub(r'\1_DOT_\2', qtext)
+
+    if '(' in qtext or '[' in qtext:
+        qtext = PRONUNC_GUIDE_RE.sub('', qtext)
+
+    if '(' in qtext:
+        qtext = POWER_MARK_RE.sub('', qtext)
+
+    return TEST_BEST_SPLIT_RE.split(qtext)
+
+
+def split_texts(qtexts):
+    '''Apply my_split() to each of a list of questions.'''
+    return [my_split(qtext) for qtext in qtexts]
+
+
+def _apply_to_chunk(task):
+    '''
+    Worker process side of map_in_chunks(): apply a function to one chunk of
+    texts, collecting rule timings if asked to.
+    '''
+    func, texts, with_timings = task
+    if not with_timings:
+        return func(texts), None
+    timings = {}
+    return func(texts, timings), timings
+
+
+def map_in_chunks(func, texts, n_workers, timings=None):
+    '''
+    Apply a function of a list of texts (split_texts(), clean_clue_texts(),
+    clean_answer_texts()) to a whole column by splitting it into chunks and
+    running them in a pool of worker processes. Results come back in the
+    original order, so this gives the same result as func(texts).
+
+    Inputs:
+        -func (function): takes a list of texts (and a timings dict, if
+        timings is given) and returns a list of the same length
+        -texts (list-like of str): the column to process
+        -n_workers (int): number of worker processes
+        -timings (dict or None): if given, rule timings from every worker
+        are added to it (see text_rules.apply_rules())
+    Returns (list): func's result for each text
+    '''
+    texts = list(texts)
+    #several chunks per worker, so one slow chunk doesn't hold up the rest
+    chunk_size = max(1, -(-len(texts) // (n_workers * 4)))
+    tasks = ((func, texts[start:start + chunk_size], timings is not None)
+             for start in range(0, len(texts), chunk_size))
+    results = []
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        for chunk_results, chunk_timings in tqdm(executor.map(_apply_to_chunk, tasks),
+                                                 total=-(-len(texts) // chunk_size)):
+            results.extend(chunk_results)
+            if chunk_timings is not None:
+                for name, seconds in chunk_timings.items():
+                    timings[name] = timings.get(name, 0) + seconds
+    return results
+
+
+def tokenize_and_explode(clues, n_workers=None):
     '''
     Split each tossup and/or bonus part at the sentence level and make each
     sentence its own row, leaving all else intact. The effect of this is to
     create one card (row) for each clue of a question.
 
+    Column dtypes (e.g. categoricals and Arrow strings from
+    clue_schema.compact_dtypes()) are kept.
+
     Inputs:
         -clues (pandas DataFrame)
+        -n_workers (int or None): if greater than 1, split questions in
+        chunks across this many worker processes
     Returns (pandas DataFrame): modified DataFrame with one row per clue
     (TODO: figure out how to do a pandas inplace=True)
     '''
-    clues.loc[:,'clue'] = clues.loc[:,'clue'].progress_apply(lambda x: my_split(x))
+    clue_dtype = clues.loc[:,'clue'].dtype
+    if n_workers is not None and n_workers > 1:
+        split_clues = map_in_chunks(split_texts, clues.loc[:,'clue'], n_workers)
+        clues = clues.assign(clue=pd.Series(split_clues, index=clues.index, dtype=object))
+    else:
+        clues = clues.assign(clue=clues.loc[:,'clue'].progress_apply(lambda x: my_split(x)))
 
     clues_exploded = clues.explode(["clue"],ignore_index=True)
+    #lists of clues are plain objects, so the exploded column needs its dtype back
+    clues_exploded['clue'] = clues_exploded.loc[:,'clue'].astype(clue_dtype)
 
     #TODO: isolate the tossup giveaways and give them type 'tossup_giveaway'
 
     return clues_exploded
 
 
-def cleanup(clues):
+#Non-clues that cleanup() removes before cleaning, as (name, pattern) pairs
+#matched with Series.str.contains()
+#TODO: use .pattern attribute to improve REs?
+ANSWER_FOLLOWING_RE = re.compile(r'(Answer|Identify|Respond appropriately to) '
+                                 r'(th(e|is)|these|some) '
+                                 r'(following|questions)',
+                                 re.IGNORECASE)
+#Remove non-clue bonus leadins
+#TODO: fix this to be an re_compile that also uses FTP_RE
+NO_CLUE_BONUS_LEADIN_RE = re.compile(r'(identify|name|give) '
+                                     r'(these|three|some).+'
+                                     r'(for 10 points each|ftpe)',
+                                     re.IGNORECASE)
+ROW_FILTERS = [('answer_following', ANSWER_FOLLOWING_RE),
+               ('no_clue_bonus_leadin', NO_CLUE_BONUS_LEADIN_RE),
+               ('30-20-10', '30-20-10')]
+
+#remove extremely short clues, including:
+# - standalone numbers/letters/initials
+# - "pencil and paper ready"
+# - "you have n seconds"
+MIN_CLUE_LEN = 25
+
+
+def cleanup(clues, verbose=False, n_workers=None, dedupe=True, stats=None):
     '''
     Cleans all clues and answers IN THE WHOLE DATAFRAME, calling helper functions
     as needed.
 
+    Every row filter adds to one boolean mask rather than making a new
+    DataFrame, and each only looks at the rows that are still kept, so the
+    DataFrame is only subset once, at the end. Likewise, only the clues that
+    pass the filters are cleaned, and only the answers of rows that are kept.
+    The number of rows each filter removes and the peak memory use of the
+    stage are printed at the end.
+
     Inputs:
         -clues (pandas DataFrame)
-        -old_version (boolean): determines whether modifications to clues are
-        made at the dataframe level through .loc selectors (old) or by applying a 
-        vectorized function to do all replacements at clue level (new)
+        -verbose (boolean): whether to report how long each cleaning rule
+        (see CLUE_RULES and ANSWER_RULES) took
+        -n_workers (int or None): if greater than 1, clean clue and answer
+        text in chunks across this many worker processes
+        -dedupe (boolean): whether to remove rows with repeated clues; can be
+        False if that's been done already
+        -stats (dict or None): if given, filled in with 'rows_in', 'rows_out',
+        'removed' (rows removed by each filter) and 'peak_memory' (bytes)
     Returns (DataFrame): as if modified in-place
 
-    TODO: add a 'verbose' mode 
     TODO: Split into helpers for each kind of cleanup
     '''
-    print("Removing unwanted rows (e.g. duplicates, obvious non-clues)...")
-    clues = clues.drop_duplicates('clue')
-
-    #TODO: use .pattern attribute to improve REs?
-    ANSWER_FOLLOWING_RE = re.compile(r'(Answer|Identify|Respond appropriately to) '
-                                     r'(th(e|is)|these|some) '
-                                     r'(following|questions)',
-                                     re.IGNORECASE)
-    clues = clues.loc[(~clues.loc[:,'clue'].str.contains(ANSWER_FOLLOWING_RE, regex=True)), :]
-
-    #Remove non-clue bonus leadins
-
-    #TODO: fix this to be an re_compile that also uses FTP_RE
-    NO_CLUE_BONUS_LEADIN_RE = re.compile(r'(identify|name|give) '
-                                         r'(these|three|some).+'
-                                         r'(for 10 points each|ftpe)',
-                                         re.IGNORECASE)
-    clues = clues.loc[(~clues.loc[:,'clue'].str.contains(NO_CLUE_BONUS_LEADIN_RE, regex=True)), :]
-
-    if type in clues.columns:
-        clues = clues.loc[~((clues.loc[:,'clue'].str.contains('some stuff')) & 
-                (clues.loc[:,'type'] == 'bonus_leadin')), :]
-
-    print("Removing 30-20-10s...")
-    clues = clues.loc[(~clues.loc[:,'clue'].str.contains('30-20-10')), :]
-
-    print("Cleaning clue text...")
-    clues.loc[:,'clue'] = clues.loc[:,'clue'].progress_apply(lambda x: 
-                                                             clean_clue_text(x))
-
-    #remove extremely short clues, including:
-    # - standalone numbers/letters/initials
-    # - "pencil and paper ready"
-    # - "you have n seconds"
-    print("Removing extremely short clues...")
-    clues = clues.loc[(clues.loc[:,'clue'].str.len() > 25), :]
-
-    print("Cleaning answer line text...")
-    clues.loc[:,'answer'] = clues.loc[:,'answer'].progress_apply(lambda x: clean_answer_text(x))
+    rows_in = len(clues)
+    removed = {}
+    with PeakMemory() as memory:
+        print("Removing unwanted rows (e.g. duplicates, obvious non-clues)...")
+        clue_texts = clues.loc[:,'clue']
+        keep = np.full((len(clues),), True)
+        if dedupe:
+            keep &= ~clue_texts.duplicated().to_numpy()
+            removed['duplicate'] = rows_in - int(keep.sum())
+
+        for name, pattern in ROW_FILTERS:
+            rows = np.flatnonzero(keep)
+            hits = clue_texts.iloc[rows].str.contains(pattern, regex=True).to_numpy(dtype=bool)
+            keep[rows[hits]] = False
+            removed[name] = int(hits.sum())
+
+        if type in clues.columns:
+            rows = np.flatnonzero(keep)
+            hits = ((clue_texts.iloc[rows].str.contains('some stuff')) &
+                    (clues.loc[:,'type'].iloc[rows] == 'bonus_leadin')).to_numpy(dtype=bool)
+            keep[rows[hits]] = False
+            removed['some_stuff_leadin'] = int(hits.sum())
+
+        print("Cleaning clue text...")
+        rows = np.flatnonzero(keep)
+        clue_timings = {}
+        cleaned_clues = np.array(clean_texts(clean_clue_texts, clue_texts.iloc[rows], n_workers, clue_timings),
+                                 dtype=object)
+
+        print("Removing extremely short clues...")
+        long_enough = np.array([len(qtext) > MIN_CLUE_LEN for qtext in cleaned_clues], dtype=bool)
+        removed['short'] = int((~long_enough).sum())
+        clues = clues.iloc[rows[long_enough]]
+        clues.loc[:,'clue'] = cleaned_clues[long_enough]
+
+        print("Cleaning answer line text...")
+        answer_timings = {}
+        clues.loc[:,'answer'] = clean_texts(clean_answer_texts, clues.loc[:,'answer'], n_workers,
+                                            answer_timings)
+
+    print(f"Cleanup kept {len(clues)} of {rows_in} rows "
+          f"(peak memory {format_bytes(memory.peak)}). Rows removed:")
+    for name, count in removed.items():
+        print(f"{name:>24}: {count}")
+    if verbose:
+        print("Time spent on each clue rule:")
+        print_rule_timings(clue_timings)
+        print("Time spent on each answer rule:")
+        print_rule_timings(answer_timings)
+    if stats is not None:
+        stats.update(rows_in=rows_in, rows_out=len(clues), removed=removed, peak_memory=memory.peak)
 
     return clues
 
 
-def clean_clue_text(qtext):
-    '''
-    Function to be applied ON A SINGLE CLUE to take advantage of pandas 
-    vectorization / prevent multiple passes through when just one will do.
-    Should be done after splitting the questions into clues, not before
-
-    This used to be written at the df level with selectors like:
-        clues.loc[:,'clue'] = clues.loc[:,'clue'].str.replace('_DOT_', '.')
-    but now it's not.
-
-    Inputs:
-        qtext (str): content of a single cell in the 'clue' column
-    Returns (str): that string, with unwanted elements removed and text fixed
-    '''
+#Rules applied to every clue, in order. Each rule lists literals of which one
+#must appear in a clue for the rule to change it, so the rule can skip clues
+#(or the whole column) without running its pattern; see text_rules.TextRule.
+#To add a cleaning step, add a rule here.
+CLUE_RULES = [
     #revert _DOT_s back
-    qtext = re.sub('_DOT_', '.', qtext)
-
+    TextRule('revert_dots', '_DOT_', '.', literals=('_DOT_',)),
     #remove HTML-y tags
-    BRACKET_RE = r'<[^>]+>'
-    qtext = re.sub(BRACKET_RE, '', qtext) 
-
+    TextRule('html_tags', BRACKET_RE, '', literals=('<',)),
     #edge case: a bonus where "The FTP" is an actual organization in the clue
-    qtext = re.sub('The FTP', 'The F.T.P.', qtext)
+    TextRule('the_ftp', 'The FTP', 'The F.T.P.', literals=('The FTP',)),
     #get rid of ftp/ftpe throughout
-    FTP_RE = re.compile('(, |–{1,2}|—)?(for (5|five|10|ten|15|fifteen|the stated number of) po?i(nt|tn)s?(,)?( each| ecah)?(,|:)?)|f(t|f)(sno)?p(e)?(,|:|\.|–{1,2}|—)?', 
-                        re.IGNORECASE)
-    qtext = re.sub(FTP_RE, r'\1', qtext)
-
+    TextRule('ftp', r'(, |–{1,2}|—)?(for (5|five|10|ten|15|fifteen|the stated number of) po?i(nt|tn)s?(,)?( each| ecah)?(,|:)?)|f(t|f)(sno)?p(e)?(,|:|\.|–{1,2}|—)?',
+             r'\1', flags=re.IGNORECASE,
+             literals=('point', 'poitn', 'pint', 'pitn', 'ftp', 'ffp', 'ftsnop', 'ffsnop')),
     #get rid of stray point markers (beware that sometimes these result from mis-parsing "A.")
-    POINT_MARK_RE = r'\[(5|10|)\]\s' #will also remove empty brackets
-    qtext = re.sub(POINT_MARK_RE, '', qtext)
-
+    #will also remove empty brackets
+    TextRule('point_marks', r'\[(5|10|)\]\s', '', literals=('[5]', '[10]', '[]')),
     #remove "description acceptable" phrase (does not handle "warning/note to players")
-    DESC_ACC_RE = re.compile('(a )?(name or )?(a )?(general )?description\s(is|)acceptable(\.|:|)\s?',
-                              re.IGNORECASE)
-    qtext = re.sub(DESC_ACC_RE, '', qtext)
-
+    TextRule('description_acceptable', r'(a )?(name or )?(a )?(general )?description\s(is|)acceptable(\.|:|)\s?',
+             '', flags=re.IGNORECASE, literals=('description',)),
     #remove "warning"s and "notes"
-    WARNING_RE = re.compile('^(Note( to (teams|players?|reader|moderator)|)|Moderator note|(Content |)warning):?',
-                            re.IGNORECASE)
-    qtext = re.sub(WARNING_RE, '', qtext)
-
-    READ_SLOW_RE = r'(?<![A-Z])read[^“y]+(slowly|carefully)' 
+    TextRule('warnings', '^(Note( to (teams|players?|reader|moderator)|)|Moderator note|(Content |)warning):?',
+             '', flags=re.IGNORECASE, literals=('note', 'warning')),
     #the y in the non brackets is a kludge to save stuff inside "(read slowly)...
     # (end read slowly) tags from getting eaten
-    qtext = re.sub(READ_SLOW_RE, '', qtext)
-    
+    TextRule('read_slowly', r'(?<![A-Z])read[^“y]+(slowly|carefully)', '', literals=('read',)),
     #remove mod instructions to emphasize
-    qtext = re.sub('(\[|\()emphasize(\]|\))', '', qtext)
-
-    qtext = re.sub('from clues', '', qtext)
-
+    TextRule('emphasize', r'(\[|\()emphasize(\]|\))', '', literals=('emphasize',)),
+    TextRule('from_clues', 'from clues', '', literals=('from clues',)),
     #TODO: remove dashes around the missing "--for 10 points--"
     #DASH_RE = r'(—{1,2}|–{2,4}|--\s?--)s?what'
-    #qtext = re.sub(DASH_RE, ' what', qtext)
 
     #Remove "n answers required / specific term required / genre and composer required etc."
-    #inspecting the data, it looks like this is a good length threshold
-    REQD_LEN_THRESHOLD = 70
-    if len(qtext) < REQD_LEN_THRESHOLD and bool(re.search(r'required\.', qtext)):
-        qtext = ''
-
+    #inspecting the data, it looks like 70 is a good length threshold
+    TextRule('required', r'required\.', '', whole=True, max_len=70, literals=('required.',)),
     #remove remaining "...is/are acceptable" clues
     #inspecting the data, it looks like the shortest real clue with 'acceptable'
     #in it is of length 86
     #TODO: remove about fifteen 'false positive' non-clues above this length
-    DESC_ACC_THRESHOLD = 86
-    if len(qtext) < DESC_ACC_THRESHOLD and bool(re.search(r'acceptable\.', qtext)):
-        qtext = ''
+    TextRule('acceptable', r'acceptable\.', '', whole=True, max_len=86, literals=('acceptable.',)),
+]
 
-    #capitalize clue-initial consonant
-    qtext = qtext.strip()
-    try:
-        qtext = qtext[0].upper() + qtext[1:]
-    except IndexError: #clues that are now of length 0
-        pass
+ANS_MISSING = "THE ANSWER TO THIS CLUE WAS MISSING ON QBREADER. LOOK IT UP"
 
-    return qtext
+#Rules applied to every answer line, in order; see CLUE_RULES
+ANSWER_RULES = [
+    #empty or "[MISSING]" answer lines
+    TextRule('missing', r'\A(\[MISSING\])?\Z', ANS_MISSING, whole=True, max_len=len("[MISSING]") + 1),
+    #Turn dumb quotes into smart quotes
+    TextRule('dumb_quotes', DUMB_QUOTE_RE.pattern, r'“\1”', literals=('"',)),
+    #get rid of angle-brackets, e.g. author credits, html tags
+    TextRule('html_tags', BRACKET_RE, '', literals=('<',)),
+    #get rid of improperly rendered angle brackets
+    TextRule('escaped_tags', '&lt;.+&gt;', '', literals=('&lt;',)),
+    TextRule('do_not_reveal', '(,|) but do not( otherwise|) reveal(,|)', '', flags=re.IGNORECASE,
+             literals=('reveal',)),
+    TextRule('reject', r'(; |, |)(do not (accept|prompt|take)|reject)[^\]\)]+(?=\]|\))', '',
+             flags=re.IGNORECASE, literals=('do not', 'reject')),
+    #sweep out empty brackets, e.g. where reject instructions used to be
+    TextRule('empty_brackets', r'\[\s?\]|\(\s?\)', '', literals=('[', '(')),
+    #TODO: "note:/Editors' note: / Ed’s note:" / parenthetical or bracketed statements
+]
 
 
-def clean_answer_text(atext):
+def capitalize_first(qtext):
+    '''Capitalize the first character of a clue.'''
+    return qtext[:1].upper() + qtext[1:]
+
+
+def clean_texts(func, texts, n_workers=None, timings=None):
+    '''
+    Run clean_clue_texts() or clean_answer_texts() on a column, in chunks
+    across worker processes if n_workers is greater than 1.
     '''
-    Function to be applied ON A SINGLE ANSWER LINE to take advantage of pandas 
-    vectorization / prevent multiple passes through when just one will do.
-    Should be done after splitting the questions into clues, not before
+    if n_workers is not None and n_workers > 1:
+        return map_in_chunks(func, texts, n_workers, timings)
+    return func(texts, timings)
 
-    This used to be written at the df level with selectors like:
-        clues.loc[:,'answer'] = clues.loc[:,'answer'].str.replace('_DOT_', '.')
-    but now it's not.
+
+def clean_clue_text(qtext):
+    '''
+    Clean a single clue by applying CLUE_RULES to it.
+    Should be done after splitting the questions into clues, not before.
+    To clean a whole column, use clean_clue_texts(), which is much faster.
 
     Inputs:
-        atext (str): content of a single cell in the 'answer' column
+        qtext (str): content of a single cell in the 'clue' column
     Returns (str): that string, with unwanted elements removed and text fixed
     '''
-    ANS_MISSING = "THE ANSWER TO THIS CLUE WAS MISSING ON QBREADER. LOOK IT UP"
-    if len(atext) == 0 or atext == "[MISSING]":
-        atext = ANS_MISSING
+    qtext = apply_rules_to_text(qtext, CLUE_RULES)
+    #capitalize clue-initial consonant
+    return capitalize_first(qtext.strip())
 
-    #Turn dumb quotes into smart quotes
-    atext = re.sub(DUMB_QUOTE_RE, r'“\1”', atext)
 
-    #get rid of angle-brackets, e.g. author credits, html tags
-    atext = re.sub(BRACKET_RE, '', atext)
+def clean_clue_texts(clues, timings=None):
+    '''
+    Clean a whole column of clues at once: same result as applying
+    clean_clue_text() to each one, but each rule only looks at the clues it
+    might change (see text_rules.apply_rules()).
+
+    Inputs:
+        clues (list-like of str): e.g. the 'clue' column
+        timings (dict or None): if given, seconds spent on each rule are
+        added to it
+    Returns (list of str): the cleaned clues, in the same order
+    '''
+    return [capitalize_first(qtext.strip()) for qtext in apply_rules(clues, CLUE_RULES, timings)]
 
-    #get rid of improperly rendered angle brackets
-    LTGT_RE = re.compile('&lt;.+&gt;')
-    atext = re.sub(LTGT_RE, '', atext)
 
-    DO_NOT_REVEAL_RE = re.compile('(,|) but do not( otherwise|) reveal(,|)', re.IGNORECASE)
-    atext = re.sub(DO_NOT_REVEAL_RE, '', atext)
+def clean_answer_text(atext):
+    '''
+    Clean a single answer line by applying ANSWER_RULES to it.
+    Should be done after splitting the questions into clues, not before.
+    To clean a whole column, use clean_answer_texts(), which is much faster.
 
-    REJECT_RE = re.compile('(; |, |)(do not (accept|prompt|take)|reject)[^\]\)]+(?=\]|\))',
-                           re.IGNORECASE)
-    atext = re.sub(REJECT_RE, '', atext)
+    Inputs:
+        atext (str): content of a single cell in the 'answer' column
+    Returns (str): that string, with unwanted elements removed and text fixed
+    '''
+    return apply_rules_to_text(atext, ANSWER_RULES).strip()
 
-    #sweep out empty brackets, e.g. where reject instructions used to be
-    EMPTY_BRACKET_RE = r'\[\s?\]|\(\s?\)'
-    atext = re.sub(EMPTY_BRACKET_RE, '', atext)
 
-    #TODO: "note:/Editors' note: / Ed’s note:" / parenthetical or bracketed statements
+def clean_answer_texts(answers, timings=None):
+    '''
+    Clean a whole column of answer lines at once; see clean_clue_texts().
 
-    return atext.strip()
\ No newline at end of file
+    Inputs:
+        answers (list-like of str): e.g. the 'answer' column
+        timings (dict or None): if given, seconds spent on each rule are
+        added to it
+    Returns (list of str): the cleaned answer lines, in the same order
+    '''
+    return [atext.strip() for atext in apply_rules(answers, ANSWER_RULES, timings)]
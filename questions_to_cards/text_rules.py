@@ -0,0 +1,113 @@
+import re
+import time
+import numpy as np
+
+# joins a column's texts into one string for prefiltering; can't be part of
+# any rule's literals, so a literal match never spans two texts
+TEXT_SEP = '\x00'
+
+
+class TextRule:
+    '''
+    One step of a text cleaning rule table (see text_processing.CLUE_RULES).
+
+    A rule either substitutes every match of its pattern with repl (like
+    re.sub), or, if whole is True, replaces the entire text with repl when the
+    pattern is found anywhere in it (and the text is shorter than max_len,
+    if given).
+
+    literals are strings of which at least one has to appear in a text for
+    the pattern to change it, matched case-insensitively if the pattern is.
+    They let a rule skip texts (or a whole column) cheaply without running
+    the full pattern, so they must never rule out a text the pattern would
+    change. With no literals, every text shorter than max_len is a candidate.
+    '''
+
+    def __init__(self, name, pattern, repl='', flags=0, literals=(), whole=False, max_len=None):
+        self.name = name
+        self.pattern = re.compile(pattern, flags)
+        self.repl = repl
+        self.whole = whole
+        self.max_len = max_len
+        self.prefilter = None
+        if len(literals) > 0:
+            assert not any(TEXT_SEP in literal for literal in literals)
+            self.prefilter = re.compile('|'.join(map(re.escape, literals)), flags & re.IGNORECASE)
+
+    def __repr__(self):
+        return f"TextRule({self.name!r})"
+
+    def might_apply(self, text) -> bool:
+        '''Cheap check of whether this rule could change text.'''
+        if self.max_len is not None and len(text) >= self.max_len:
+            return False
+        return self.prefilter is None or self.prefilter.search(text) is not None
+
+    def apply(self, text) -> str:
+        '''Apply this rule to one text.'''
+        if self.whole:
+            if self.max_len is not None and len(text) >= self.max_len:
+                return text
+            return self.repl if self.pattern.search(text) else text
+        return self.pattern.sub(self.repl, text)
+
+
+def apply_rules_to_text(text, rules) -> str:
+    '''Apply a rule table, in order, to a single text.'''
+    for rule in rules:
+        if rule.might_apply(text):
+            text = rule.apply(text)
+    return text
+
+
+def apply_rules(texts, rules, timings=None) -> list:
+    '''
+    Apply a rule table, in order, to a whole column of texts at once. Each
+    rule's literals are looked for in all the texts joined together, and only
+    the texts containing them are passed to the rule's pattern; a rule whose
+    literals appear nowhere costs a single scan of the column.
+
+    Inputs:
+        - texts (list-like of str): e.g. the 'clue' column of a DataFrame
+        - rules (list of TextRule): the rule table
+        - timings (dict or None): if given, the seconds spent on each rule
+        are added to timings[rule.name]
+    Returns (list of str): the cleaned texts, in the same order
+    '''
+    texts = np.array(list(texts), dtype=object)
+    stale = True
+    for rule in rules:
+        start = time.perf_counter()
+        # only recompute the joined texts after a rule has changed some
+        if stale:
+            lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+            offsets = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+            joined = None
+            stale = False
+
+        rows = np.arange(len(texts))
+        if rule.max_len is not None:
+            rows = rows[lengths < rule.max_len]
+        if rule.prefilter is not None:
+            if joined is None:
+                joined = TEXT_SEP.join(texts)
+            starts = [match.start() for match in rule.prefilter.finditer(joined)]
+            rows = np.intersect1d(rows, np.searchsorted(offsets, starts, side='right') - 1)
+
+        if len(rows) > 0:
+            old_texts = texts[rows]
+            new_texts = [rule.apply(text) for text in old_texts]
+            if any(new != old for new, old in zip(new_texts, old_texts)):
+                texts[rows] = new_texts
+                stale = True
+        if timings is not None:
+            timings[rule.name] = timings.get(rule.name, 0) + time.perf_counter() - start
+    return texts.tolist()
+
+
+def print_rule_timings(timings):
+    '''Print how long each rule took, slowest first.'''
+    total = sum(timings.values())
+    for name, seconds in sorted(timings.items(), key=lambda item: -item[1]):
+        share = seconds / total if total > 0 else 0
+        print(f"{name:>24}: {seconds:8.3f}s ({share:.0%})")
@@ -1,9 +1,78 @@
+import os
+import sys
+import threading
 import pandas as pd
 
-def write_out(clues, filepath):
+def write_out(clues, filepath, append=False):
     '''
     Write out rows of (clue, answer, tagstring) to an Anki-compatible,
-    tab-separated .csv file.
+    tab-separated .csv file. With append=True, add the rows to the end of an
+    existing file (without repeating the header).
     '''
     clues.loc[:,['clue', 'answer', 'tags']].to_csv(filepath, sep="\t", 
-                                                   escapechar="\\", index=False)
+                                                   escapechar="\\", index=False,
+                                                   mode='a' if append else 'w',
+                                                   header=not append)
+
+
+def current_rss():
+    '''
+    Resident memory of this process, in bytes. Falls back on the peak so far
+    where /proc isn't available (e.g. macOS), and 0 if that isn't either.
+    '''
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        #kilobytes on Linux, bytes on macOS
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+    except ImportError:
+        return 0
+
+
+class PeakMemory:
+    '''
+    Context manager that tracks the peak resident memory of this process
+    while its block runs, by sampling it from a background thread. Memory of
+    worker processes isn't included.
+
+    Usage:
+        with PeakMemory() as memory:
+            ...
+        print(format_bytes(memory.peak))
+    '''
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        return False
+
+
+def format_bytes(num_bytes):
+    '''Human-readable size, e.g. "1.3 GB".'''
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(num_bytes) < 1024 or unit == 'GB':
+            break
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} {unit}" if unit != 'B' else f"{num_bytes} B"